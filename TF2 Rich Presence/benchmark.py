@@ -0,0 +1,652 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+
+import io
+import json
+import mmap
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, TextIO, Tuple, Union
+
+import psutil
+
+import console_log
+import log_source
+import logger
+import main as tf2rp_main
+import processes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SYNTHETIC_SESSIONS: int = 256
+FAKE_PROC_FIRST_PID: int = 5000000  # past the kernel's maximum PID, so psutil can't have any fake processes cached from the real /proc
+SYNTHETIC_USERNAME: str = 'Benchmarker'
+SYNTHETIC_MAPS: Tuple[str, ...] = ('pl_badwater', 'cp_dustbowl', 'koth_harvest_final', 'ctf_2fort', 'pl_upward', 'cp_process_final', 'koth_viaduct', 'cp_catwalk_a5c', 'mvm_decoy')
+SYNTHETIC_NAMES: Tuple[str, ...] = ('Heavy Weapons Guy', 'xXsniperXx', 'a bot', 'gaben', 'Mann Co. Employee', 'Saxton Hale', 'Merasmus', 'Pootis', 'medic pls', 'spycrab')
+SYNTHETIC_WEAPONS: Tuple[str, ...] = ('scattergun', 'tf_projectile_rocket', 'minigun', 'knife', 'sniperrifle', 'flamethrower', 'tf_projectile_pipe_remote', 'sentrygun', 'shotgun_soldier')
+SYNTHETIC_CHAT: Tuple[str, ...] = ('gg', 'nice shot', 'medic!!', 'spy around here', 'push the cart', 'why is there no medic', 'lol', 'rematch?', 'that was a crit', 'uber ready', 'ez')
+SYNTHETIC_GAME_NOISE: Tuple[str, ...] = ('Teamplay round start', 'Sending full update to client', 'Redownloading all lightmaps', 'Compact freed 589824 bytes',
+                                         'Team "BLU" triggered "pointcaptured"', 'Achievement progress saved', 'Client reached server_spawn.')
+SYNTHETIC_MENUS_NOISE: Tuple[str, ...] = ('CTFGCClientSystem::PostInitGC', 'Connecting to matchmaking server', 'Compact freed 1048576 bytes', 'Steam config directory: C:\\Program Files (x86)\\Steam',
+                                          'Achievement progress saved', 'Unknown command "cl_thirdperson"')
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--engines':
+        # sizes in MB, e.g. "benchmark.py --engines 10 100 1000"
+        for size_mb in sys.argv[2:] if len(sys.argv) > 2 else ['10', '100', '1000']:
+            compare_engines(int(size_mb))
+
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--generate':
+        # e.g. "benchmark.py --generate console.log 100" for a 100 MB log (and its ground truth), with an optional random seed after
+        truth_path: str = write_synthetic_log(sys.argv[2], int(sys.argv[3]) * 1048576, int(sys.argv[4]) if len(sys.argv) > 4 else 0)
+        print(f"Wrote {sys.argv[2]} and {truth_path}")
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--verify':
+        # e.g. "benchmark.py --verify console.log", for a log made with --generate
+        verify_synthetic_log(sys.argv[2])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--interpret':
+        # size in MB then console_scan_kb values, e.g. "benchmark.py --interpret 100 100 1000 10000 inf"
+        benchmark_interpret(int(sys.argv[2]) if len(sys.argv) > 2 else 100, [float(kb) for kb in sys.argv[3:]] if len(sys.argv) > 3 else [100, 1000, 10000, float('inf')])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--kill-stats':
+        # size in MB, e.g. "benchmark.py --kill-stats 100"
+        benchmark_kill_stats(int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--watchlist':
+        # size in MB then watchlist sizes, e.g. "benchmark.py --watchlist 100 1 10 100 1000"
+        benchmark_watchlist(int(sys.argv[2]) if len(sys.argv) > 2 else 100, [int(size) for size in sys.argv[3:]] if len(sys.argv) > 3 else [0, 1, 10, 100, 1000])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--long-line':
+        # log size in MB then the long line's size in MB, e.g. "benchmark.py --long-line 10 100"
+        benchmark_interpret(int(sys.argv[2]) if len(sys.argv) > 2 else 10, [float('inf')], int(sys.argv[3]) if len(sys.argv) > 3 else 100)
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--source':
+        # size in MB then ring buffer sizes in KB, e.g. "benchmark.py --source 100 64 1024"
+        benchmark_source(int(sys.argv[2]) if len(sys.argv) > 2 else 100, [int(kb) for kb in sys.argv[3:]] if len(sys.argv) > 3 else [64, 1024])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--processes':
+        # number of runs, e.g. "benchmark.py --processes 20"
+        benchmark_process_scanning(int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--fake-processes':
+        # number of runs then numbers of processes, e.g. "benchmark.py --fake-processes 20 1000 4000 16000"
+        benchmark_fake_process_scanning(int(sys.argv[2]) if len(sys.argv) > 2 else 20, [int(count) for count in sys.argv[3:]] if len(sys.argv) > 3 else [1000, 4000, 16000])
+        return
+    elif len(sys.argv) > 1 and sys.argv[1] == '--interpret-once':
+        # used by benchmark_interpret(), so that each run's peak memory is its own
+        print(json.dumps(interpret_once(sys.argv[2], float(sys.argv[3]))))
+        return
+
+    # uses the console logs in test_resources unless some others are given
+    log_paths: List[str] = sys.argv[1:] if len(sys.argv) > 1 else [os.path.join('test_resources', filename) for filename in os.listdir('test_resources') if filename.endswith('.log')]
+    user_usernames: List[str] = ['not Kataiser']
+
+    for log_path in log_paths:
+        with open(log_path, 'rb') as log_file:
+            log_bytes: bytes = log_file.read()
+
+        line_count: int = log_bytes.count(b'\n')
+        if not line_count:
+            print(f"{log_path}: no lines, skipped")
+            continue
+
+        log_bytes *= -(-16000 // line_count)  # at least a normal sized console.log
+        line_count = log_bytes.count(b'\n')
+        old_time, old_peak_memory = time_scanner(scan_old, log_bytes, user_usernames)
+        new_time, new_peak_memory = time_scanner(scan_new, log_bytes, user_usernames)
+        print(f"{log_path} ({line_count} lines): old {round(old_time * 1000000 / line_count, 3)} µs/line, {round(old_peak_memory / 1024)} KB peak, "
+              f"new {round(new_time * 1000000 / line_count, 3)} µs/line, {round(new_peak_memory / 1024)} KB peak, {round(old_time / new_time, 2)}x faster")
+
+
+# throughput of a plain loop over every line and of each of console_log.interpret()'s engines, on a synthetic log
+def compare_engines(size_mb: int):
+    log_path: str = os.path.join(tempfile.gettempdir(), f'benchmark_console_{size_mb}mb.log')
+    truth_path: str = write_synthetic_log(log_path, size_mb * 1048576)
+    log_size: int = os.stat(log_path).st_size
+    results: List[str] = []
+
+    start_time: float = time.perf_counter()
+    with open(log_path, 'r', errors='replace') as log_file:
+        scan_old(log_file, ['not Kataiser'])
+    results.append(f"Python loop {round(log_size / 1048576 / (time.perf_counter() - start_time), 1)} MB/s")
+
+    for engine in console_log.MARKER_LINE_FINDERS:
+        with open(log_path, 'rb') as log_file:
+            log_map: mmap.mmap = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+                start_time = time.perf_counter()
+                for line in console_log.MARKER_LINE_FINDERS[engine](log_map, 0, log_size, ('Kataiser',)):
+                    console_log.classify_line(line, ['not Kataiser'], ('Kataiser',))
+                results.append(f"{engine} engine {round(log_size / 1048576 / (time.perf_counter() - start_time), 1)} MB/s")
+            except ImportError as error:
+                results.append(f"{engine} engine unavailable ({error})")
+            finally:
+                log_map.close()
+
+    os.remove(log_path)
+    os.remove(truth_path)
+    print(f"{size_mb} MB: {', '.join(results)}")
+
+
+# console_log.interpret()'s speed and memory use for a full scan of a synthetic log, with each console_scan_kb. each runs in a new process, since peak RSS can only go up.
+# long_line_mb adds one line of that size (like bind spam) to the end of the log, which shouldn't change how much memory is used
+def benchmark_interpret(size_mb: int, kb_limits: List[float], long_line_mb: int = 0):
+    log_path: str = os.path.join(tempfile.gettempdir(), f'benchmark_console_{size_mb}mb.log')
+    truth_path: str = write_synthetic_log(log_path, size_mb * 1048576)
+
+    if long_line_mb:
+        with open(log_path, 'ab') as log_file:
+            log_file.write(b"bind spam ")
+            for line_mb in range(long_line_mb):
+                log_file.write(b"x" * 1048576)
+            log_file.write(b" Host_Error\nPyro selected \n")
+
+    for kb_limit in kb_limits:
+        result: Dict[str, float] = json.loads(subprocess.check_output([sys.executable, __file__, '--interpret-once', log_path, str(kb_limit)]).decode('utf-8').splitlines()[-1])
+        print(f"console_scan_kb={kb_limit}: {round(result['bytes'] / 1048576, 1)} MB window ({result['lines']} lines) in {round(result['time'] * 1000, 1)} ms, "
+              f"{round(result['lines'] / result['time'])} lines/s, {round(result['bytes'] / 1048576 / result['time'], 1)} MB/s, "
+              f"peak RSS {round(result['peak_rss'] / 1048576, 1)} MB ({round(result['start_rss'] / 1048576, 1)} MB before scanning), "
+              f"{round(result['allocated_peak'] / 1024)} KB allocated at peak, {round(result['allocated_kept'] / 1024)} KB still allocated after")
+
+    os.remove(log_path)
+    os.remove(truth_path)
+
+
+# what counting kills and deaths costs a full scan of a synthetic log (which is mostly kill feed), per engine. finding, parsing, and reducing lines is all timed
+def benchmark_kill_stats(size_mb: int, runs: int = 3):
+    log_path: str = os.path.join(tempfile.gettempdir(), f'benchmark_console_{size_mb}mb.log')
+    truth_path: str = write_synthetic_log(log_path, size_mb * 1048576)
+    log_size: int = os.stat(log_path).st_size
+    user_usernames: List[str] = [SYNTHETIC_USERNAME]
+    kill_feed_markers: Tuple[bytes, ...] = (SYNTHETIC_USERNAME.encode('utf-8'),)
+
+    with open(log_path, 'rb') as log_file:
+        log_map: mmap.mmap = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            for engine in console_log.MARKER_LINE_FINDERS:
+                results: List[str] = []
+
+                for kill_stats in (False, True):
+                    best_time: float = float('inf')
+                    state: console_log.ConsoleLogState = console_log.ConsoleLogState()
+                    line_count: int = 0
+
+                    for run in range(runs):
+                        start_time: float = time.perf_counter()
+
+                        try:
+                            lines: List[str] = console_log.MARKER_LINE_FINDERS[engine](log_map, 0, log_size, (), extra_markers=kill_feed_markers if kill_stats else ())
+                        except ImportError as error:
+                            results.append(f"unavailable ({error})")
+                            break
+
+                        state = console_log.reduce_events(console_log.ConsoleLogState(), console_log.console_events(lines, user_usernames, True, (), kill_stats), False)
+                        best_time = min(best_time, time.perf_counter() - start_time)
+                        line_count = len(lines)
+                    else:
+                        results.append(f"kill_stats={kill_stats} {round(best_time * 1000, 1)} ms ({round(log_size / 1048576 / best_time, 1)} MB/s, {line_count} lines kept, "
+                                       f"{state.kills} kills and {state.deaths} deaths on the last map)")
+
+                print(f"{size_mb} MB, {engine} engine: {', '.join(results)}")
+        finally:
+            log_map.close()
+
+    os.remove(log_path)
+    os.remove(truth_path)
+
+
+# how a full scan of a synthetic log scales with the number of watched players. a few of the names are in the log (so there's something to find), the rest are random
+def benchmark_watchlist(size_mb: int, watchlist_sizes: List[int], runs: int = 3):
+    log_path: str = os.path.join(tempfile.gettempdir(), f'benchmark_console_{size_mb}mb.log')
+    truth_path: str = write_synthetic_log(log_path, size_mb * 1048576)
+    log_size: int = os.stat(log_path).st_size
+    rng: random.Random = random.Random(0)
+    name_chars: str = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 _-'
+
+    with open(log_path, 'rb') as log_file:
+        log_map: mmap.mmap = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            for watchlist_size in watchlist_sizes:
+                watched: List[str] = [f'{name}{rng.randint(1, 99)}' for name in SYNTHETIC_NAMES[:min(watchlist_size, 3)]]
+                while len(watched) < watchlist_size:
+                    watched.append(''.join(rng.choice(name_chars) for char in range(rng.randint(3, 20))))
+                watchlist: Tuple[str, ...] = tuple(sorted(set(watched)))
+                results: List[str] = []
+
+                for engine in console_log.MARKER_LINE_FINDERS:
+                    best_time: float = float('inf')
+                    line_count: int = 0
+
+                    try:
+                        for run in range(runs):
+                            start_time: float = time.perf_counter()
+                            lines: List[str] = console_log.MARKER_LINE_FINDERS[engine](log_map, 0, log_size, watchlist)
+                            best_time = min(best_time, time.perf_counter() - start_time)
+                            line_count = len(lines)
+                    except ImportError as error:
+                        results.append(f"{engine} engine unavailable ({error})")
+                        continue
+
+                    results.append(f"{engine} engine {round(best_time * 1000, 1)} ms ({round(log_size / 1048576 / best_time, 1)} MB/s, {line_count} lines)")
+
+                print(f"{size_mb} MB, {len(watchlist)} watched players: {', '.join(results)}")
+        finally:
+            log_map.close()
+
+    os.remove(log_path)
+    os.remove(truth_path)
+
+
+# console_log.interpret_source()'s throughput with a synthetic log streamed over a local socket (so without disk I/O), with each size of ring buffer. the log is sent in small,
+# uneven pieces, like console output would be, and the result is checked against the log's ground truth
+def benchmark_source(size_mb: int, buffer_kbs: List[int]):
+    log_path: str = os.path.join(tempfile.gettempdir(), f'benchmark_console_{size_mb}mb.log')
+    truth_path: str = write_synthetic_log(log_path, size_mb * 1048576)
+
+    with open(log_path, 'rb') as log_file:
+        log_bytes: bytes = log_file.read()
+    with open(truth_path, 'r') as truth_file:
+        expected: Tuple[str, str] = tuple(json.loads(truth_file.readlines()[-1])[1:])
+
+    os.remove(log_path)
+    os.remove(truth_path)
+
+    for buffer_kb in buffer_kbs:
+        app: tf2rp_main.TF2RichPresense = tf2rp_main.TF2RichPresense(quiet_log())
+        sending, receiving = socket.socketpair()
+        source: log_source.SocketSource = log_source.SocketSource(quiet_log(), receiving, 'benchmark socket', buffer_kb * 1024)
+        sender: threading.Thread = threading.Thread(target=send_in_pieces, args=(sending, log_bytes), daemon=True)
+        interpretation: Tuple[str, str] = ('', '')
+        polls: int = 0
+
+        start_time: float = time.perf_counter()
+        sender.start()
+        while not source.ended:
+            source.wait(1)
+            interpretation = console_log.interpret_source(app, source, [SYNTHETIC_USERNAME])
+            polls += 1
+        elapsed: float = time.perf_counter() - start_time
+
+        source.close()
+        print(f"{size_mb} MB over a socket, {buffer_kb} KB buffer: {round(elapsed * 1000, 1)} ms ({round(len(log_bytes) / 1048576 / elapsed, 1)} MB/s, {polls} polls, "
+              f"{source.ring.dropped} bytes dropped), {'correct' if interpretation == expected else f'expected {expected}, got {interpretation}'}")
+
+
+# sends bytes through a socket in pieces of random sizes (up to 64 KB), then closes it
+def send_in_pieces(connection: socket.socket, data: bytes):
+    rng: random.Random = random.Random(0)
+    data_view: memoryview = memoryview(data)
+    position: int = 0
+
+    while position < len(data):
+        piece_size: int = rng.randint(1, 65536)
+        connection.sendall(data_view[position:position + piece_size])
+        position += piece_size
+
+    connection.close()
+
+
+# how long processes.ProcessScanner.scan_posix() takes to look through every process (compared to doing that with psutil), and to only check on cached PIDs (this process's, standing in for all three)
+def benchmark_process_scanning(runs: int):
+    process_scanner: processes.ProcessScanner = processes.ProcessScanner(quiet_log())
+    this_process: psutil.Process = psutil.Process()
+    process_count: int = len(psutil.pids())
+    sweep_times: List[float] = []
+    psutil_sweep_times: List[float] = []
+    cached_times: List[float] = []
+    pidfd_times: List[float] = []
+
+    for run in range(runs):
+        process_scanner.all_pids_cached = False
+        start_time: float = time.perf_counter()
+        process_scanner.scan_posix()
+        sweep_times.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        process_scanner.sweep_psutil()
+        psutil_sweep_times.append(time.perf_counter() - start_time)
+
+    process_scanner.executables['posix'] = [this_process.name()] * 3
+    for program in process_scanner.executables['order']:
+        process_scanner.process_data[program] = process_scanner.process_data[program]._replace(pid=this_process.pid)
+        process_scanner.create_times[program] = this_process.create_time()
+
+    for run in range(runs):
+        process_scanner.all_pids_cached = True
+        start_time = time.perf_counter()
+        process_scanner.scan_posix()
+        cached_times.append(time.perf_counter() - start_time)
+
+    process_scanner.open_pidfds()
+    for run in range(runs if process_scanner.pidfds else 0):
+        start_time = time.perf_counter()
+        process_scanner.scan_posix()
+        pidfd_times.append(time.perf_counter() - start_time)
+
+    pidfd_result: str = f"{round(min(pidfd_times) * 1000, 3)} ms" if pidfd_times else "unavailable"
+    print(f"{process_count} processes: full sweep {round(min(sweep_times) * 1000, 2)} ms (just psutil.process_iter(): {round(min(psutil_sweep_times) * 1000, 2)} ms), "
+          f"cached PIDs {round(min(cached_times) * 1000, 3)} ms, with pidfds {pidfd_result} (swept again: {process_scanner.used_tasklist})")
+    process_scanner.close_pidfds()
+
+
+# how long ProcessScanner.sweep_proc() and sweep_psutil() take on a fake /proc (see write_fake_proc()) with each number of processes, since there usually aren't that many really running
+def benchmark_fake_process_scanning(runs: int, process_counts: List[int]):
+    if not sys.platform.startswith('linux'):
+        print("/proc is only on Linux")
+        return
+
+    process_scanner: processes.ProcessScanner = processes.ProcessScanner(quiet_log())
+    procfs_path_before: str = psutil.PROCFS_PATH
+
+    for process_count in process_counts:
+        fake_proc_dir: str = tempfile.mkdtemp()
+        fake_proc: str = os.path.join(fake_proc_dir, 'proc')
+        names: Dict[int, str] = {FAKE_PROC_FIRST_PID + process_count // 2: 'steam', FAKE_PROC_FIRST_PID + process_count * 3 // 4: 'hl2_linux',
+                                 FAKE_PROC_FIRST_PID + process_count - 1: 'Discord'}
+        write_fake_proc(fake_proc, process_count, names)
+        proc_sweep_times: List[float] = []
+        psutil_sweep_times: List[float] = []
+
+        try:
+            process_scanner.proc_path = fake_proc
+            psutil.PROCFS_PATH = fake_proc
+
+            for run in range(runs):
+                start_time: float = time.perf_counter()
+                found_proc: Dict[str, Tuple[int, float]] = process_scanner.sweep_proc()
+                proc_sweep_times.append(time.perf_counter() - start_time)
+
+                start_time = time.perf_counter()
+                found_psutil: Dict[str, Tuple[int, float]] = process_scanner.sweep_psutil()
+                psutil_sweep_times.append(time.perf_counter() - start_time)
+        finally:
+            psutil.PROCFS_PATH = procfs_path_before
+            shutil.rmtree(fake_proc_dir)
+
+        print(f"{process_count} fake processes: /proc sweep {round(min(proc_sweep_times) * 1000, 2)} ms, psutil sweep {round(min(psutil_sweep_times) * 1000, 2)} ms, "
+              f"{round(min(psutil_sweep_times) / min(proc_sweep_times), 2)}x faster (same results: {found_proc == found_psutil})")
+
+
+# makes a fake /proc with process_count processes, with PIDs from FAKE_PROC_FIRST_PID. they're named proc0 to proc96, except for the PIDs in names. each has the comm, stat, and
+# cmdline that ProcessScanner.sweep_proc() and psutil read, and the system's stat has the real boot time, so start times come out the same as for real processes
+def write_fake_proc(proc_path: str, process_count: int, names: Dict[int, str]):
+    with open('/proc/stat', 'rb') as system_stat_file:
+        btime_line: bytes = [line for line in system_stat_file if line.startswith(b'btime')][0]
+
+    os.mkdir(proc_path)
+    os.mkdir(os.path.join(proc_path, 'self'))
+    with open(os.path.join(proc_path, 'stat'), 'wb') as system_stat_file:
+        system_stat_file.write(b'cpu  1 2 3 4\n' + btime_line + b'processes 5000\n')
+    with open(os.path.join(proc_path, 'uptime'), 'w') as uptime_file:
+        uptime_file.write("1000.00 2000.00\n")
+
+    for pid in range(FAKE_PROC_FIRST_PID, FAKE_PROC_FIRST_PID + process_count):
+        name: str = names.get(pid, f'proc{pid % 97}')
+        os.mkdir(os.path.join(proc_path, str(pid)))
+        with open(os.path.join(proc_path, str(pid), 'comm'), 'w') as comm_file:
+            comm_file.write(f'{name}\n')
+        with open(os.path.join(proc_path, str(pid), 'stat'), 'w') as stat_file:
+            stat_file.write(f"{pid} ({name}) S 1 {pid} {pid} 0 -1 4194560 {' '.join(['0'] * 8)} 20 0 1 0 {pid * 3} 1000 10 {' '.join(['0'] * 30)}\n")
+        with open(os.path.join(proc_path, str(pid), 'cmdline'), 'w') as cmdline_file:
+            cmdline_file.write(f'/usr/bin/{name}\0')
+
+
+# best of a few forced (full) scans, then one more with tracemalloc on
+def interpret_once(log_path: str, kb_limit: float, runs: int = 5) -> Dict[str, float]:
+    app: tf2rp_main.TF2RichPresense = tf2rp_main.TF2RichPresense(quiet_log())
+    start_rss: int = peak_rss()
+    times: List[float] = []
+
+    for run in range(runs):
+        start_time: float = time.perf_counter()
+        app.interpret_console_log(log_path, [SYNTHETIC_USERNAME], kb_limit, True)
+        times.append(time.perf_counter() - start_time)
+
+    log_size: int = os.stat(log_path).st_size
+    scanned_bytes: int = min(log_size, int(kb_limit * 1024)) if kb_limit != float('inf') else log_size
+    with open(log_path, 'rb') as log_file:
+        log_file.seek(log_size - scanned_bytes)
+        scanned_lines: int = sum(chunk.count(b'\n') for chunk in iter(lambda: log_file.read(1048576), b''))
+
+    tracemalloc.start()
+    app.interpret_console_log(log_path, [SYNTHETIC_USERNAME], kb_limit, True)
+    allocated_kept, allocated_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'time': min(times), 'bytes': scanned_bytes, 'lines': scanned_lines, 'start_rss': start_rss, 'peak_rss': peak_rss(), 'allocated_peak': allocated_peak,
+            'allocated_kept': allocated_kept}
+
+
+# checks console_log.interpret() against a synthetic log's ground truth, with the log cut off at each point where the truth changes (and halfway to the next one). returns how many didn't match
+def verify_synthetic_log(log_path: str, max_checks: int = 2000) -> int:
+    with open(f'{log_path}.truth.jsonl', 'r') as truth_file:
+        truth: List[Tuple[int, str, str]] = [tuple(json.loads(truth_line)) for truth_line in truth_file]
+
+    # cut off a copy, from the end backwards, since truncating is much cheaper than copying again
+    check_offsets: List[Tuple[int, int]] = []
+    for truth_index in range(len(truth)):
+        next_offset: int = truth[truth_index + 1][0] if truth_index + 1 < len(truth) else os.stat(log_path).st_size
+        check_offsets.append((truth[truth_index][0], truth_index))
+        check_offsets.append((truth[truth_index][0] + (next_offset - truth[truth_index][0]) // 2, truth_index))
+
+    if len(check_offsets) > max_checks:
+        check_offsets = random.Random(0).sample(check_offsets, max_checks)
+
+    copy_path: str = os.path.join(tempfile.gettempdir(), 'benchmark_verify_console.log')
+    with open(log_path, 'rb') as log_file, open(copy_path, 'wb') as copy_file:
+        copy_file.write(log_file.read(max(offset for offset, truth_index in check_offsets)))
+
+    app: tf2rp_main.TF2RichPresense = tf2rp_main.TF2RichPresense(quiet_log())
+    mismatches: int = 0
+
+    for offset, truth_index in sorted(check_offsets, reverse=True):
+        # truths only change at the ends of lines, and a cut off line doesn't count yet, so the halfway points should still give the same result
+        os.truncate(copy_path, offset)
+        expected: Tuple[str, str] = truth[truth_index][1], truth[truth_index][2]
+        actual: Tuple[str, str] = app.interpret_console_log(copy_path, [SYNTHETIC_USERNAME], float('inf'), True)
+
+        if actual != expected:
+            mismatches += 1
+            print(f"At {offset}: expected {expected}, got {actual}")
+
+    os.remove(copy_path)
+    print(f"Checked {len(check_offsets)} offsets against {len(truth)} ground truths, {mismatches} mismatches")
+    return mismatches
+
+
+# a log that doesn't write anything, like tests.py uses
+def quiet_log() -> logger.Log:
+    log: logger.Log = logger.Log()
+    log.enabled = False
+    log.to_stderr = False
+    log.sentry_enabled = False
+    return log
+
+
+# the most memory this process has ever used
+def peak_rss() -> int:
+    memory_info = psutil.Process().memory_info()
+
+    if hasattr(memory_info, 'peak_wset'):  # Windows
+        return memory_info.peak_wset
+    elif sys.platform == 'darwin':
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    else:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# writes a console.log of at least size bytes, made of randomly picked play sessions (see synthetic_session()), and next to it a ground truth file (log_path + '.truth.jsonl') with the
+# [offset, map, class] that console_log.interpret() should give for any console.log cut off at or after that offset (and before the next one). returns the truth file's path
+def write_synthetic_log(log_path: str, size: int, seed: int = 0) -> str:
+    rng: random.Random = random.Random(seed)
+    sessions: List[Tuple[bytes, List[Tuple[int, str, str]]]] = []
+    written: int = 0
+
+    with open(log_path, 'wb') as log_file, open(f'{log_path}.truth.jsonl', 'w') as truth_file:
+        truth_file.write(f"{json.dumps([0, 'In menus', 'Not queued'])}\n")
+
+        while written < size:
+            # every session starts and ends in menus, so they can be put in any order. only making a limited number keeps generating a 1 GB log fast
+            if len(sessions) < SYNTHETIC_SESSIONS:
+                session_lines, session_truth = synthetic_session(rng)
+                sessions.append((''.join(session_lines).encode('utf-8'), session_truth))
+
+            session, session_truth = rng.choice(sessions)
+            log_file.write(session)
+
+            for session_offset, current_map, current_class in session_truth:
+                truth_file.write(f"{json.dumps([written + session_offset, current_map, current_class])}\n")
+
+            written += len(session)
+
+    return f'{log_path}.truth.jsonl'
+
+
+# one visit to a server: maybe queueing first, loading the map (maybe hosting it), some classes, lots of kill feed and chat, the odd map change, then back to menus. returns the lines,
+# and the byte offsets (in the session) after which interpret()'s result changes, with what it changes to
+def synthetic_session(rng: random.Random) -> Tuple[List[str], List[Tuple[int, str, str]]]:
+    lines: List[str] = []
+    truth: List[Tuple[int, str, str]] = []
+    session_offset: int = 0
+
+    def add_line(line: str, *new_state: str):
+        nonlocal session_offset
+        lines.append(line)
+        session_offset += len(line.encode('utf-8'))
+
+        if new_state:
+            truth.append((session_offset, *new_state))
+
+    for line_num in range(rng.randint(5, 50)):
+        add_line(f"{rng.choice(SYNTHETIC_MENUS_NOISE)}\n")
+
+    hosting: bool = False
+    if rng.random() < 0.6:
+        match_group: str = rng.choice(list(console_log.MATCH_TYPES))
+        add_line(f"[PartyClient] Entering queue for match group {match_group}\n", 'In menus', f'Queued for {console_log.MATCH_TYPES[match_group]}')
+
+        if rng.random() < 0.2:
+            add_line("[PartyClient] Leaving queue\n", 'In menus', 'Not queued')
+            return lines, truth
+    elif rng.random() < 0.1:
+        add_line("[PartyClient] Entering standby queue\n", 'In menus', "Queued for a party's match")
+    elif rng.random() < 0.3:
+        hosting = True
+
+    for map_num in range(rng.choice((1, 1, 1, 2, 3))):
+        if hosting:
+            add_line("SV_ActivateServer: setting tickrate to 66.7\n")
+
+        current_map: str = rng.choice(SYNTHETIC_MAPS)
+        displayed_map: str = f'{current_map} (hosting)' if hosting else current_map
+        add_line(f"Map: {current_map}\n", displayed_map, 'unselected')
+        players: List[str] = [f"{rng.choice(SYNTHETIC_NAMES)}{rng.randint(1, 99)}" for player_num in range(23)] + [SYNTHETIC_USERNAME]
+
+        for line_num in range(rng.randint(100, 3000)):
+            line_type: float = rng.random()
+
+            if line_type < 0.01:
+                tf2_class: str = rng.choice(console_log.TF2_CLASSES)
+                add_line(f"{tf2_class} selected \n", displayed_map, tf2_class)
+            elif line_type < 0.6:
+                add_line(f"{rng.choice(players)} killed {rng.choice(players)} with {rng.choice(SYNTHETIC_WEAPONS)}.{' (crit)' if rng.random() < 0.05 else ''}\n")
+            elif line_type < 0.97:
+                add_line(f"{'*DEAD* ' if rng.random() < 0.3 else ''}{rng.choice(players)} :  {rng.choice(SYNTHETIC_CHAT)}\n")
+            else:
+                add_line(f"{rng.choice(SYNTHETIC_GAME_NOISE)}\n")
+
+    if hosting:
+        add_line("Server shutting down\n", 'In menus', 'Not queued')
+    elif rng.random() < 0.5:
+        add_line(f"{SYNTHETIC_USERNAME}: Disconnect by user.\n", 'In menus', 'Not queued')
+    else:
+        add_line("Disconnect: #TF_Idle_kicked\n", 'In menus', 'Not queued')
+
+    return lines, truth
+
+
+# best of a few runs in seconds, and peak memory allocated during one run
+def time_scanner(scanner: Callable, log_bytes: bytes, user_usernames: List[str], runs: int = 10) -> Tuple[float, int]:
+    times: List[float] = []
+
+    for run in range(runs):
+        start_time: float = time.perf_counter()
+        scanner(log_bytes, user_usernames)
+        times.append(time.perf_counter() - start_time)
+
+    tracemalloc.start()
+    scanner(log_bytes, user_usernames)
+    peak_memory: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(times), peak_memory
+
+
+# how console_log.interpret() used to read lines: decode all of them, then a chain of "in" checks
+def scan_old(log_bytes: Union[bytes, TextIO], user_usernames: List[str]) -> List[str]:
+    lines: Iterable[str] = io.TextIOWrapper(io.BytesIO(log_bytes), console_log.CONSOLE_LOG_ENCODING, 'replace').readlines() if isinstance(log_bytes, bytes) else log_bytes
+    events: List[str] = []
+
+    for line in lines:
+        if 'with' in line and 'Kataiser' not in line:
+            continue
+
+        for menus_message in console_log.MENUS_MESSAGES:
+            if menus_message in line:
+                events.append('menus')
+                break
+
+        if line.endswith(' selected \n'):
+            events.append('selected')
+        elif line.startswith('Map:'):
+            events.append('map')
+        elif '[PartyClient] L' in line:
+            events.append('leave queue')
+        elif '[PartyClient] Entering q' in line:
+            events.append('enter queue')
+        elif 'Disconnect by user' in line and [un for un in user_usernames if un in line]:
+            events.append('disconnect')
+        elif '[PartyClient] Entering s' in line:
+            events.append('enter standby')
+        elif 'SV_ActivateServer' in line:
+            events.append('server')
+
+        if 'Kataiser' in line:
+            events.append('kataiser')
+
+    return events
+
+
+# find only the lines with markers in the undecoded bytes, then classify each
+def scan_new(log_bytes: bytes, user_usernames: List[str]) -> List[str]:
+    events: List[str] = []
+
+    for line in console_log.find_marker_lines(log_bytes, 0, len(log_bytes), ('Kataiser',)):
+        if 'with' in line and 'Kataiser' not in line:
+            continue
+
+        line_event, menus_message_found, players_found = console_log.classify_line(line, user_usernames, ('Kataiser',))
+        events.append(line_event)
+
+    return events
+
+
+if __name__ == '__main__':
+    main()
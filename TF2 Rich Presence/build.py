@@ -58,10 +58,15 @@ def main(version_num='v1.13.2'):
         print("Copied", shutil.copy('build.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('cython_compile.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('tests.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('console_archive.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('console_log.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('console_players.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('logger.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('configs.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('custom_maps.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('file_watcher.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('log_source.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('proc_events.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('processes.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('updater.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('settings.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
@@ -74,6 +79,8 @@ def main(version_num='v1.13.2'):
         print("Copied", shutil.copy('map list generator.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('thumb formatter.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('changelog_generator.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('benchmark.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
+        print("Copied", shutil.copy('console_history.py', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('Changelogs_source.html', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('maps.json', Path(f'{github_repo_path}/TF2 Rich Presence')))
         print("Copied", shutil.copy('localization.json', Path(f'{github_repo_path}/TF2 Rich Presence')))
@@ -232,6 +239,15 @@ def main(version_num='v1.13.2'):
     else:
         raise SyntaxError("Whatever the Linux/MacOS equivalent of xcopy is")
 
+    # pyahocorasick is a compiled module, so it's installed into the interpreter's packages (for this Python) instead of being copied in from somewhere
+    with open('requirements.txt', 'r') as requirements_file:
+        pyahocorasick_requirement = [r.rstrip('\n') for r in requirements_file.readlines() if r.startswith('pyahocorasick==')][0]
+    python_packages = Path(f'{python_target}/packages')
+    if not [file for file in os.listdir(python_packages) if file.startswith('ahocorasick')]:
+        subprocess.run(f'{sys.executable} -m pip install {pyahocorasick_requirement} --target \"{python_packages}\" --no-deps')
+    assert [file for file in os.listdir(python_packages) if file.startswith('ahocorasick')], "pyahocorasick didn't install"
+    print(f"Bundled {pyahocorasick_requirement}")
+
     # compile PYCs, for faster initial load times
     # TODO: if it's not too slow, determine which ones need to be deleted at build time (maybe cache somehow?)
     print("Compiling PYCs")
@@ -0,0 +1,188 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+# cython: language_level=3
+
+import ctypes
+import ctypes.util
+import gzip
+import json
+import os
+import sys
+import time
+from typing import BinaryIO, List, Union
+
+import console_log
+
+CONSOLE_ARCHIVE_DIR: str = 'console_archive'  # where trimmed parts of console.log go, if archive_console_log is enabled
+ARCHIVE_CHUNK_BYTES: int = 16777216  # uncompressed size of each archive chunk before starting the next one
+
+
+# removes all but the last keep_bytes of console.log, in place. memory use doesn't depend on the file's size, and on Linux it might not even need to copy anything
+def trim(log, console_log_path: str, keep_bytes: int, chunk_size: int = 1048576, allow_collapse: bool = True, archive_dir: Union[str, None] = None):
+    try:
+        with open(console_log_path, 'rb+') as consolelog_file:
+            trim_start_time: float = time.perf_counter()
+            cut_bytes: int = os.fstat(consolelog_file.fileno()).st_size - keep_bytes
+
+            if cut_bytes <= 0:
+                return
+
+            # collapsing can only remove whole blocks, so decide how much will actually be removed first, so that exactly that gets archived
+            collapse_bytes: int = collapsible_bytes(consolelog_file, cut_bytes) if allow_collapse else 0
+            if collapse_bytes:
+                cut_bytes = collapse_bytes
+
+            if archive_dir:
+                archive(log, consolelog_file, cut_bytes, archive_dir, chunk_size)
+
+            if collapse_bytes and collapse_file_start(consolelog_file, collapse_bytes):
+                log.debug(f"Trimmed console.log by collapsing {cut_bytes} bytes in {round(time.perf_counter() - trim_start_time, 2)} seconds")
+                return
+
+            # move everything after the cut to the start, a chunk at a time (always into the same buffer), then cut off the leftovers at the end
+            chunk: bytearray = bytearray(chunk_size)
+            chunk_view: memoryview = memoryview(chunk)
+            read_position: int = cut_bytes
+            write_position: int = 0
+
+            while True:
+                consolelog_file.seek(read_position)
+                chunk_length: int = consolelog_file.readinto(chunk)
+
+                if not chunk_length:
+                    break
+
+                consolelog_file.seek(write_position)
+                consolelog_file.write(chunk_view[:chunk_length])
+                read_position += chunk_length
+                write_position += chunk_length
+
+            consolelog_file.truncate(write_position)
+            log.debug(f"Trimmed console.log by copying {write_position} bytes in {round(time.perf_counter() - trim_start_time, 2)} seconds")
+    except OSError as error:
+        log.error(f"Failed to trim console.log: {error}")
+
+
+# how much of the first cut_bytes of a file collapse_file_start() would be able to remove (0 if none), since it only works in whole filesystem blocks
+def collapsible_bytes(file: BinaryIO, cut_bytes: int) -> int:
+    if not sys.platform.startswith('linux'):
+        return 0
+
+    file.flush()
+    file_stat: os.stat_result = os.fstat(file.fileno())
+    collapse_bytes: int = cut_bytes - cut_bytes % file_stat.st_blksize
+    if collapse_bytes <= 0 or collapse_bytes >= file_stat.st_size:  # it also can't reach the end of the file
+        return 0
+
+    return collapse_bytes
+
+
+# removes (roughly) the first cut_bytes of a file without copying anything, with fallocate(FALLOC_FL_COLLAPSE_RANGE). only on Linux, and only some filesystems (ext4 and XFS)
+# support it. since it only works in whole filesystem blocks, up to a block less gets removed (see collapsible_bytes()). returns whether it worked
+def collapse_file_start(file: BinaryIO, cut_bytes: int) -> bool:
+    FALLOC_FL_COLLAPSE_RANGE: int = 0x08
+
+    collapse_bytes: int = collapsible_bytes(file, cut_bytes)
+    if not collapse_bytes:
+        return False
+
+    try:
+        libc: ctypes.CDLL = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fallocate = libc.fallocate64 if hasattr(libc, 'fallocate64') else libc.fallocate
+        fallocate.argtypes = (ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64)
+    except (OSError, AttributeError):
+        return False
+
+    return fallocate(file.fileno(), FALLOC_FL_COLLAPSE_RANGE, 0, collapse_bytes) == 0
+
+
+# streams the first archive_bytes of console.log into gzipped chunk files (console_000000.log.gz, etc.), starting a new chunk every ARCHIVE_CHUNK_BYTES. each chunk gets an index
+# (console_000000.json) with its range of bytes in the whole archive, the range of con_timestamp times in it (None if con_timestamp is off), and the maps loaded in it
+def archive(log, consolelog_file: BinaryIO, archive_bytes: int, archive_dir: str, read_size: int = 1048576, chunk_bytes: int = ARCHIVE_CHUNK_BYTES):
+    archive_start_time: float = time.perf_counter()
+    os.makedirs(archive_dir, exist_ok=True)
+    archive_index: List[dict] = load_archive_index(archive_dir)
+    chunk_num: int = archive_index[-1]['chunk'] + 1 if archive_index else 0
+    archive_position: int = archive_index[-1]['bytes'][1] if archive_index else 0  # byte ranges count from the start of the first chunk, since console.log's own offsets change
+    chunks_written: int = 0
+
+    buffer: bytearray = bytearray(read_size)
+    buffer_view: memoryview = memoryview(buffer)
+    unfinished_line: bytes = b''  # the part of a line that was cut off by the end of a read
+    chunk_file: Union[gzip.GzipFile, None] = None
+    chunk_index: dict = {}
+    read_position: int = 0
+    consolelog_file.seek(0)
+
+    while read_position < archive_bytes:
+        if not chunk_file:
+            chunk_file = gzip.open(os.path.join(archive_dir, f'console_{chunk_num:06}.log.gz'), 'wb')
+            chunk_index = {'chunk': chunk_num, 'bytes': [archive_position, archive_position], 'time': [None, None], 'maps': [], 'archived': None}
+
+        read_length: int = consolelog_file.readinto(buffer_view[:min(read_size, archive_bytes - read_position)])
+        if not read_length:
+            break
+
+        chunk_file.write(buffer_view[:read_length])
+        read_position += read_length
+        archive_position += read_length
+
+        # only whole lines are checked for maps and timestamps, so a line split between reads counts for the read (and chunk) it ends in
+        lines_end: int = buffer.rfind(b'\n', 0, read_length) + 1
+        if lines_end:
+            lines: bytes = unfinished_line + buffer[:lines_end]
+            unfinished_line = bytes(buffer[lines_end:read_length])
+            update_archive_index(chunk_index, lines)
+        elif len(unfinished_line) < read_size:
+            unfinished_line += buffer[:read_length]
+
+        chunk_index['bytes'][1] = archive_position
+        if archive_position - chunk_index['bytes'][0] >= chunk_bytes or read_position >= archive_bytes:
+            chunk_file.close()
+            chunk_file = None
+            save_archive_index(archive_dir, chunk_index)
+            chunk_num += 1
+            chunks_written += 1
+
+    if chunk_file:
+        chunk_file.close()
+        save_archive_index(archive_dir, chunk_index)
+        chunks_written += 1
+
+    log.debug(f"Archived {read_position} bytes of console.log into {chunks_written} chunk(s) in {archive_dir} in {round(time.perf_counter() - archive_start_time, 2)} seconds")
+
+
+# adds the timestamps and maps in some complete lines to an archive chunk's index
+def update_archive_index(chunk_index: dict, lines: bytes):
+    timestamps: List[bytes] = console_log.CON_TIMESTAMP_REGEX.findall(lines)
+    if timestamps:
+        if not chunk_index['time'][0]:
+            chunk_index['time'][0] = console_log.con_timestamp_time(timestamps[0])
+
+        chunk_index['time'][1] = console_log.con_timestamp_time(timestamps[-1])
+
+    # console_events() takes care of con_timestamp's timestamps at the start of lines
+    for event in console_log.console_events(console_log.find_marker_lines(lines, 0, len(lines), ()), [], False, ()):
+        if isinstance(event, console_log.MapLoaded) and event.map_name not in chunk_index['maps']:
+            chunk_index['maps'].append(event.map_name)
+
+
+# writes an archive chunk's index next to it
+def save_archive_index(archive_dir: str, chunk_index: dict):
+    chunk_index['archived'] = int(time.time())
+
+    with open(os.path.join(archive_dir, f'console_{chunk_index["chunk"]:06}.json'), 'w') as index_file:
+        json.dump(chunk_index, index_file, separators=(',', ':'))
+
+
+# reads every archive chunk's index (see archive()), in order. a chunk's contents are at f'console_{index["chunk"]:06}.log.gz'
+def load_archive_index(archive_dir: str) -> List[dict]:
+    archive_index: List[dict] = []
+
+    if os.path.isdir(archive_dir):
+        for index_filename in sorted(os.listdir(archive_dir)):
+            if index_filename.startswith('console_') and index_filename.endswith('.json'):
+                with open(os.path.join(archive_dir, index_filename), 'r') as index_file:
+                    archive_index.append(json.load(index_file))
+
+    return archive_index
@@ -0,0 +1,300 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import re
+from typing import BinaryIO, Dict, Iterable, List, Pattern, Tuple, Union
+
+import console_log
+
+TASK_BYTES: int = 67108864  # plain console.logs are split into parts of this size, so that one huge log still uses every core
+READ_BYTES: int = 4194304
+TIME_SAMPLE_BYTES: int = 4096  # besides lines that matter, the time is checked about this often, to notice gaps
+SESSION_GAP_SECONDS: int = 1800  # nothing in console.log for this long means TF2 was closed, so the session ends and the state resets
+ARCHIVE_CHUNK_REGEX: Pattern = re.compile(r'console_\d{6}\.log\.gz')  # see console_archive.archive()
+
+
+# play history from any number of console.logs (and console_archive.archive() archives): maps played, time on each map and class, time queued, and each visit to a map.
+# times need con_timestamp to have been on, otherwise only maps and visits are counted
+def main():
+    parser = argparse.ArgumentParser(description="Play history from console.logs, and directories of them or of archived console.log chunks")
+    parser.add_argument('paths', nargs='+', help="Files or directories (searched recursively) to analyze")
+    parser.add_argument('--usernames', nargs='*', default=[], help="Your Steam username(s), to recognize disconnecting")
+    parser.add_argument('--processes', type=int, default=None, help="How many worker processes to use (default: one per core)")
+    parser.add_argument('--output', default=None, help="Also save the full history, including every visit, as JSON here")
+    args = parser.parse_args()
+
+    history: ConsoleHistory = analyze(args.paths, args.usernames, args.processes)
+    print(history.summary())
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(history.to_dict(), output_file, indent=4)
+
+        print(f"Saved full history to {args.output}")
+
+
+# what's been learned from console.logs so far. parts of logs have to be added in order, since each line's meaning can depend on the ones before it
+class ConsoleHistory:
+    __slots__ = ('user_usernames', 'with_optimization', 'maps_played', 'map_time', 'class_time', 'queue_time', 'visits', 'state', 'last_time', 'visit', 'source')
+
+    def __init__(self, user_usernames: List[str]):
+        self.user_usernames: List[str] = user_usernames
+        self.with_optimization: bool = not [username for username in user_usernames if 'with' in username]  # same as in console_log.interpret()
+        self.maps_played: Dict[str, int] = {}
+        self.map_time: Dict[str, int] = {}
+        self.class_time: Dict[str, int] = {}
+        self.queue_time: Dict[str, int] = {}
+        self.visits: List[dict] = []
+
+        self.state: console_log.ConsoleLogState = console_log.ConsoleLogState()
+        self.last_time: Union[int, None] = None
+        self.visit: Union[dict, None] = None
+        self.source: str = ''
+
+    def __repr__(self):
+        return f"console_history.ConsoleHistory ({sum(self.maps_played.values())} maps played, {len(self.visits)} visits)"
+
+    # a line that matters (with its con_timestamp removed), and/or the time at which it was written
+    def add(self, line_time: Union[int, None], line: Union[str, None]):
+        if line_time is not None:
+            if self.last_time is not None and line_time - self.last_time > SESSION_GAP_SECONDS:
+                self.end_session()
+            elif self.last_time is not None and line_time > self.last_time:  # clocks can go backwards, but time can't be spent backwards
+                self.spend_time(line_time - self.last_time)
+
+            self.last_time = line_time
+
+        if line:
+            events: List[console_log.ConsoleLogEvent] = list(console_log.console_events([line], self.user_usernames, self.with_optimization, ()))
+            console_log.reduce_events(self.state, events, False)
+
+            if [event for event in events if type(event) is console_log.MapLoaded]:
+                self.end_visit()
+                self.maps_played[self.state.current_map] = self.maps_played.get(self.state.current_map, 0) + 1
+                self.visit = {'source': self.source, 'map': self.state.current_map, 'hosting': self.state.hosting, 'start': self.last_time, 'end': None, 'seconds': 0, 'classes': {}}
+            elif self.state.in_menus:
+                self.end_visit()
+
+    # time between two lines counts for whatever the state was before the second one
+    def spend_time(self, seconds: int):
+        current_map: str = self.state.current_map
+        current_class: str = self.state.current_class
+
+        if not self.state.in_menus:
+            self.map_time[current_map] = self.map_time.get(current_map, 0) + seconds
+
+            if self.visit:
+                self.visit['seconds'] += seconds
+
+            if current_class in console_log.TF2_CLASSES:
+                self.class_time[current_class] = self.class_time.get(current_class, 0) + seconds
+
+                if self.visit:
+                    self.visit['classes'][current_class] = self.visit['classes'].get(current_class, 0) + seconds
+        elif self.state.queue:
+            self.queue_time[self.state.queue] = self.queue_time.get(self.state.queue, 0) + seconds
+
+    def end_visit(self):
+        if self.visit:
+            self.visit['end'] = self.last_time
+            self.visits.append(self.visit)
+            self.visit = None
+
+    # TF2 was (probably) closed, or the log ended
+    def end_session(self):
+        self.end_visit()
+        self.state = console_log.ConsoleLogState()
+        self.last_time = None
+
+    def summary(self) -> str:
+        summary_lines: List[str] = [f"{sum(self.maps_played.values())} maps played, {len(self.visits)} visits, {format_seconds(sum(self.map_time.values()))} on servers"]
+
+        for current_map in sorted(self.maps_played, key=lambda m: (-self.map_time.get(m, 0), -self.maps_played[m], m)):
+            summary_lines.append(f"    {current_map}: played {self.maps_played[current_map]} time(s), {format_seconds(self.map_time.get(current_map, 0))}")
+        for tf2_class in sorted(self.class_time, key=lambda c: (-self.class_time[c], c)):
+            summary_lines.append(f"    As {tf2_class}: {format_seconds(self.class_time[tf2_class])}")
+        for queue in sorted(self.queue_time, key=lambda q: (-self.queue_time[q], q)):
+            summary_lines.append(f"    Queued for {queue}: {format_seconds(self.queue_time[queue])}")
+
+        return '\n'.join(summary_lines)
+
+    def to_dict(self) -> dict:
+        return {'maps_played': self.maps_played, 'map_time': self.map_time, 'class_time': self.class_time, 'queue_time': self.queue_time, 'visits': self.visits}
+
+
+# analyzes every console.log (or archived chunk of one) in some files and directories, with a pool of worker processes doing the scanning. the parts they return are added to the
+# history strictly in order, so the result doesn't depend on which worker finishes first
+def analyze(paths: List[str], user_usernames: List[str], processes: Union[int, None] = None, task_bytes: int = TASK_BYTES) -> ConsoleHistory:
+    history: ConsoleHistory = ConsoleHistory(user_usernames)
+    streams: List[Tuple[str, List[Tuple[str, int, int]]]] = find_streams(paths, task_bytes)
+    parts: List[Tuple[str, int, int]] = [part for stream_name, stream_parts in streams for part in stream_parts]
+
+    if processes == 1:
+        add_streams(history, streams, map(scan_part, parts))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            add_streams(history, streams, pool.imap(scan_part, parts))  # imap keeps the results in order
+
+    return history
+
+
+# adds each stream's scanned parts to the history, joining up lines that were split between parts
+def add_streams(history: ConsoleHistory, streams: List[Tuple[str, List[Tuple[str, int, int]]]], scanned_parts: Iterable[tuple]):
+    scanned_parts_iter = iter(scanned_parts)
+
+    for stream_name, stream_parts in streams:
+        history.source = stream_name
+        unfinished_line: bytes = b''
+
+        for part in stream_parts:
+            part_head, part_items, part_tail = next(scanned_parts_iter)
+            unfinished_line += part_head
+
+            if not unfinished_line.endswith(b'\n'):  # this part didn't even finish a line
+                continue
+
+            for line_time, line in scan_lines(unfinished_line, 0, len(unfinished_line)) + part_items:
+                history.add(line_time, line)
+
+            unfinished_line = part_tail
+
+        history.end_session()  # an unfinished line at the very end is ignored, just like interpret() does
+
+
+# every console.log to analyze, as (name, parts). each part is (path, start, end), with end being -1 for a whole gzipped file. a directory's archive chunks are one stream, in order
+def find_streams(paths: List[str], task_bytes: int) -> List[Tuple[str, List[Tuple[str, int, int]]]]:
+    streams: List[Tuple[str, List[Tuple[str, int, int]]]] = []
+
+    for path in paths:
+        if not os.path.isdir(path):
+            streams.append((path, file_parts(path, task_bytes)))
+            continue
+
+        for dir_path, dir_names, filenames in os.walk(path):
+            dir_names.sort()
+            archive_chunks: List[str] = sorted(filename for filename in filenames if ARCHIVE_CHUNK_REGEX.fullmatch(filename))
+
+            if archive_chunks:
+                streams.append((dir_path, [(os.path.join(dir_path, archive_chunk), 0, -1) for archive_chunk in archive_chunks]))
+
+            for filename in sorted(filenames):
+                if filename not in archive_chunks and (filename.endswith('.log') or filename.endswith('.log.gz')):
+                    streams.append((os.path.join(dir_path, filename), file_parts(os.path.join(dir_path, filename), task_bytes)))
+
+    return streams
+
+
+# splits a file into parts for the workers, unless it's gzipped (which can't be read from the middle)
+def file_parts(path: str, task_bytes: int) -> List[Tuple[str, int, int]]:
+    if path.endswith('.gz'):
+        return [(path, 0, -1)]
+
+    file_size: int = os.stat(path).st_size
+    return [(path, part_start, min(part_start + task_bytes, file_size)) for part_start in range(0, file_size, task_bytes)]
+
+
+# what a worker does: reads a part of a file in chunks, and returns (head, items, tail). head is everything up to and including the first newline (or all of it, if there
+# isn't one), since that line might have started in the previous part, and tail is everything after the last newline. items are (time, line) from scan_lines() for the rest
+def scan_part(part: Tuple[str, int, int]) -> Tuple[bytes, List[Tuple[Union[int, None], Union[str, None]]], bytes]:
+    path, part_start, part_end = part
+    part_head: Union[bytes, None] = None
+    part_items: List[Tuple[Union[int, None], Union[str, None]]] = []
+    unfinished_line: bytes = b''
+
+    log_file: BinaryIO
+    with gzip.open(path, 'rb') if part_end == -1 else open(path, 'rb') as log_file:
+        log_file.seek(part_start)
+        bytes_left: Union[int, float] = part_end - part_start if part_end != -1 else float('inf')
+
+        while bytes_left > 0:
+            chunk: bytes = log_file.read(int(min(READ_BYTES, bytes_left)))
+            if not chunk:
+                break
+
+            bytes_left -= len(chunk)
+            chunk = unfinished_line + chunk
+            lines_start: int = 0
+
+            if part_head is None:
+                lines_start = chunk.find(b'\n') + 1
+                if not lines_start:
+                    unfinished_line = chunk
+                    continue
+
+                part_head = chunk[:lines_start]
+
+            lines_end: int = max(chunk.rfind(b'\n') + 1, lines_start)
+            part_items.extend(scan_lines(chunk, lines_start, lines_end))
+            unfinished_line = chunk[lines_end:]
+
+    if part_head is None:
+        return unfinished_line, [], b''
+    else:
+        return part_head, part_items, unfinished_line
+
+
+# the lines that matter in buffer[start:end] (which is whole lines), with their con_timestamp times (or None) and without the timestamps, plus every so often just a time. in order
+def scan_lines(buffer: bytes, start: int, end: int) -> List[Tuple[Union[int, None], Union[str, None]]]:
+    positioned_items: List[Tuple[int, Union[int, None], Union[str, None]]] = []
+    timestamp_cache: Dict[bytes, int] = {}
+
+    for line_start, line_end in console_log.find_marker_line_spans(buffer, start, end, ()):
+        timestamp_match = console_log.CON_TIMESTAMP_REGEX.match(buffer, line_start)
+        line: str = console_log.decode_lines(buffer, [(timestamp_match.end() if timestamp_match else line_start, line_end)])[0]
+        positioned_items.append((line_start, timestamp_time(timestamp_match, timestamp_cache), line))
+
+    # the first line after every TIME_SAMPLE_BYTES, and the last line
+    sample_starts: List[int] = [buffer.find(b'\n', sample_position, end) + 1 for sample_position in range(start, end, TIME_SAMPLE_BYTES)]
+    sample_starts.append(buffer.rfind(b'\n', start, end - 1) + 1 or start)
+
+    for sample_start in sample_starts:
+        if start <= sample_start < end:
+            timestamp_match = console_log.CON_TIMESTAMP_REGEX.match(buffer, sample_start)
+            if timestamp_match:
+                positioned_items.append((sample_start, timestamp_time(timestamp_match, timestamp_cache), None))
+
+    positioned_items.sort(key=lambda item: (item[0], item[2] is not None))  # a time goes before a line from the same position
+    items: List[Tuple[Union[int, None], Union[str, None]]] = [(line_time, line) for position, line_time, line in positioned_items]
+
+    # a time between two other times only matters if there's a gap (or the clock went backwards), so leave most of them out to save adding them to the history one by one
+    kept_items: List[Tuple[Union[int, None], Union[str, None]]] = items[:1]
+    for item_index in range(1, len(items) - 1):
+        previous_time, line = items[item_index - 1][0], items[item_index][1]
+        line_time, next_time = items[item_index][0], items[item_index + 1][0]
+
+        if line or items[item_index - 1][1] or items[item_index + 1][1] or None in (previous_time, line_time, next_time) or \
+                not 0 <= line_time - previous_time <= SESSION_GAP_SECONDS or not 0 <= next_time - line_time <= SESSION_GAP_SECONDS:
+            kept_items.append(items[item_index])
+
+    return kept_items + items[-1:] if len(items) > 1 else kept_items
+
+
+# the time from a con_timestamp match (or None), with lines from the same second only parsed once
+def timestamp_time(timestamp_match, timestamp_cache: Dict[bytes, int]) -> Union[int, None]:
+    if not timestamp_match:
+        return None
+
+    timestamp: bytes = timestamp_match.group(1)
+    if timestamp not in timestamp_cache:
+        timestamp_cache[timestamp] = console_log.con_timestamp_time(timestamp)
+
+    return timestamp_cache[timestamp]
+
+
+# e.g. "2.5 hours"
+def format_seconds(seconds: int) -> str:
+    if seconds >= 3600:
+        return f"{round(seconds / 3600, 1)} hours"
+    elif seconds >= 60:
+        return f"{round(seconds / 60, 1)} minutes"
+    else:
+        return f"{seconds} seconds"
+
+
+if __name__ == '__main__':
+    main()
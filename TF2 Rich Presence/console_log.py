@@ -2,186 +2,896 @@
 # https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
 # cython: language_level=3
 
+import functools
+import locale
+import mmap
 import os
-from typing import Dict, List, Tuple, Union
+import re
+import stat
+import time
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Pattern, Set, Tuple, Union
 
-from colorama import Fore, Style
+from colorama import Style
 
+import console_players
 import launcher
 import localization
+import log_source
 import settings
+import utils
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CONSOLE_LOG_ENCODING: str = locale.getpreferredencoding(False)  # what open() uses by default, which is what console.log has always been read as
+MATCH_TYPES: Dict[str, str] = {'12v12 Casual Match': 'Casual', 'MvM Practice': 'MvM (Boot Camp)', 'MvM MannUp': 'MvM (Mann Up)', '6v6 Ladder Match': 'Competitive'}
+TF2_CLASSES: Tuple[str, ...] = ('Scout', 'Soldier', 'Pyro', 'Demoman', 'Heavy', 'Engineer', 'Medic', 'Sniper', 'Spy')
+MENUS_MESSAGES: Tuple[str, ...] = ('Server shutting down', 'For FCVAR_REPLICATED', '[TF Workshop]', 'Lobby destroyed', 'Disconnect:', 'destroyed Lobby', 'destroyed CAsyncWavDataCache',
+                                   'Missing map', 'Host_Error', 'SoundEmitter:')
+# the other strings interpret() looks for (besides " selected" at the end of a line) and what they mean, in order of precedence if a line has multiple
+LINE_EVENT_MARKERS: Dict[str, str] = {'Map:': 'map',  # full line: "Map: " + map name
+                                      '[PartyClient] L': 'leave queue',  # full line: "[PartyClient] Leaving queue"
+                                      '[PartyClient] Entering q': 'enter queue',  # full line: "[PartyClient] Entering queue for match group " + whatever mode
+                                      'Disconnect by user': 'disconnect',
+                                      '[PartyClient] Entering s': 'enter standby',  # full line: "[PartyClient] Entering standby queue"
+                                      'SV_ActivateServer': 'server'}  # full line: "SV_ActivateServer: setting tickrate to 66.7"
+CON_TIMESTAMP_REGEX: Pattern = re.compile(rb'^(\d\d/\d\d/\d{4} - \d\d:\d\d:\d\d): ', re.MULTILINE)  # what "con_timestamp 1" puts at the start of lines
+CON_TIMESTAMP_BYTES: int = 23  # the length of one of those, e.g. "10/18/2019 - 12:00:01: "
+CON_TIMESTAMP_LINE_REGEX: Pattern = re.compile(r'(\d\d/\d\d/\d{4} - \d\d:\d\d:\d\d): ')  # the same, for matching at the start of a decoded line
+WATCHLIST_CHUNK_BYTES: int = 1048576  # how much of console.log is searched for watched players at a time
+# lines longer than this (newline included) only have their start read, which is where every marker that matters is anyway. bind spam and broken plugins can print lines of
+# many MB, which would otherwise be copied and decoded whole
+CONSOLE_LINE_MAX_BYTES: int = 4096
+# how much of console.log is searched and interpreted at a time, so that a scan's memory use doesn't depend on console_scan_kb. must be more than CONSOLE_LINE_MAX_BYTES
+CONSOLE_SCAN_BUFFER_BYTES: int = 1048576
+
+
+# what a scan of console.log has learned so far, kept between scans so that only newly appended lines need to be read
+class ConsoleLogState:
+    __slots__ = ('current_map', 'current_class', 'just_started_server', 'server_still_running', 'players_seen', 'map_line_used', 'class_line_used', 'path', 'inode', 'offset',
+                 'tail_hash', 'kb_limit', 'saved_offset', 'kills', 'deaths', 'weapons', 'map_started', 'queue_started')
+
+    def __init__(self, path: str = '', inode: int = 0, offset: int = 0, kb_limit: float = 0.0):
+        self.current_map: str = 'In menus'
+        self.current_class: str = 'Not queued'
+        self.just_started_server: bool = False
+        self.server_still_running: bool = False
+        self.players_seen: Dict[str, str] = {}  # watched player: the map they were last seen on, since the last map loaded
+        self.map_line_used: str = ''
+        self.class_line_used: str = ''
+
+        # where (and in which file) the next scan continues from, always the start of a line
+        self.path: str = path
+        self.inode: int = inode
+        self.offset: int = offset
+        self.tail_hash: int = 1  # adler32 of the (up to 64) bytes right before offset, to detect the file being rewritten in place
+        self.kb_limit: float = kb_limit
+        self.saved_offset: int = -1  # offset when last saved to DB.json
+
+        # kill feed stats for the user on the current map, only counted if the kill_stats setting is enabled
+        self.kills: int = 0
+        self.deaths: int = 0
+        self.weapons: Dict[str, int] = {}  # weapon: kills with it
+
+        # when the current map was loaded and the current queue was entered, from con_timestamp (so None if that's off, or if not on a map or queued)
+        self.map_started: Union[int, None] = None
+        self.queue_started: Union[int, None] = None
+
+    def __repr__(self):
+        return f"console_log.ConsoleLogState ({self.current_map}, {self.current_class}, offset={self.offset})"
+
+    @property
+    def in_menus(self) -> bool:
+        return self.current_map == 'In menus'
+
+    # whether the user is on a server they started themselves
+    @property
+    def hosting(self) -> bool:
+        return self.server_still_running and not self.in_menus
+
+    # what's being queued for (e.g. "Casual"), or an empty string if not queued or if that's hidden
+    @property
+    def queue(self) -> str:
+        return self.current_class[11:] if self.current_class.startswith('Queued for ') else ''
+
+
+# what interpret() learns from a line of console.log. a line can cause multiple, in the order they should be applied
+class ConsoleLogEvent:
+    __slots__ = ('line',)
+
+    def __init__(self, line: str):
+        self.line: str = line
+
+    def __repr__(self):
+        return f"console_log.{type(self).__name__} ({self.line[:-1]})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__ + ConsoleLogEvent.__slots__)
+
+
+# one of MENUS_MESSAGES, which always means being in menus
+class MenusEntered(ConsoleLogEvent):
+    __slots__ = ()
+
+
+class MapLoaded(ConsoleLogEvent):
+    __slots__ = ('map_name',)
+
+    def __init__(self, line: str, map_name: str):
+        super().__init__(line)
+        self.map_name: str = map_name
+
+
+class ClassSelected(ConsoleLogEvent):
+    __slots__ = ('tf2_class',)
+
+    def __init__(self, line: str, tf2_class: str):
+        super().__init__(line)
+        self.tf2_class: str = tf2_class
+
+
+# match_group is from the log (e.g. "12v12 Casual Match", see MATCH_TYPES), or None for the standby queue (joining a party's match)
+class QueueEntered(ConsoleLogEvent):
+    __slots__ = ('match_group',)
+
+    def __init__(self, line: str, match_group: Union[str, None]):
+        super().__init__(line)
+        self.match_group: Union[str, None] = match_group
+
+
+class QueueLeft(ConsoleLogEvent):
+    __slots__ = ()
+
+
+# the user disconnecting from a server
+class Disconnected(ConsoleLogEvent):
+    __slots__ = ()
+
+
+# a local server starting, which means the user is hosting if it's followed by a map loading
+class ServerActivated(ConsoleLogEvent):
+    __slots__ = ()
+
+
+# a line with watched players' names in it (see console_players.watched_players())
+class PlayersSeen(ConsoleLogEvent):
+    __slots__ = ('names',)
+
+    def __init__(self, line: str, names: Tuple[str, ...]):
+        super().__init__(line)
+        self.names: Tuple[str, ...] = names
+
+
+# the con_timestamp time of the line it came from, which applies to the events after it. None if a line doesn't have one, but only after one that did
+class TimeLogged(ConsoleLogEvent):
+    __slots__ = ('time',)
+
+    def __init__(self, line: str, line_time: Union[int, None]):
+        super().__init__(line)
+        self.time: Union[int, None] = line_time
+
+
+# the user killing someone (only if counting kill feed stats)
+class KillScored(ConsoleLogEvent):
+    __slots__ = ('weapon',)
+
+    def __init__(self, line: str, weapon: str):
+        super().__init__(line)
+        self.weapon: str = weapon
+
+
+# the user being killed by someone (only if counting kill feed stats)
+class Died(ConsoleLogEvent):
+    __slots__ = ('weapon',)
+
+    def __init__(self, line: str, weapon: str):
+        super().__init__(line)
+        self.weapon: str = weapon
 
 
 # reads a console.log and returns current map and class
-def interpret(self, console_log_path: str, user_usernames: list, kb_limit: float = float(settings.get('console_scan_kb')), force: bool = False, tf2_start_time: int = 0) -> Tuple[str, str]:
+def interpret(self, console_log_path: str, user_usernames: list, kb_limit: float = float(settings.get('console_scan_kb')), force: bool = False, tf2_start_time: int = 0,
+              engine: str = 'python', max_line_bytes: int = CONSOLE_LINE_MAX_BYTES, buffer_bytes: int = CONSOLE_SCAN_BUFFER_BYTES) -> Tuple[str, str]:
     TF2_LOAD_TIME_ASSUMPTION: int = 10
     SIZE_LIMIT_MULTIPLE_TRIGGER: int = 4
     SIZE_LIMIT_MULTIPLE_TARGET: int = 2
-
-    # defaults
-    current_map: str = 'In menus'
-    current_class: str = 'Not queued'
-    kataiser_seen_on: Union[str, None] = None
-
-    match_types: Dict[str, str] = {'12v12 Casual Match': 'Casual', 'MvM Practice': 'MvM (Boot Camp)', 'MvM MannUp': 'MvM (Mann Up)', '6v6 Ladder Match': 'Competitive'}
-    menus_messages: tuple = ('Server shutting down', 'For FCVAR_REPLICATED', '[TF Workshop]', 'Lobby destroyed', 'Disconnect:', 'destroyed Lobby', 'destroyed CAsyncWavDataCache',
-                             'Missing map', 'Host_Error', 'SoundEmitter:')
-    menus_message: str
-    tf2_classes: tuple = ('Scout', 'Soldier', 'Pyro', 'Demoman', 'Heavy', 'Engineer', 'Medic', 'Sniper', 'Spy')
+    TAIL_HASH_BYTES: int = 64
+    CHECKPOINT_SAVE_BYTES: int = 65536
 
     hide_queued_gamemode: bool = settings.get('hide_queued_gamemode')
-    user_is_kataiser: bool = 'Kataiser' in user_usernames
+    kill_stats: bool = settings.get('kill_stats')
+    watchlist: Tuple[str, ...] = console_players.watched_players(settings.get('watchlist'), user_usernames, not self.has_seen_kataiser)
 
     # console.log is a log of tf2's console (duh), only exists if tf2 has -condebug (see no_condebug_warning())
     self.log.debug(f"Looking for console.log at {console_log_path}")
     self.log.console_log_path = console_log_path
 
-    if not os.path.isfile(console_log_path):
+    # one stat per scan, which is all that's needed to decide whether to do nothing, continue from the last scan, or rescan (see file_fingerprint())
+    try:
+        console_log_stat: Union[os.stat_result, None] = os.stat(console_log_path)
+    except FileNotFoundError:
+        console_log_stat = None
+
+    if not console_log_stat or not stat.S_ISREG(console_log_stat.st_mode):
         self.log.error(f"console.log doesn't exist, issuing warning (files/dirs in /tf/: {os.listdir(os.path.dirname(console_log_path))})", reportable=False)
         del self.log
         no_condebug_warning(tf2_is_running=True)
 
+    # reading console.log while it's being trimmed would give garbage
+    if self.console_log_trim_thread and self.console_log_trim_thread.is_alive():
+        self.log.debug(f"console.log is still being trimmed, remaining on {self.old_console_log_interpretation}")
+        return self.old_console_log_interpretation
+
     # only interpret console.log again if it's been modified
-    console_log_mtime: int = int(os.stat(console_log_path).st_mtime)
-    if not force and console_log_mtime == self.old_console_log_mtime:
+    console_log_fingerprint: Tuple[int, int, int] = file_fingerprint(console_log_stat)
+    if not force and console_log_fingerprint == self.old_console_log_fingerprint:
         self.log.debug(f"Not rescanning console.log, remaining on {self.old_console_log_interpretation}")
         return self.old_console_log_interpretation
 
     # TF2 takes some time to load the console when starting up, so until it's been modified to avoid getting outdated information
-    console_log_mtime_relative: int = console_log_mtime - tf2_start_time
+    console_log_mtime_relative: int = int(console_log_stat.st_mtime) - tf2_start_time
     if console_log_mtime_relative <= TF2_LOAD_TIME_ASSUMPTION:
         self.log.debug(f"console.log's mtime relative to TF2's start time is {console_log_mtime_relative} (<= {TF2_LOAD_TIME_ASSUMPTION}), assuming default state")
-        return current_map, current_class
+        self.console_log_result = ConsoleLogState()
+        return 'In menus', 'Not queued'
 
-    consolelog_file_size: int = os.stat(console_log_path).st_size
+    consolelog_file_size: int = console_log_stat.st_size
     byte_limit: float = kb_limit * 1024.0
 
-    with open(console_log_path, 'r', errors='replace') as consolelog_file:
-        if consolelog_file_size > byte_limit:
-            skip_to_byte: int = consolelog_file_size - int(byte_limit)
-            consolelog_file.seek(skip_to_byte, 0)  # skip to last few KBs
+    # continue from where the last scan stopped, unless console.log has been trimmed or replaced since then (or more has been added than would be scanned anyway)
+    state: Union[ConsoleLogState, None] = None if force else self.console_log_state
+    if state:
+        if state.path != console_log_path or state.inode != console_log_stat.st_ino or consolelog_file_size < state.offset or state.kb_limit != kb_limit:
+            self.log.debug(f"console.log has been trimmed or replaced since the last scan ({state.offset} -> {consolelog_file_size} bytes), rescanning")
+            state = None
+        elif consolelog_file_size - state.offset > byte_limit:
+            self.log.debug(f"{consolelog_file_size - state.offset} bytes have been added to console.log since the last scan, rescanning")
+            state = None
 
-            lines: List[str] = consolelog_file.readlines()
-            self.log.debug(f"console.log: {consolelog_file_size} bytes, skipped to {skip_to_byte}, read {int(byte_limit)} bytes and {len(lines)} lines")
-        else:
-            lines = consolelog_file.readlines()
-            self.log.debug(f"console.log: {consolelog_file_size} bytes, {len(lines)} lines (didn't skip lines)")
+    with_optimization: bool = True  # "with" optimization, not "with optimization"
+    for username in user_usernames:
+        if 'with' in username:
+            with_optimization = False
 
-    # limit the file size, for readlines perf
-    if consolelog_file_size > byte_limit * SIZE_LIMIT_MULTIPLE_TRIGGER and len(lines) > 15000 and settings.get('trim_console_log') and not force and not launcher.DEBUG:
+    full_scan_skip_to_byte: int = consolelog_file_size - int(byte_limit) if consolelog_file_size > byte_limit else 0  # skip to last few KBs
+    full_scan: bool = not state
+    if full_scan:
+        state = ConsoleLogState(console_log_path, console_log_stat.st_ino, 0, kb_limit)
+    skip_to_byte: int = full_scan_skip_to_byte if full_scan else state.offset
 
-        trim_size = int(byte_limit * SIZE_LIMIT_MULTIPLE_TARGET)
-        self.log.debug(f"Limiting console.log to {trim_size} bytes")
+    with open(console_log_path, 'rb') as consolelog_file:
+        # mapping the file instead of reading it means that only the few lines that matter ever get copied (or decoded)
+        try:
+            consolelog_map: Union[mmap.mmap, bytes] = mmap.mmap(consolelog_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # can't map an empty file
+            consolelog_map = b''
 
         try:
-            with open(console_log_path, 'rb+') as consolelog_file_b:
-                # this can probably be done faster and/or cleaner
-                consolelog_file_b.seek(trim_size, 2)
-                consolelog_file_trimmed = consolelog_file_b.read()
-                consolelog_file_b.seek(0)
-                consolelog_file_b.truncate()
-                consolelog_file_b.write(consolelog_file_trimmed)
-        except PermissionError as error:
-            self.log.error(f"Failed to trim console.log: {error}")
-
-    just_started_server: bool = False
-    server_still_running: bool = False
-    with_optimization: bool = True  # "with" optimization, not "with optimization"
+            # when continuing, make sure the bytes right before where the scan starts haven't changed since the last scan hashed them
+            if not full_scan and zlib.adler32(consolelog_map[max(skip_to_byte - TAIL_HASH_BYTES, 0):skip_to_byte]) != state.tail_hash:
+                self.log.debug("console.log has been rewritten since the last scan, rescanning")
+                state = ConsoleLogState(console_log_path, console_log_stat.st_ino, 0, kb_limit)
+                full_scan = True
+
+            if full_scan:
+                # most of the window doesn't affect the result, so only read from where it starts mattering
+                skip_to_byte = scan_backwards(consolelog_file, full_scan_skip_to_byte, consolelog_file_size, user_usernames, with_optimization, watchlist,
+                                              max_line_bytes=max_line_bytes)
+
+            # a line without a newline is still being written by TF2, so leave it for the next scan
+            read_end: int = max(consolelog_map.rfind(b'\n', skip_to_byte, len(consolelog_map)) + 1, skip_to_byte)
+            state.offset = read_end
+            state.tail_hash = zlib.adler32(consolelog_map[max(read_end - TAIL_HASH_BYTES, 0):read_end])
+            # kill feed lines are normally skipped entirely, so to count them, only the ones with the user's name in them are found
+            kill_feed_markers: Tuple[bytes, ...] = console_players.kill_feed_markers(user_usernames, CONSOLE_LOG_ENCODING) if kill_stats else ()
+            lines_found: int = 0
+            scan_start: int = skip_to_byte
+
+            # a buffer's worth at a time, so that only that many lines are ever held at once
+            while scan_start < read_end:
+                scan_end, next_scan_start = next_chunk(consolelog_map, scan_start, read_end, buffer_bytes)
+                lines: List[str] = MARKER_LINE_FINDERS[engine](consolelog_map, scan_start, scan_end, watchlist, extra_markers=kill_feed_markers, max_line_bytes=max_line_bytes)
+                reduce_events(state, console_events(lines, user_usernames, with_optimization, watchlist, kill_stats), hide_queued_gamemode)
+                lines_found += len(lines)
+                release_pages(consolelog_map, scan_start, next_scan_start)
+                scan_start = next_scan_start
+        finally:
+            if isinstance(consolelog_map, mmap.mmap):
+                consolelog_map.close()
+
+    if skip_to_byte == 0:
+        self.log.debug(f"console.log: {consolelog_file_size} bytes, {lines_found} relevant lines (didn't skip lines)")
+    elif full_scan:
+        self.log.debug(f"console.log: {consolelog_file_size} bytes, scan window starts at {full_scan_skip_to_byte}, skipped to {skip_to_byte}, scanned {read_end - skip_to_byte} bytes and found "
+                       f"{lines_found} relevant lines")
+    else:
+        self.log.debug(f"console.log: {consolelog_file_size} bytes, continued from {skip_to_byte}, scanned {read_end - skip_to_byte} bytes and found {lines_found} relevant lines")
 
-    for username in user_usernames:
-        if 'with' in username:
-            with_optimization = False
+    # limit the file size, for scanning (and disk space) perf
+    console_log_trimmed: bool = False
+    if consolelog_file_size > byte_limit * SIZE_LIMIT_MULTIPLE_TRIGGER and settings.get('trim_console_log') and not force and not launcher.DEBUG:
+        trim_size = int(byte_limit * SIZE_LIMIT_MULTIPLE_TARGET)
+        self.log.debug(f"Limiting console.log to {trim_size} bytes, in the background")
+
+        # trimming a huge console.log can take a while, so don't hold up the main loop for it (see the start of this function)
+        self.trim_console_log(console_log_path, trim_size)
+        console_log_trimmed = True
+
+    self.console_log_state = None if console_log_trimmed else state  # offsets from before trimming are meaningless
+    self.console_log_result = state  # unlike console_log_state, always what the latest interpretation came from
+    current_map, current_class = state_interpretation(self, state)
+    map_line_used, class_line_used = state.map_line_used, state.class_line_used
+
+    if map_line_used == class_line_used:
+        self.log.debug(f"Got '{current_map}' and '{current_class}' from line '{map_line_used[:-1]}'")
+    else:
+        self.log.debug(f"Got '{current_map}' from line '{map_line_used[:-1]}' and '{current_class}' from line '{class_line_used[:-1]}'")
+
+    if map_line_used == '' and class_line_used != '':
+        self.log.error("Have class_line_used without map_line_used")
+
+    # restarts are common (see main.TF2RichPresense.necessary_program_not_running()), so save the state (not too often) to pick up from next time
+    if console_log_trimmed:
+        save_checkpoint(None, ('', ''), None)
+    elif not force and (full_scan or (current_map, current_class) != self.old_console_log_interpretation or state.offset - state.saved_offset >= CHECKPOINT_SAVE_BYTES):
+        save_checkpoint(state, (current_map, current_class), console_log_fingerprint)
+        self.log.debug(f"Saved console.log checkpoint at {state.offset}")
 
-    # iterates though roughly 16000 lines from console.log and learns everything from them
-    map_line_used: str = ''
-    class_line_used: str = ''
-    line: str
+    self.old_console_log_interpretation = (current_map, current_class)
+    self.old_console_log_fingerprint = console_log_fingerprint
+
+    return current_map, current_class
+
+
+# the same as interpret(), but for console output from a log_source.LogSource (a named pipe, stdin, a TCP stream, or a file being followed) instead of a console.log on disk. there's
+# no scan window, since everything the source sends gets read as it arrives, and the state just carries on from the last call as long as it's the same source
+def interpret_source(self, source: log_source.LogSource, user_usernames: list, engine: str = 'python', max_line_bytes: int = CONSOLE_LINE_MAX_BYTES) -> Tuple[str, str]:
+    hide_queued_gamemode: bool = settings.get('hide_queued_gamemode')
+    kill_stats: bool = settings.get('kill_stats')
+    watchlist: Tuple[str, ...] = console_players.watched_players(settings.get('watchlist'), user_usernames, not self.has_seen_kataiser)
+    with_optimization: bool = not [username for username in user_usernames if 'with' in username]
+    kill_feed_markers: Tuple[bytes, ...] = console_players.kill_feed_markers(user_usernames, CONSOLE_LOG_ENCODING) if kill_stats else ()
+
+    state: Union[ConsoleLogState, None] = self.console_log_state
+    if not state or state.path != source.name:
+        self.log.debug(f"Starting to interpret {source}")
+        state = ConsoleLogState(source.name)
+
+    bytes_read: int = 0
+    lines_found: int = 0
+
+    # a buffer's worth at a time, same as interpret()
+    while True:
+        buffer: bytes = source.poll()
+
+        if source.restarted:
+            self.log.debug(f"{source} started over, so starting over interpreting it")
+            source.clear_restart()
+            state = ConsoleLogState(source.name)
+            bytes_read = lines_found = 0
+            continue
+        elif not buffer:
+            break
+
+        lines: List[str] = MARKER_LINE_FINDERS[engine](buffer, 0, len(buffer), watchlist, extra_markers=kill_feed_markers, max_line_bytes=max_line_bytes)
+        reduce_events(state, console_events(lines, user_usernames, with_optimization, watchlist, kill_stats), hide_queued_gamemode)
+        bytes_read += len(buffer)
+        lines_found += len(lines)
+
+    state.offset += bytes_read
+    self.log.debug(f"{source}: read {bytes_read} bytes and found {lines_found} relevant lines")
+    self.console_log_state = self.console_log_result = state
+    self.old_console_log_interpretation = state_interpretation(self, state)
+    return self.old_console_log_interpretation
+
+
+# what a state means for rich presence, as (map, class), and points out watched players (or forgets about them in menus)
+def state_interpretation(self, state: ConsoleLogState) -> Tuple[str, str]:
+    if state.in_menus:
+        self.watchlist_notified.clear()
+    else:
+        console_players.notify_watched_players(self, state.players_seen, state.current_map)
+
+    return f'{state.current_map} (hosting)' if state.hosting else state.current_map, state.current_class
+
+
+# converts a con_timestamp timestamp (e.g. b"10/18/2019 - 12:00:01" or the same as a str, local time) to a unix time, without the overhead of strptime
+def con_timestamp_time(timestamp: Union[bytes, str]) -> int:
+    return int(time.mktime((int(timestamp[6:10]), int(timestamp[0:2]), int(timestamp[3:5]), int(timestamp[13:15]), int(timestamp[16:18]), int(timestamp[19:21]), 0, 0, -1)))
+
+
+# turns lines from console.log into the events they mean. lines can start with a con_timestamp timestamp, which is removed and becomes a TimeLogged event
+def console_events(lines: Iterable[str], user_usernames: list, with_optimization: bool, watchlist: Tuple[str, ...], kill_stats: bool = False) -> Iterator[ConsoleLogEvent]:
+    line_event: str
+    menus_message_found: bool
+    players_found: Tuple[str, ...]
+    watchlist_found_in: Union[Callable, None] = console_players.watchlist_matcher(watchlist).found_in if watchlist else None
+    kill_feed_regex: Union[Pattern, None] = console_players.user_kill_feed_regex(tuple(user_usernames)) if kill_stats and any(user_usernames) else None
+    last_timestamp: str = ''
+    timestamp_times: Dict[str, int] = {}  # lines that matter come in bursts, so each second's timestamp only gets parsed once
 
     for line in lines:
+        timestamp_match = CON_TIMESTAMP_LINE_REGEX.match(line)
+
+        if timestamp_match:
+            line = line[timestamp_match.end():]
+            timestamp: str = timestamp_match.group(1)
+
+            if timestamp != last_timestamp:
+                if timestamp not in timestamp_times:
+                    timestamp_times[timestamp] = con_timestamp_time(timestamp)
+
+                yield TimeLogged(line, timestamp_times[timestamp])
+                last_timestamp = timestamp
+        elif last_timestamp:
+            # con_timestamp got turned off
+            yield TimeLogged(line, None)
+            last_timestamp = ''
+
+        if kill_feed_regex and ' killed ' in line:
+            kill_feed_match = kill_feed_regex.match(line)
+
+            if kill_feed_match:
+                if kill_feed_match.group('killer'):
+                    yield KillScored(line, kill_feed_match.group('weapon'))
+                else:
+                    yield Died(line, kill_feed_match.group('weapon'))
+
         # lines that have "with" in them are basically always kill logs and can be safely ignored
         # this (probably) improves performance
         if with_optimization and 'with' in line:
-            if user_is_kataiser or 'Kataiser' not in line or self.has_seen_kataiser:
+            if not watchlist_found_in or not watchlist_found_in(line):
                 continue
 
-        if current_map != 'In menus':
-            for menus_message in menus_messages:
-                if menus_message in line:
-                    current_map = 'In menus'
-                    current_class = 'Not queued'
-                    map_line_used = class_line_used = line
-                    break
-
-        if line.endswith(' selected \n'):
-            current_class_possibly: str = line[:-11]
-
-            if current_class_possibly in tf2_classes:
-                current_class = current_class_possibly
-                class_line_used = line
-
-        elif line.startswith('Map:'):
-            current_map = line[5:-1]  # this variable is poorly named
-            current_class = 'unselected'  # so is this one
-            map_line_used = class_line_used = line
-
-            if just_started_server:
-                server_still_running = True
-                just_started_server = False
-            else:
-                just_started_server = False
-                server_still_running = False
-
-        elif '[PartyClient] L' in line:  # full line: "[PartyClient] Leaving queue"
+        line_event, menus_message_found, players_found = classify_line(line, user_usernames, watchlist)
+
+        if menus_message_found:
+            yield MenusEntered(line)
+
+        if line_event == 'selected':
+            if line[:-11] in TF2_CLASSES:
+                yield ClassSelected(line, line[:-11])
+        elif line_event == 'map':
+            yield MapLoaded(line, line[5:-1])
+        elif line_event == 'leave queue':
+            yield QueueLeft(line)
+        elif line_event == 'enter queue':
+            yield QueueEntered(line, line.split('match group ')[-1][:-1])
+        elif line_event == 'disconnect':
+            yield Disconnected(line)
+        elif line_event == 'enter standby':
+            yield QueueEntered(line, None)
+        elif line_event == 'server':
+            yield ServerActivated(line)
+
+        if players_found:
+            yield PlayersSeen(line, players_found)
+
+
+# applies events to a state, in place (and returns it)
+def reduce_events(state: ConsoleLogState, events: Iterable[ConsoleLogEvent], hide_queued_gamemode: bool) -> ConsoleLogState:
+    # only uses locals while going through the events, for speed
+    current_map: str = state.current_map  # this variable is poorly named
+    current_class: str = state.current_class  # so is this one
+    just_started_server: bool = state.just_started_server
+    server_still_running: bool = state.server_still_running
+    players_seen: Dict[str, str] = state.players_seen
+    map_line_used: str = state.map_line_used
+    class_line_used: str = state.class_line_used
+    kills: int = state.kills
+    deaths: int = state.deaths
+    weapons: Dict[str, int] = state.weapons
+    map_started: Union[int, None] = state.map_started
+    queue_started: Union[int, None] = state.queue_started
+    line_time: Union[int, None] = None
+    event: ConsoleLogEvent
+
+    for event in events:
+        event_type: type = type(event)
+
+        if event_type is TimeLogged:
+            line_time = event.time
+
+        elif event_type is MenusEntered:
+            if current_map != 'In menus':
+                current_map = 'In menus'
+                current_class = 'Not queued'
+                map_line_used = class_line_used = event.line
+                map_started = queue_started = None
+
+        elif event_type is ClassSelected:
+            current_class = event.tf2_class
+            class_line_used = event.line
+
+        elif event_type is MapLoaded:
+            current_map = event.map_name
+            current_class = 'unselected'
+            map_line_used = class_line_used = event.line
+            server_still_running = just_started_server
+            just_started_server = False
+            kills = deaths = 0
+            weapons = {}
+            players_seen = {}
+            map_started = line_time
+            queue_started = None
+
+        elif event_type is QueueLeft:
             # not necessarily in menus
             current_class = 'Not queued'
-            class_line_used = line
+            class_line_used = event.line
+            queue_started = None
 
-        elif '[PartyClient] Entering q' in line:  # full line: "[PartyClient] Entering queue for match group " + whatever mode
+        elif event_type is QueueEntered:
             current_map = 'In menus'
-            map_line_used = class_line_used = line
+            map_line_used = class_line_used = event.line
+            map_started = None
+            queue_started = line_time
 
-            if hide_queued_gamemode:
+            if event.match_group is None:
+                current_class = 'Queued for a party\'s match'
+            elif hide_queued_gamemode:
                 current_class = "Queued"
             else:
-                match_type: str = line.split('match group ')[-1][:-1]
-                current_class = f"Queued for {match_types[match_type]}"
+                current_class = f"Queued for {MATCH_TYPES[event.match_group]}"
 
-        elif 'Disconnect by user' in line and [un for un in user_usernames if un in line]:
+        elif event_type is Disconnected:
             current_map = 'In menus'
             current_class = 'Not queued'
-            map_line_used = class_line_used = line
-
-        elif '[PartyClient] Entering s' in line:  # full line: "[PartyClient] Entering standby queue"
-            current_map = 'In menus'
-            current_class = 'Queued for a party\'s match'
-            map_line_used = class_line_used = line
+            map_line_used = class_line_used = event.line
+            map_started = queue_started = None
 
-        elif 'SV_ActivateServer' in line:  # full line: "SV_ActivateServer: setting tickrate to 66.7"
+        elif event_type is ServerActivated:
             just_started_server = True
 
-        if not user_is_kataiser and 'Kataiser' in line and not self.has_seen_kataiser:
-            kataiser_seen_on = current_map
+        elif event_type is PlayersSeen:
+            for name in event.names:
+                players_seen[name] = current_map
 
-    if not user_is_kataiser and not self.has_seen_kataiser and kataiser_seen_on == current_map and current_map != 'In menus':
-        self.has_seen_kataiser = True
-        self.log.debug(f"Kataiser located, telling user :D (on {current_map})")
-        print(f"{Fore.LIGHTCYAN_EX}Hey, it seems that Kataiser, the developer of TF2 Rich Presence, is in your game! Say hi to me if you'd like :){Style.RESET_ALL}\n")
+        elif event_type is KillScored:
+            kills += 1
+            weapons[event.weapon] = weapons.get(event.weapon, 0) + 1
 
-    if server_still_running and current_map != 'In menus':
-        current_map = f'{current_map} (hosting)'
+        elif event_type is Died:
+            deaths += 1
 
-    if map_line_used == class_line_used:
-        self.log.debug(f"Got '{current_map}' and '{current_class}' from line '{map_line_used[:-1]}'")
+    state.current_map, state.current_class = current_map, current_class
+    state.just_started_server, state.server_still_running = just_started_server, server_still_running
+    state.players_seen, state.map_line_used, state.class_line_used = players_seen, map_line_used, class_line_used
+    state.kills, state.deaths, state.weapons = kills, deaths, weapons
+    state.map_started, state.queue_started = map_started, queue_started
+    return state
+
+
+# tags a line with what it means to interpret() (see LINE_EVENT_MARKERS), whether it's one of MENUS_MESSAGES, and which players from the watchlist are in it
+def classify_line(line: str, user_usernames: list, watchlist: Tuple[str, ...]) -> Tuple[str, bool, Tuple[str, ...]]:
+    # markers can overlap (e.g. "[PartyClient] Lobby destroyed"), so this finds them at every position instead of just the non-overlapping ones
+    markers_found: Set[str] = set(line_markers_regex().findall(line))
+    line_event: str = ''
+
+    if line.endswith(' selected \n'):
+        line_event = 'selected'
     else:
-        self.log.debug(f"Got '{current_map}' from line '{map_line_used[:-1]}' and '{current_class}' from line '{class_line_used[:-1]}'")
+        for marker in LINE_EVENT_MARKERS:
+            if marker in markers_found:
+                if marker == 'Map:' and not line.startswith(marker):
+                    continue
+                elif marker == 'Disconnect by user' and not [un for un in user_usernames if un in line]:
+                    continue
 
-    if map_line_used == '' and class_line_used != '':
-        self.log.error("Have class_line_used without map_line_used")
+                line_event = LINE_EVENT_MARKERS[marker]
+                break
 
-    self.old_console_log_interpretation = (current_map, current_class)
-    self.old_console_log_mtime = console_log_mtime
+    return line_event, not markers_found.isdisjoint(MENUS_MESSAGES), console_players.watchlist_matcher(watchlist).names_in(line) if watchlist else ()
 
-    return current_map, current_class
+
+# a compiled regex that finds any of the strings classify_line() cares about, built once per session
+@functools.lru_cache(maxsize=None)
+def line_markers_regex() -> Pattern:
+    return re.compile(f'(?=({utils.trie_regex(line_markers())}))')  # a lookahead consumes nothing, so findall() tries every position
+
+
+# every string classify_line() cares about, except " selected"
+def line_markers() -> List[str]:
+    return list(MENUS_MESSAGES) + list(LINE_EVENT_MARKERS)
+
+
+# where each watched player's name starts in buffer[start:end] (which ends at the end of a line), in order of where they end. searched in line-aligned chunks, since the
+# automaton needs text
+def find_watched_players(buffer: Union[mmap.mmap, bytes], start: int, end: int, watchlist: Tuple[str, ...]) -> Iterator[int]:
+    matcher: console_players.WatchlistMatcher = console_players.watchlist_matcher(watchlist, CONSOLE_LOG_ENCODING)
+    chunk_start: int = start
+
+    while chunk_start < end:
+        chunk_end, next_chunk_start = next_chunk(buffer, chunk_start, end, WATCHLIST_CHUNK_BYTES)
+
+        for found_start, name in matcher.find_all(buffer[chunk_start:chunk_end].decode('latin-1')):
+            yield chunk_start + found_start
+
+        chunk_start = next_chunk_start
+
+
+# finds the lines in buffer[start:end] (which ends at the end of a line) that contain any marker or " selected ", and decodes just those, in order. nearly every line
+# in console.log means nothing, and searching the undecoded bytes for each marker finds the rest much faster than decoding and checking every line. extra_markers are more
+# bytes to look for anywhere in lines
+def find_marker_lines(buffer: Union[mmap.mmap, bytes], start: int, end: int, watchlist: Tuple[str, ...], extra_markers: Tuple[bytes, ...] = (),
+                      max_line_bytes: int = CONSOLE_LINE_MAX_BYTES) -> List[str]:
+    return decode_lines(buffer, find_marker_line_spans(buffer, start, end, watchlist, extra_markers), max_line_bytes)
+
+
+# the (start, end) of each line find_marker_lines() would return, in order
+def find_marker_line_spans(buffer: Union[mmap.mmap, bytes], start: int, end: int, watchlist: Tuple[str, ...], extra_markers: Tuple[bytes, ...] = ()) -> List[Tuple[int, int]]:
+    line_ends: Dict[int, int] = {}
+    line_start: int
+    line_end: int
+
+    for anchor in marker_anchors() + extra_markers:
+        found: int = buffer.find(anchor, start, end)
+
+        while found != -1:
+            line_start = max(buffer.rfind(b'\n', start, found) + 1, start)
+            line_end = buffer.find(b'\n', found, end) + 1 or end
+            line_ends[line_start] = line_end
+            found = buffer.find(anchor, line_end, end)
+
+    # all the watched players' names are found in a single pass, instead of one per name
+    if watchlist:
+        line_end = start
+
+        for found in find_watched_players(buffer, start, end, watchlist):
+            if found >= line_end:
+                line_start = max(buffer.rfind(b'\n', start, found) + 1, start)
+                line_end = buffer.find(b'\n', found, end) + 1 or end
+                line_ends[line_start] = line_end
+
+    return [(line_start, line_ends[line_start]) for line_start in sorted(line_ends)]
+
+
+# same as find_marker_lines(), but with the searching done by NumPy in large chunks. only "Map:" at the start of a line (or after ": ") and " selected " at the end are checked for as such,
+# the other markers can be anywhere in a line. not used by default, since console.log is usually small enough that the Python version is fast enough and NumPy is a big dependency
+def find_marker_lines_numpy(buffer: Union[mmap.mmap, bytes], start: int, end: int, watchlist: Tuple[str, ...], chunk_size: int = 16777216, extra_markers: Tuple[bytes, ...] = (),
+                            max_line_bytes: int = CONSOLE_LINE_MAX_BYTES) -> List[str]:
+    if not numpy:
+        raise ImportError("The NumPy console.log engine needs NumPy installed")
+
+    # with con_timestamp on, "Map:" comes after the timestamp instead
+    anywhere_markers: List[bytes] = [marker.encode('ascii') for marker in line_markers() if marker != 'Map:'] + [b': Map:'] + list(extra_markers)
+    line_spans: List[Tuple[int, int]] = []
+    chunk_start: int = start
+
+    while chunk_start < end:
+        # chunks always end at the end of a line (or partway through a line too long to matter past its start), so that no line is split between two
+        chunk_end, next_chunk_start = next_chunk(buffer, chunk_start, end, max(chunk_size, max_line_bytes + 1))
+        chunk = numpy.frombuffer(buffer, dtype=numpy.uint8, count=chunk_end - chunk_start, offset=chunk_start)  # doesn't copy
+
+        chunk_line_ends = numpy.flatnonzero(chunk == 10) + 1
+        if not len(chunk_line_ends) or chunk_line_ends[-1] != len(chunk):
+            chunk_line_ends = numpy.append(chunk_line_ends, len(chunk))
+        chunk_line_starts = numpy.concatenate(([0], chunk_line_ends[:-1]))
+
+        matched_lines = numpy.concatenate((numpy_lines_with_affix(chunk, chunk_line_starts, chunk_line_ends, b'Map:', True),
+                                           numpy_lines_with_affix(chunk, chunk_line_starts, chunk_line_ends, b' selected \n', False),
+                                           numpy_lines_with_affix(chunk, chunk_line_starts, chunk_line_ends, b' selected \r\n', False),
+                                           numpy.searchsorted(chunk_line_ends, numpy_find_all(chunk, anywhere_markers), side='right')))
+
+        # searching for each name separately would take a pass per first byte, which adds up with a long watchlist
+        if watchlist:
+            watched_found = numpy.fromiter((found - chunk_start for found in find_watched_players(buffer, chunk_start, chunk_end, watchlist)), dtype=numpy.intp)
+            matched_lines = numpy.concatenate((matched_lines, numpy.searchsorted(chunk_line_ends, watched_found, side='right')))
+
+        for line_index in numpy.unique(matched_lines):
+            line_spans.append((chunk_start + int(chunk_line_starts[line_index]), chunk_start + int(chunk_line_ends[line_index])))
+
+        chunk_start = next_chunk_start
+
+    return decode_lines(buffer, line_spans, max_line_bytes)
+
+
+# the indices of the lines of a chunk that start (or end) with some bytes, found by narrowing them down one byte at a time
+def numpy_lines_with_affix(chunk, line_starts, line_ends, affix: bytes, at_start: bool):
+    line_indices = numpy.flatnonzero(line_ends - line_starts >= len(affix))
+    affix_starts = line_starts[line_indices] if at_start else line_ends[line_indices] - len(affix)
+
+    # lines all end with the same newline, so start from the other end of a suffix
+    for affix_index in range(len(affix)) if at_start else reversed(range(len(affix))):
+        still_matching = chunk[affix_starts + affix_index] == affix[affix_index]
+        line_indices, affix_starts = line_indices[still_matching], affix_starts[still_matching]
+
+    return line_indices
+
+
+# the positions of every occurrence of any of some markers in a chunk, found by narrowing down from where their first byte is (only searched for once per first byte)
+def numpy_find_all(chunk, markers: List[bytes]):
+    markers_by_first_byte: Dict[int, List[bytes]] = {}
+    for marker in markers:
+        markers_by_first_byte.setdefault(marker[0], []).append(marker)
+
+    found_all: list = []
+    for first_byte in markers_by_first_byte:
+        found_first_byte = numpy.flatnonzero(chunk == first_byte)
+
+        for marker in markers_by_first_byte[first_byte]:
+            found = found_first_byte[found_first_byte <= len(chunk) - len(marker)]
+
+            for marker_index in range(1, len(marker)):
+                found = found[chunk[found + marker_index] == marker[marker_index]]
+
+            found_all.append(found)
+
+    return numpy.concatenate(found_all) if found_all else numpy.empty(0, dtype=numpy.intp)
+
+
+# decodes some lines of a buffer, each given as (start, end). lines longer than max_line_bytes are cut down to that (plus a newline), without copying the rest
+def decode_lines(buffer: Union[mmap.mmap, bytes], line_spans: List[Tuple[int, int]], max_line_bytes: int = CONSOLE_LINE_MAX_BYTES) -> List[str]:
+    lines: List[str] = []
+
+    for line_start, line_end in line_spans:
+        line: bytes = buffer[line_start:min(line_end, line_start + max_line_bytes)]
+
+        if line_end - line_start > max_line_bytes:
+            line = line.rstrip(b'\r') + b'\n'
+        elif line.endswith(b'\r\n'):
+            line = line[:-2] + b'\n'  # same as reading in text mode
+
+        lines.append(line.decode(CONSOLE_LOG_ENCODING, errors='replace'))
+
+    return lines
+
+
+# where the chunk of buffer[chunk_start:end] that's searched next should end, and where the one after it starts. that's the end of the last line that fits in chunk_size, or if
+# not even one line fits, chunk_size bytes into it, with the rest of that line skipped (see decode_lines())
+def next_chunk(buffer: Union[mmap.mmap, bytes], chunk_start: int, end: int, chunk_size: int) -> Tuple[int, int]:
+    if end - chunk_start <= chunk_size:
+        return end, end
+
+    chunk_end: int = buffer.rfind(b'\n', chunk_start, chunk_start + chunk_size) + 1
+    if chunk_end:
+        return chunk_end, chunk_end
+    else:
+        return chunk_start + chunk_size, buffer.find(b'\n', chunk_start + chunk_size, end) + 1 or end
+
+
+# lets the OS take back the memory a part of a mapped file has been paged into, since it's been scanned and won't be read again. only possible with mmap.madvise() (Python 3.8+,
+# not Windows), and harmless to skip otherwise since mapped pages of a file are the first to be dropped anyway
+def release_pages(buffer: Union[mmap.mmap, bytes], start: int, end: int):
+    if hasattr(buffer, 'madvise') and hasattr(mmap, 'MADV_DONTNEED'):
+        page_start: int = start - start % mmap.PAGESIZE
+        buffer.madvise(mmap.MADV_DONTNEED, page_start, end - page_start)
+
+
+# the byte strings find_marker_lines() searches for. markers that share a long enough prefix are searched for by just that prefix, since each one means another pass
+@functools.lru_cache(maxsize=None)
+def marker_anchors() -> Tuple[bytes, ...]:
+    anchors: List[bytes] = []
+
+    for marker in sorted(line_markers()):
+        marker_bytes: bytes = marker.encode('ascii')
+        shared_prefix: bytes = os.path.commonprefix([anchors[-1], marker_bytes]) if anchors else b''
+
+        if len(shared_prefix) >= 8:
+            anchors[-1] = shared_prefix
+        else:
+            anchors.append(marker_bytes)
+
+    anchors.append(b' selected ')
+    return tuple(anchors)
+
+
+# finds the latest point in console.log's scan window that a forward scan can start from and get the same result as scanning the whole window, by reading backwards in
+# blocks. that's the last line before the last map change/queue/disconnect that either loaded a map or started a server, since everything after depends only on that
+def scan_backwards(consolelog_file: BinaryIO, window_start: int, window_end: int, user_usernames: list, with_optimization: bool, watchlist: Tuple[str, ...],
+                   block_size: int = 16384, max_line_bytes: int = CONSOLE_LINE_MAX_BYTES) -> int:
+    found_reset: bool = False
+    skipped_unfinished_line: bool = False
+    block_end: int = window_end
+    carry: bytes = b''  # the start of a line that continues into the next block, only up to max_line_bytes of it (see decode_lines())
+
+    while block_end > window_start:
+        block_start: int = max(block_end - block_size, window_start)
+        consolelog_file.seek(block_start, 0)
+        block: bytes = consolelog_file.read(block_end - block_start) + carry
+        line_end: int = len(block)
+
+        if not skipped_unfinished_line:
+            # same as in interpret(), the last line may still be being written
+            line_end = block.rfind(b'\n')
+
+            if line_end == -1:
+                block_end = block_start
+                continue
+
+            skipped_unfinished_line = True
+
+        while True:
+            newline: int = block.rfind(b'\n', 0, line_end)
+            if newline == -1:
+                break
+
+            line_kind: str = scan_backwards_line_kind(block[newline + 1:min(line_end, newline + 1 + max_line_bytes)], user_usernames, with_optimization, watchlist)
+
+            if found_reset:
+                if line_kind == 'map' or line_kind == 'server':
+                    return block_start + newline + 1
+            elif line_kind == 'map' or line_kind == 'reset':
+                found_reset = True
+
+            line_end = newline
+
+        carry = block[:min(line_end, max_line_bytes)]
+        block_end = block_start
+
+    return window_start
+
+
+# the subset of interpret()'s line handling that scan_backwards() needs, in the same order of precedence. works on undecoded lines without newlines
+def scan_backwards_line_kind(line: bytes, user_usernames: list, with_optimization: bool, watchlist: Tuple[str, ...]) -> str:
+    if with_optimization and b'with' in line and not (watchlist and console_players.watchlist_matcher(watchlist, CONSOLE_LOG_ENCODING).found_in(line.decode('latin-1'))):
+        return ''
+
+    line = line.rstrip(b'\r')
+
+    if line.endswith(b' selected '):
+        return ''
+    elif line.startswith(b'Map:') or line[CON_TIMESTAMP_BYTES:CON_TIMESTAMP_BYTES + 4] == b'Map:' and CON_TIMESTAMP_REGEX.match(line):
+        return 'map'
+    elif b'[PartyClient] L' in line:
+        return ''
+    elif b'[PartyClient] Entering q' in line:
+        return 'reset'
+    elif b'Disconnect by user' in line and [un for un in user_usernames if un in line.decode(CONSOLE_LOG_ENCODING, errors='replace')]:
+        return 'reset'
+    elif b'[PartyClient] Entering s' in line:
+        return 'reset'
+    elif b'SV_ActivateServer' in line:
+        return 'server'
+    else:
+        return ''
+
+
+# what identifies a version of a file: which file it is, and its size and modification time. unlike just the mtime in seconds, this changes with every write, and it's all from one stat
+def file_fingerprint(file_stat: os.stat_result) -> Tuple[int, int, int]:
+    return file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns
+
+
+# saves a ConsoleLogState (or clears it, if None) and the interpretation it led to in DB.json
+def save_checkpoint(state: Union[ConsoleLogState, None], interpretation: Tuple[str, str], console_log_fingerprint: Union[Tuple[int, int, int], None]):
+    db: Dict[str, Union[dict, bool, list]] = utils.access_db()
+
+    if state:
+        state.saved_offset = state.offset
+        saved_state: dict = {slot: getattr(state, slot) for slot in ConsoleLogState.__slots__}
+        saved_state['kb_limit'] = None if state.kb_limit == float('inf') else state.kb_limit  # infinity isn't valid JSON
+        db['console_log_checkpoint'] = {'state': saved_state, 'interpretation': interpretation, 'fingerprint': console_log_fingerprint}
+    else:
+        db['console_log_checkpoint'] = {}
+
+    utils.access_db(db)
+
+
+# loads what save_checkpoint() saved, as (state, interpretation, fingerprint). interpret() decides whether the state still matches console.log
+def load_checkpoint(log) -> Tuple[Union[ConsoleLogState, None], Tuple[str, str], Union[Tuple[int, int, int], None]]:
+    checkpoint: dict = utils.access_db().get('console_log_checkpoint', {})
+
+    try:
+        state: ConsoleLogState = ConsoleLogState()
+        for slot in ConsoleLogState.__slots__:
+            setattr(state, slot, checkpoint['state'][slot])
+
+        if state.kb_limit is None:
+            state.kb_limit = float('inf')
+
+        interpretation: Tuple[str, str] = tuple(checkpoint['interpretation'])
+        log.debug(f"Loaded console.log checkpoint: {state} for {state.path} (interpretation: {interpretation})")
+        return state, interpretation, tuple(checkpoint['fingerprint'])
+    except (KeyError, TypeError):
+        log.debug("No console.log checkpoint to load")
+        return None, ('', ''), None
+
+
+# the ways interpret() can find the lines it needs, selected with its engine argument. all give identical results
+MARKER_LINE_FINDERS: Dict[str, Callable] = {'python': find_marker_lines, 'numpy': find_marker_lines_numpy}
 
 
 # alerts the user that they don't seem to have -condebug
@@ -0,0 +1,118 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+# cython: language_level=3
+
+import functools
+import re
+from typing import Dict, Iterator, List, Pattern, Set, Tuple, Union
+
+from colorama import Fore, Style
+
+import localization
+import settings
+import utils
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+WATCHLIST_NOTIFY_NAMES: int = 3  # watched players named in one notification, any more are just counted
+
+
+# a compiled regex that matches kill feed lines (e.g. "Kataiser killed Scout with scattergun. (crit)") with one of the usernames as the killer ("killer" group) or victim
+@functools.lru_cache(maxsize=None)
+def user_kill_feed_regex(user_usernames: Tuple[str, ...]) -> Pattern:
+    usernames_regex: str = '|'.join(re.escape(username) for username in sorted(user_usernames, key=len, reverse=True) if username)
+    return re.compile(f'(?:(?P<killer>{usernames_regex}) killed .+|.+ killed (?:{usernames_regex})) with (?P<weapon>[^ ]+)\\.(?: \\(crit\\))?\n$')
+
+
+# what to search console.log for (as well as the lines interpret() always wants) to find the kill feed lines the user is in, which are normally skipped entirely
+def kill_feed_markers(user_usernames: list, encoding: str) -> Tuple[bytes, ...]:
+    return tuple(username.encode(encoding, errors='replace') for username in user_usernames if username)
+
+
+# the players to look out for: the names in the watchlist setting (separated by commas), and Kataiser until they've been seen once, but never the user
+def watched_players(watchlist_setting: str, user_usernames: list, include_kataiser: bool) -> Tuple[str, ...]:
+    names: Set[str] = {name.strip() for name in watchlist_setting.split(',')}
+
+    if include_kataiser:
+        names.add('Kataiser')
+
+    names.difference_update(user_usernames)
+    names.discard('')
+    return tuple(sorted(names))
+
+
+# finds watched players' names in text, with an Aho-Corasick automaton of all the names (from pyahocorasick, which the build bundles), so a search is a single pass over the text no
+# matter how many names there are. if it somehow isn't installed, that's a trie regex (see utils.trie_regex()) instead, which slows down with each name. with an encoding, it
+# searches for the names encoded with it in text that's been decoded as latin-1 (which maps each byte to one character), for searching console.log without decoding it properly
+class WatchlistMatcher:
+    __slots__ = ('names', 'automaton', 'regex')
+
+    def __init__(self, watchlist: Tuple[str, ...], encoding: Union[str, None] = None):
+        self.names: Dict[str, str] = {}  # what's searched for: the name it's for
+        for name in watchlist:
+            self.names[name.encode(encoding, errors='replace').decode('latin-1') if encoding else name] = name
+
+        self.automaton = None
+        self.regex: Union[Pattern, None] = None
+
+        if ahocorasick:
+            self.automaton = ahocorasick.Automaton()
+            for key in self.names:
+                self.automaton.add_word(key, (len(key), self.names[key]))
+            self.automaton.make_automaton()
+        else:
+            self.regex = re.compile(f'(?=({utils.trie_regex(list(self.names))}))')  # same as console_log.line_markers_regex()
+
+    def __repr__(self):
+        return f"console_players.WatchlistMatcher ({len(self.names)} names, automaton={self.automaton is not None})"
+
+    # (start, name) of each watched name in some text, in order of where they end
+    def find_all(self, text: str) -> Iterator[Tuple[int, str]]:
+        if self.automaton:
+            for end_index, (key_length, name) in self.automaton.iter(text):
+                yield end_index - key_length + 1, name
+        else:
+            for found_match in self.regex.finditer(text):
+                yield found_match.start(), self.names[found_match.group(1)]
+
+    def found_in(self, text: str) -> bool:
+        return next(self.find_all(text), None) is not None
+
+    # the watched players in some text, sorted
+    def names_in(self, text: str) -> Tuple[str, ...]:
+        return tuple(sorted({name for found_start, name in self.find_all(text)}))
+
+
+# WatchlistMatchers are only built when the watchlist changes
+@functools.lru_cache(maxsize=8)
+def watchlist_matcher(watchlist: Tuple[str, ...], encoding: Union[str, None] = None) -> WatchlistMatcher:
+    return WatchlistMatcher(watchlist, encoding)
+
+
+# tells the user which watched players are in their game (going by a ConsoleLogState's players_seen and current_map), once per player per visit to a map, and only naming a few
+# at a time. Kataiser gets a message of their own, once per session
+def notify_watched_players(self, players_seen: Dict[str, str], current_map: str):
+    players_here: List[str] = sorted(name for name, seen_on in players_seen.items() if seen_on == current_map and name not in self.watchlist_notified)
+    if not players_here:
+        return
+
+    self.watchlist_notified.update(players_here)
+
+    if 'Kataiser' in players_here and not self.has_seen_kataiser:
+        self.has_seen_kataiser = True
+        players_here.remove('Kataiser')
+        self.log.debug(f"Kataiser located, telling user :D (on {current_map})")
+        print(f"{Fore.LIGHTCYAN_EX}Hey, it seems that Kataiser, the developer of TF2 Rich Presence, is in your game! Say hi to me if you'd like :){Style.RESET_ALL}\n")
+
+    if players_here:
+        self.log.debug(f"Watched players located: {players_here} (on {current_map})")
+        loc: localization.Localizer = localization.Localizer(language=settings.get('language'))
+        names_shown: str = ', '.join(players_here[:WATCHLIST_NOTIFY_NAMES])
+        if len(players_here) > WATCHLIST_NOTIFY_NAMES:
+            names_shown = f'{names_shown}, +{len(players_here) - WATCHLIST_NOTIFY_NAMES}'
+
+        message: str = loc.text("{0} is in your game!") if len(players_here) == 1 else loc.text("{0} are in your game!")
+        print(f"{Fore.LIGHTCYAN_EX}{message.format(names_shown)}{Style.RESET_ALL}\n")
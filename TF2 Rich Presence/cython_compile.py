@@ -11,7 +11,7 @@ from Cython.Build import cythonize
 def main():
     # make sure to only run this from build.py or cython_compile.bat, in order to get the command line args
 
-    targets = ('configs', 'console_log', 'custom_maps', 'detect_system_language', 'init', 'localization', 'logger', 'main', 'processes', 'settings', 'updater', 'utils', 'welcomer')
+    targets = ('configs', 'console_archive', 'console_log', 'console_players', 'custom_maps', 'detect_system_language', 'file_watcher', 'init', 'localization', 'log_source', 'logger', 'main', 'proc_events', 'processes', 'settings', 'updater', 'utils', 'welcomer')
     og_cwd = os.getcwd()
 
     if not os.path.isdir('cython_build'):
@@ -0,0 +1,128 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+# cython: language_level=3
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import List, Sequence, Union
+
+import logger
+
+# from linux/inotify.h
+IN_MODIFY: int = 0x00000002
+IN_CLOSE_WRITE: int = 0x00000008
+IN_MOVED_FROM: int = 0x00000040
+IN_MOVED_TO: int = 0x00000080
+IN_CREATE: int = 0x00000100
+IN_DELETE: int = 0x00000200
+IN_NONBLOCK: int = 0o4000
+IN_CLOEXEC: int = 0o2000000
+INOTIFY_EVENT_HEADER: struct.Struct = struct.Struct('iIII')  # wd, mask, cookie, len (then the name)
+
+
+# lets the main loop sleep until a file (console.log) changes, using inotify. only works on Linux, everywhere else (or if inotify fails) it's just time.sleep()
+class FileWatcher:
+    def __init__(self, log: logger.Log):
+        self.log: logger.Log = log
+        self.path: Union[str, None] = None
+        self.inotify_fd: int = -1
+        self.watch_descriptor: int = -1
+
+        if sys.platform.startswith('linux'):
+            try:
+                self.libc: ctypes.CDLL = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                self.inotify_fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+
+                if self.inotify_fd == -1:
+                    raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+            except (OSError, AttributeError) as error:
+                self.log.debug(f"Couldn't start inotify, falling back to polling: {error}")
+                self.inotify_fd = -1
+
+    def __repr__(self):
+        return f"file_watcher.FileWatcher ({self.path}, inotify={self.inotify_fd != -1})"
+
+    # whether wait() will actually wake up early when the file changes
+    @property
+    def watching(self) -> bool:
+        return self.watch_descriptor != -1
+
+    # starts watching a file (and stops watching the previous one). the directory is what's actually watched, so that the file being created or replaced counts too
+    def watch(self, path: str):
+        if path == self.path or self.inotify_fd == -1:
+            return
+
+        self.unwatch()
+        mask: int = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        self.watch_descriptor = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(os.path.dirname(os.path.abspath(path))), mask)
+
+        if self.watch_descriptor == -1:
+            self.log.error(f"Couldn't watch {path}, falling back to polling: {os.strerror(ctypes.get_errno())}", reportable=False)
+        else:
+            self.path = path
+            self.log.debug(f"Watching {path} with inotify")
+
+    def unwatch(self):
+        if self.watching:
+            self.libc.inotify_rm_watch(self.inotify_fd, self.watch_descriptor)
+            self.watch_descriptor = -1
+            self.log.debug(f"Stopped watching {self.path}")
+
+        self.path = None
+
+    # sleeps until the watched file changes, one of wake_fds is readable (see processes.ProcessScanner.exit_fds()), or the timeout runs out, and returns whether the file changed
+    def wait(self, timeout: float, wake_fds: Sequence[int] = ()) -> bool:
+        if not self.watching:
+            if wake_fds:
+                select.select(wake_fds, [], [], timeout)
+            else:
+                time.sleep(timeout)
+
+            return False
+
+        filename: bytes = os.fsencode(os.path.basename(self.path))
+        wait_until: float = time.perf_counter() + timeout
+
+        while True:
+            time_left: float = wait_until - time.perf_counter()
+            if time_left <= 0:
+                return False
+
+            readable: List[int] = select.select([self.inotify_fd, *wake_fds], [], [], time_left)[0]
+            if not readable:
+                return False
+
+            # read everything that's queued up, since only whether the file changed matters and not how many times
+            file_changed: bool = False
+            while True:
+                try:
+                    events: bytes = os.read(self.inotify_fd, 65536)
+                except BlockingIOError:
+                    break
+
+                event_start: int = 0
+                while event_start < len(events):
+                    watch_descriptor, mask, cookie, name_length = INOTIFY_EVENT_HEADER.unpack_from(events, event_start)
+                    name_start: int = event_start + INOTIFY_EVENT_HEADER.size
+
+                    if events[name_start:name_start + name_length].rstrip(b'\0') == filename:
+                        file_changed = True
+
+                    event_start = name_start + name_length
+
+            if file_changed:
+                return True
+            elif readable != [self.inotify_fd]:
+                return False
+
+    def close(self):
+        self.unwatch()
+
+        if self.inotify_fd != -1:
+            os.close(self.inotify_fd)
+            self.inotify_fd = -1
@@ -0,0 +1,285 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+# cython: language_level=3
+
+import abc
+import os
+import select
+import socket
+import stat
+import sys
+import time
+from typing import Callable, Tuple, Union
+
+import logger
+
+SOURCE_BUFFER_BYTES: int = 1048576  # how much of a source's output is held at once, any more stays in the OS's buffers until there's room
+
+
+# a fixed amount of memory that bytes are read into and whole lines are taken out of. a line that doesn't fit in it at all is thrown away (counted in dropped), since the
+# alternative is the buffer growing without limit. that only happens to spam, since every line that matters is short
+class RingBuffer:
+    __slots__ = ('buffer', 'view', 'start', 'length', 'skipping', 'dropped')
+
+    def __init__(self, capacity: int = SOURCE_BUFFER_BYTES):
+        self.buffer: bytearray = bytearray(capacity)
+        self.view: memoryview = memoryview(self.buffer)
+        self.start: int = 0  # where the oldest byte is
+        self.length: int = 0
+        self.skipping: bool = False  # whether the rest of a line that didn't fit is still being thrown away
+        self.dropped: int = 0
+
+    def __repr__(self):
+        return f"log_source.RingBuffer ({self.length}/{len(self.buffer)} bytes, {self.dropped} dropped)"
+
+    @property
+    def full(self) -> bool:
+        return self.length == len(self.buffer)
+
+    # reads into the free space until read_into (which takes a memoryview and returns how much it read into it, 0 for nothing) runs dry or the buffer is full. returns bytes read
+    def fill(self, read_into: Callable[[memoryview], int]) -> int:
+        total_read: int = 0
+
+        while not self.full:
+            write_start: int = (self.start + self.length) % len(self.buffer)
+            write_end: int = len(self.buffer) if write_start >= self.start else self.start  # up to the end, then wrapped around up to the oldest byte
+            bytes_read: int = read_into(self.view[write_start:write_end])
+
+            if not bytes_read:
+                break
+
+            total_read += bytes_read
+
+            if self.skipping:
+                # skipping only starts when the buffer is emptied, so what was just read is all there is
+                newline: int = self.buffer.find(b'\n', write_start, write_start + bytes_read)
+
+                if newline == -1:
+                    self.dropped += bytes_read
+                    continue
+
+                self.dropped += newline + 1 - write_start
+                self.start, self.length = (newline + 1) % len(self.buffer), write_start + bytes_read - newline - 1
+                self.skipping = False
+            else:
+                self.length += bytes_read
+
+        return total_read
+
+    # removes and returns every complete line, as one bytes object
+    def take_lines(self) -> bytes:
+        if not self.length:
+            return b''
+
+        end: int = self.start + self.length
+
+        if end <= len(self.buffer):
+            lines_end: int = self.buffer.rfind(b'\n', self.start, end) + 1
+            lines: bytes = bytes(self.view[self.start:lines_end]) if lines_end else b''
+        else:
+            # wrapped around, so the newest lines are at the start of the buffer
+            lines_end = self.buffer.rfind(b'\n', 0, end - len(self.buffer)) + 1
+
+            if lines_end:
+                lines = bytes(self.view[self.start:]) + bytes(self.view[:lines_end])
+            else:
+                lines_end = self.buffer.rfind(b'\n', self.start, len(self.buffer)) + 1
+                lines = bytes(self.view[self.start:lines_end]) if lines_end else b''
+
+        if lines:
+            self.start, self.length = lines_end % len(self.buffer), self.length - len(lines)
+
+            if not self.length:
+                self.start = 0
+
+        return lines
+
+    # throws away a line that's filled the whole buffer without ending, along with the rest of it as it's read
+    def drop_line(self):
+        self.dropped += self.length
+        self.start = self.length = 0
+        self.skipping = True
+
+    # throws away everything, without counting it as dropped
+    def clear(self):
+        self.start = self.length = 0
+        self.skipping = False
+
+
+# somewhere console output comes from, read without ever blocking. poll() gives whatever whole lines have arrived since the last poll
+class LogSource(abc.ABC):
+    def __init__(self, log: logger.Log, name: str, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        self.log: logger.Log = log
+        self.name: str = name
+        self.ring: RingBuffer = RingBuffer(buffer_bytes)
+        self.ended: bool = False  # whether nothing more will ever come
+        self.restarted: bool = False  # whether it started over from the beginning (e.g. a followed file being trimmed), so everything it gave before is stale
+
+    def __repr__(self):
+        return f"log_source.{type(self).__name__} ({self.name}, {self.ring.dropped} bytes dropped, ended={self.ended})"
+
+    # reads what's available into view without blocking, and returns how much that was (0 if nothing). sets ended if there'll never be more
+    @abc.abstractmethod
+    def read_into(self, view: memoryview) -> int:
+        pass
+
+    # the file descriptor (or socket) that select() can wait on, if any
+    def fileno(self) -> Union[int, None]:
+        return None
+
+    # the whole lines that have arrived, up to a buffer's worth. call again until it gives b'' to get everything
+    def poll(self) -> bytes:
+        dropped_before: int = self.ring.dropped
+        self.ring.fill(self.read_into)
+        lines: bytes = self.ring.take_lines()
+
+        if not lines and self.ring.full:
+            self.ring.drop_line()
+            self.ring.fill(self.read_into)
+            lines = self.ring.take_lines()
+
+        if self.ring.dropped != dropped_before:
+            self.log.error(f"Dropped {self.ring.dropped - dropped_before} bytes of a line too long for {self.name}'s buffer", reportable=False)
+
+        return lines
+
+    # sleeps until there's something to read or the timeout runs out, and returns whether there is. like file_watcher.FileWatcher.wait(), it just sleeps if it can't tell
+    def wait(self, timeout: float) -> bool:
+        fileno: Union[int, None] = self.fileno()
+
+        if fileno is None:
+            time.sleep(timeout)
+            return False
+
+        return bool(select.select([fileno], [], [], timeout)[0])
+
+    # throws away the partial line left over from before starting over, once the caller has thrown away what it made of the rest
+    def clear_restart(self):
+        self.ring.clear()
+        self.restarted = False
+
+    def close(self):
+        self.ended = True
+
+
+# a file that's being written to, read from the start (or wherever it's told to) and then followed as it grows. reading a regular file never blocks, and select() can't
+# wait on one since it's always "readable"
+class FileSource(LogSource):
+    def __init__(self, log: logger.Log, path: str, start_offset: int = 0, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        super().__init__(log, path, buffer_bytes)
+        self.file = open(path, 'rb', buffering=0)
+        self.file.seek(start_offset)
+
+    def read_into(self, view: memoryview) -> int:
+        bytes_read: int = self.file.readinto(view)
+
+        # trimmed (see console_archive.trim()) or rewritten, so start over from its new start. nothing's read from there until the caller's dealt with restarted
+        if not bytes_read and not self.restarted and os.fstat(self.file.fileno()).st_size < self.file.tell():
+            self.log.debug(f"{self.name} got smaller, reading it from the start")
+            self.file.seek(0)
+            self.restarted = True
+
+        return bytes_read
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+# a pipe or stdin, set to non-blocking. only possible where os.set_blocking() works on pipes, which isn't Windows (before Python 3.12)
+class FdSource(LogSource):
+    def __init__(self, log: logger.Log, fd: int, name: str, eof_ends: bool = True, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        super().__init__(log, name, buffer_bytes)
+        self.fd: int = fd
+        self.eof_ends: bool = eof_ends
+
+        try:
+            os.set_blocking(fd, False)
+        except (AttributeError, OSError) as error:
+            raise OSError(f"Can't read {name} without blocking on this platform, use a TCP source instead ({error})")
+
+    def read_into(self, view: memoryview) -> int:
+        try:
+            data: bytes = os.read(self.fd, len(view))
+        except BlockingIOError:
+            return 0
+
+        if not data and self.eof_ends:
+            self.ended = True
+
+        view[:len(data)] = data
+        return len(data)
+
+    def fileno(self) -> Union[int, None]:
+        return None if self.ended else self.fd
+
+    def close(self):
+        super().close()
+        os.close(self.fd)
+
+
+# a named pipe (FIFO). it's opened for writing too, so that it doesn't read as ended between one writer closing it and the next opening it, which also keeps select() from
+# waking up constantly while nothing's writing
+class PipeSource(FdSource):
+    def __init__(self, log: logger.Log, path: str, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        super().__init__(log, os.open(path, os.O_RDWR | os.O_NONBLOCK), path, False, buffer_bytes)
+
+
+class StdinSource(FdSource):
+    def __init__(self, log: logger.Log, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        super().__init__(log, os.dup(sys.stdin.fileno()), 'stdin', True, buffer_bytes)  # a duplicate, so closing this doesn't close stdin
+
+
+# a TCP connection that console output is streamed over (e.g. from a capture tool on the machine TF2 is running on). works the same everywhere
+class SocketSource(LogSource):
+    def __init__(self, log: logger.Log, connection: socket.socket, name: str, buffer_bytes: int = SOURCE_BUFFER_BYTES):
+        super().__init__(log, name, buffer_bytes)
+        self.connection: socket.socket = connection
+        self.connection.setblocking(False)
+
+    def read_into(self, view: memoryview) -> int:
+        if self.ended:
+            return 0
+
+        try:
+            bytes_read: int = self.connection.recv_into(view)
+        except (BlockingIOError, InterruptedError):
+            return 0
+        except OSError as error:
+            self.log.error(f"Lost connection to {self.name}: {error}", reportable=False)
+            bytes_read = 0
+
+        if not bytes_read:
+            self.ended = True
+
+        return bytes_read
+
+    def fileno(self) -> Union[int, None]:
+        return None if self.ended else self.connection.fileno()
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+
+# makes a source from a description of it: "-" for stdin, "tcp://host:port" to connect to, or a path to a named pipe or to a file to follow
+def open_source(log: logger.Log, description: str, buffer_bytes: int = SOURCE_BUFFER_BYTES) -> LogSource:
+    if description == '-':
+        return StdinSource(log, buffer_bytes)
+    elif description.startswith('tcp://'):
+        address: Tuple[str, int] = parse_tcp_address(description)
+        return SocketSource(log, socket.create_connection(address, timeout=10), description, buffer_bytes)
+    elif stat.S_ISFIFO(os.stat(description).st_mode):
+        return PipeSource(log, description, buffer_bytes)
+    else:
+        return FileSource(log, description, buffer_bytes=buffer_bytes)
+
+
+# "tcp://host:port" to (host, port), with IPv6 hosts in brackets like in URLs
+def parse_tcp_address(description: str) -> Tuple[str, int]:
+    host, separator, port = description[6:].rpartition(':')
+
+    if not separator or not port.isdigit():
+        raise ValueError(f"A TCP source needs a port, e.g. tcp://localhost:27000 (got {description})")
+
+    return host.strip('[]'), int(port)
@@ -27,20 +27,25 @@ import datetime
 import gc
 import os
 import platform
+import threading
 import time
 import traceback
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Set, Tuple, Union
 
 import psutil
 from colorama import Style
 from discoIPC import ipc
 
 import configs
+import console_archive
 import console_log
 import custom_maps
+import file_watcher
 import launcher
 import localization
+import log_source
 import logger
+import proc_events
 import processes
 import settings
 import utils
@@ -99,14 +104,23 @@ class TF2RichPresense:
         self.should_mention_steam: bool = True
         self.last_notify_time: Union[float, None] = None
         self.has_checked_class_configs: bool = False
-        self.process_scanner: processes.ProcessScanner = processes.ProcessScanner(self.log)
+        self.process_scanner: processes.ProcessScanner = processes.ProcessScanner(self.log, proc_events.ProcEventWatcher(self.log))
+        self.process_changes: List[processes.ProcessEvent] = []  # since the last loop
+        self.process_scanner.subscribe(self.process_changed)
+        self.valid_usernames: List[str] = []
         self.loc: localization.Localizer = localization.Localizer(self.log, settings.get('language'))
         self.current_time_formatted: str = ""
         self.current_map: Union[str, None] = None  # don't trust this variable
         self.time_changed_map: float = time.time()
         self.has_seen_kataiser: bool = False
-        self.old_console_log_mtime: Union[int, None] = None
-        self.old_console_log_interpretation: tuple = ('', '')
+        self.watchlist_notified: Set[str] = set()  # watched players already pointed out on the current map
+        self.console_log_state, self.old_console_log_interpretation, self.old_console_log_fingerprint = console_log.load_checkpoint(self.log)  # from before the last restart
+        self.console_log_result: console_log.ConsoleLogState = self.console_log_state if self.console_log_state else console_log.ConsoleLogState()
+        self.console_log_watcher: file_watcher.FileWatcher = file_watcher.FileWatcher(self.log)
+        self.console_log_changed: bool = True  # since the last loop, as far as console_log_watcher can tell (so always, if it's not watching)
+        self.console_log_lines: Tuple[str, str] = ('', '')  # the last top and bottom lines from interpret_console_log()
+        self.console_source: Union[log_source.LogSource, None] = None  # what's read instead of console.log, if the console_source setting is set
+        self.console_log_trim_thread: Union[threading.Thread, None] = None
         self.map_gamemodes: Dict[str, Dict[str, List[str]]] = utils.load_maps_db()
         self.loop_iteration: int = 0
         self.custom_functions = None
@@ -165,13 +179,33 @@ class TF2RichPresense:
 
     def run(self):
         sleep_time: int = settings.get('wait_time')
+        watched_min_sleep_time: int = 1  # TF2 writes lines in bursts, so there's no point scanning console.log more than once a second
+        watched_max_sleep_time: int = max(sleep_time, 15)
 
         while True:
             self.loop_body()
 
-            # rich presence only updates every 15 seconds, but it listens constantly so sending every 2 seconds (by default) is fine
-            self.log.debug(f"Sleeping for {sleep_time} seconds")
-            time.sleep(sleep_time)
+            if self.console_source:
+                # same as watching console.log, but the source is read every time anyway
+                self.log.debug(f"Sleeping for {watched_min_sleep_time} to {sleep_time} seconds, until {self.console_source.name} has output")
+                time.sleep(watched_min_sleep_time)
+                self.console_source.wait(max(sleep_time - watched_min_sleep_time, 0))
+            elif self.console_log_watcher.watching:
+                # wake up as soon as TF2 writes to console.log or a program exits, and otherwise only as often as rich presence can update. if there's no telling when a
+                # program exits, it's as often as when not watching, so that TF2 or Discord closing is still noticed in time
+                exit_fds: List[int] = self.process_scanner.exit_fds()
+                max_sleep_time: int = watched_max_sleep_time if exit_fds else sleep_time
+                self.log.debug(f"Sleeping for {watched_min_sleep_time} to {max_sleep_time} seconds, until console.log changes (or a program exits: {bool(exit_fds)})")
+                time.sleep(watched_min_sleep_time)
+
+                self.console_log_changed = self.console_log_watcher.wait(max(max_sleep_time - watched_min_sleep_time, 0), exit_fds)
+                if not self.console_log_changed:
+                    self.log.debug("console.log hasn't changed")
+            else:
+                # rich presence only updates every 15 seconds, but it listens constantly so sending every 2 seconds (by default) is fine
+                self.log.debug(f"Sleeping for {sleep_time} seconds")
+                time.sleep(sleep_time)
+                self.console_log_changed = True
 
     # the main logic. runs every 2 seconds (by default)
     def loop_body(self):
@@ -187,117 +221,144 @@ class TF2RichPresense:
             self.old_activity1['state'] = ''
 
         # this as a one-liner is beautiful :)
-        p_data: Dict[str, Dict[str, Union[bool, str, int, None]]] = self.process_scanner.scan()
+        p_data: Dict[str, processes.ProcessInfo] = self.process_scanner.scan()
+        process_changes: List[processes.ProcessEvent] = self.process_changes
+        self.process_changes = []
 
-        if p_data['Steam']['running']:
-            # reads a steam config file
+        if p_data['Steam'].running:
+            # reads a steam config file, which only depends on Steam and TF2 (through their paths and whether TF2 is running)
             # TODO: re-scan this (and maybe some other stuff) when leaving a game (or maybe some other time idk)
-            valid_usernames: List[str] = configs.steam_config_file(self.log, p_data['Steam']['path'], p_data['TF2']['running'])
-        elif p_data['Steam']['pid'] is not None or p_data['Steam']['path'] is not None:
+            if [process_change for process_change in process_changes if process_change.program in ('Steam', 'TF2')]:
+                self.valid_usernames = configs.steam_config_file(self.log, p_data['Steam'].path, p_data['TF2'].running)
+
+            valid_usernames: List[str] = self.valid_usernames
+        elif p_data['Steam'].pid is not None or p_data['Steam'].path is not None:
             self.log.error(f"Steam isn't running but its process info is {p_data['Steam']}. WTF?")
 
         # used for display only
         current_time: str = datetime.datetime.now().strftime('%I:%M:%S %p')
         self.current_time_formatted = current_time[1:] if current_time.startswith('0') else current_time
 
-        if p_data['TF2']['running'] and p_data['Discord']['running'] and p_data['Steam']['running']:
-            if not p_data['Steam']['running'] and p_data['TF2']['running']:
+        if p_data['TF2'].running and p_data['Discord'].running and p_data['Steam'].running:
+            if not p_data['Steam'].running and p_data['TF2'].running:
                 self.log.error("TF2 is running but Steam isn't. WTF?")
 
             if not self.has_checked_class_configs:
                 # modifies a few tf2 config files
-                configs.class_config_files(self.log, p_data['TF2']['path'])
+                configs.class_config_files(self.log, p_data['TF2'].path)
                 self.has_checked_class_configs = True
 
-            console_log_path: str = os.path.join(p_data['TF2']['path'], 'tf', 'console.log')
+            console_log_path: str = os.path.join(p_data['TF2'].path, 'tf', 'console.log')
+            self.console_log_watcher.watch(console_log_path)
             top_line: str
             bottom_line: str
-            top_line, bottom_line = self.interpret_console_log(console_log_path, valid_usernames, tf2_start_time=p_data['TF2']['time'])
-            # TODO: use a state machine and/or much more consistent var names
 
-            actual_current_class: str = bottom_line  # oh my god.
+            if settings.get('console_source') and self.open_console_source():
+                top_line, bottom_line = console_log.interpret_source(self, self.console_source, valid_usernames)
+                self.console_log_lines = (top_line, bottom_line)
+            elif process_changes or self.console_log_changed or not self.console_log_watcher.watching:
+                top_line, bottom_line = self.interpret_console_log(console_log_path, valid_usernames, tf2_start_time=p_data['TF2'].time)
+                self.console_log_lines = (top_line, bottom_line)
+            else:
+                self.log.debug("Not scanning console.log, since neither it nor any processes have changed")
+                top_line, bottom_line = self.console_log_lines
+
+            console_state: console_log.ConsoleLogState = self.console_log_result  # what top_line and bottom_line came from, so they don't need to be parsed
+            actual_current_class: str = console_state.current_class
 
-            if 'In menus' in top_line:
+            if console_state.in_menus:
                 # in menus displays the main menu
                 self.test_state = 'menus'
                 self.current_map = None
                 self.activity['assets']['small_image'] = 'tf2_icon_small'
                 self.activity['assets']['small_text'] = 'Team Fortress 2'
 
-                if bottom_line == 'Queued for Casual':
+                if console_state.queue == 'Casual':
                     self.activity['assets']['large_image'] = 'casual'
                     self.activity['assets']['large_text'] = bottom_line
-                elif bottom_line == 'Queued for Competitive':
+                elif console_state.queue == 'Competitive':
                     self.activity['assets']['large_image'] = 'comp'
                     self.activity['assets']['large_text'] = bottom_line
-                elif 'Queued for MvM' in bottom_line:
+                elif console_state.queue.startswith('MvM'):
                     self.activity['assets']['large_image'] = 'mvm_queued'
                     self.activity['assets']['large_text'] = bottom_line
                 else:
                     self.activity['assets']['large_image'] = 'main_menu'
                     self.activity['assets']['large_text'] = 'Main menu'
+
+                # with con_timestamp on, console.log says when queuing started, so show how long it's been (the queue is still in the large image's text)
+                if settings.get('map_time') and console_state.queue_started is not None:
+                    seconds_queued = max(time.time() - console_state.queue_started, 0)
+                    time_format = '%M:%S' if seconds_queued <= 3600 else '%H:%M:%S'
+                    bottom_line = self.loc.text("Time queued: {0}").format(time.strftime(time_format, time.gmtime(seconds_queued)))
             else:  # not in menus = in a game
                 self.test_state = 'in game'
                 class_pic_type: str = settings.get('class_pic_type').lower()
 
-                if class_pic_type == 'none, use tf2 logo' or bottom_line == 'unselected':
+                if class_pic_type == 'none, use tf2 logo' or actual_current_class == 'unselected':
                     self.activity['assets']['small_image'] = 'tf2_icon_small'
                     self.activity['assets']['small_text'] = 'Team Fortress 2'
                 else:
-                    small_class_image = f'{bottom_line.lower()}_{class_pic_type}'
+                    small_class_image = f'{actual_current_class.lower()}_{class_pic_type}'
                     self.log.debug(f"Setting class small image to {small_class_image}")
 
                     self.activity['assets']['small_image'] = small_class_image
-                    self.activity['assets']['small_text'] = bottom_line
+                    if settings.get('kill_stats'):
+                        # already localized, since the counts change constantly
+                        self.activity['assets']['small_text'] = self.loc.text("{0} ({1} kills, {2} deaths)").format(
+                            self.loc.text(actual_current_class), console_state.kills, console_state.deaths)
+                    else:
+                        self.activity['assets']['small_text'] = actual_current_class
 
                 if settings.get('map_time'):
-                    if self.current_map != top_line:  # top_line means the current map here... I should probably refactor that
-                        self.current_map = top_line
+                    if self.current_map != console_state.current_map:
+                        self.current_map = console_state.current_map
                         self.time_changed_map = time.time()
 
+                    # with con_timestamp on, console.log says exactly when the map loaded, instead of whenever this loop happened to notice
+                    if console_state.map_started is not None:
+                        self.time_changed_map = console_state.map_started
+
                     # convert seconds to a pretty timestamp
-                    seconds_on_map = time.time() - self.time_changed_map
+                    seconds_on_map = max(time.time() - self.time_changed_map, 0)
                     time_format = '%M:%S' if seconds_on_map <= 3600 else '%H:%M:%S'
                     map_time_formatted = time.strftime(time_format, time.gmtime(seconds_on_map))
 
                     # I know I could just set the start time in activity, but I'd rather that always meant time with the game open
-                    class_line = self.loc.text("Class: {0}").format(self.loc.text(bottom_line))
+                    class_line = self.loc.text("Class: {0}").format(self.loc.text(actual_current_class))
                     bottom_line = self.loc.text("Time on map: {0}").format(map_time_formatted)
                 else:
-                    bottom_line = self.loc.text("Class: {0}").format(self.loc.text(bottom_line))
-
-                # good code
-                hosting: bool = ' (hosting)' in top_line
-                top_line = top_line.replace(' (hosting)', '')
+                    bottom_line = self.loc.text("Class: {0}").format(self.loc.text(actual_current_class))
 
                 try:
-                    map_fancy, current_gamemode, gamemode_fancy = self.map_gamemodes['official'][top_line]
+                    map_fancy, current_gamemode, gamemode_fancy = self.map_gamemodes['official'][console_state.current_map]
                     map_out: str = map_fancy
                     self.activity['assets']['large_image'] = current_gamemode
                     self.activity['assets']['large_text'] = gamemode_fancy
                 except KeyError:
                     # is a custom map
-                    custom_gamemode, custom_gamemode_fancy_english = custom_maps.find_custom_map_gamemode(self.log, top_line, False)
+                    custom_gamemode, custom_gamemode_fancy_english = custom_maps.find_custom_map_gamemode(self.log, console_state.current_map, False)
                     custom_gamemode_fancy = self.loc.text(custom_gamemode_fancy_english)
-                    map_out = top_line
+                    map_out = console_state.current_map
                     self.activity['assets']['large_image'] = custom_gamemode
                     self.activity['assets']['large_text'] = "{0} {1}".format(custom_gamemode_fancy, self.loc.text("[custom/community map]"))
 
                 top_line = self.loc.text("Map: {0}").format(map_out)
-                top_line = f"{top_line}{self.loc.text(' (hosting)')}" if hosting else top_line
+                top_line = f"{top_line}{self.loc.text(' (hosting)')}" if console_state.hosting else top_line
 
             self.activity['details'] = top_line
             self.activity['state'] = bottom_line
             og_large_text: str = self.activity['assets']['large_text']  # why
             self.activity['assets']['large_text'] = self.loc.text(self.activity['assets']['large_text'])
-            self.activity['timestamps']['start'] = p_data['TF2']['time']
+            self.activity['timestamps']['start'] = p_data['TF2'].time
 
             if self.custom_functions:
                 self.custom_functions.loop_middle(self)
 
             activity_comparison: Dict[str, Union[str, Dict[str, int], Dict[str, str]]] = copy.deepcopy(self.activity)
-            if self.loc.text("Time on map: {0}").replace('{0}', '') in activity_comparison['state']:
-                activity_comparison['state'] = ''
+            for time_line in ("Time on map: {0}", "Time queued: {0}"):
+                if self.loc.text(time_line).replace('{0}', '') in activity_comparison['state']:
+                    activity_comparison['state'] = ''
 
             if activity_comparison != self.old_activity1:
                 # output to terminal, just for monitoring
@@ -323,7 +384,7 @@ class TF2RichPresense:
 
                 print(Style.RESET_ALL, end='')
 
-                time_elapsed = datetime.timedelta(seconds=int(time.time() - p_data['TF2']['time']))
+                time_elapsed = datetime.timedelta(seconds=int(time.time() - p_data['TF2'].time))
                 print(self.loc.text("{0} elapsed").format(str(time_elapsed).replace('0:', '', 1)))
                 print()
 
@@ -348,10 +409,10 @@ class TF2RichPresense:
             if not self.client_connected:
                 self.log.critical("self.client is disconnected when it shouldn't be")
 
-        elif not p_data['TF2']['running']:
+        elif not p_data['TF2'].running:
             self.necessary_program_not_running('Team Fortress 2', self.should_mention_tf2, 'TF2')
             self.should_mention_tf2 = False
-        elif not p_data['Discord']['running']:
+        elif not p_data['Discord'].running:
             self.necessary_program_not_running('Discord', self.should_mention_discord)
             self.should_mention_discord = False
         else:
@@ -369,10 +430,16 @@ class TF2RichPresense:
 
         return self.client_connected, self.client
 
+    # ProcessScanner calls this for every change it sees, which loop_body() then goes through
+    def process_changed(self, process_change: processes.ProcessEvent):
+        self.log.debug(f"Process change: {process_change}")
+        self.process_changes.append(process_change)
+
     # notify user (possibly) and restart (possibly)
     def necessary_program_not_running(self, program_name: str, should_mention: bool, name_short: str = ''):
         name_short = program_name if not name_short else name_short
         self.test_state = f'no {name_short.lower()}'
+        self.console_log_watcher.unwatch()  # otherwise, it would take longer to notice the program starting
 
         if self.client_connected:
             try:
@@ -411,6 +478,30 @@ class TF2RichPresense:
     def interpret_console_log(self, *args, **kwargs) -> Tuple[str, str]:
         return console_log.interpret(self, *args, **kwargs)
 
+    # cuts console.log down to its last keep_bytes in a thread, archiving what's cut if the setting's enabled (see console_archive.trim())
+    def trim_console_log(self, console_log_path: str, keep_bytes: int):
+        archive_dir: Union[str, None] = console_archive.CONSOLE_ARCHIVE_DIR if settings.get('archive_console_log') else None
+        self.console_log_trim_thread = threading.Thread(target=console_archive.trim, args=(self.log, console_log_path, keep_bytes, 1048576, True, archive_dir),
+                                                        name='console.log trimmer')
+        self.console_log_trim_thread.start()
+
+    # opens the source in the console_source setting, unless it's already open, and returns whether it is. if it's ended it gets reopened, and if it can't be opened,
+    # console.log is read instead until the next loop
+    def open_console_source(self) -> bool:
+        if self.console_source and self.console_source.ended:
+            self.log.debug(f"{self.console_source} ended, reopening")
+            self.console_source.close()
+            self.console_source = None
+
+        if not self.console_source:
+            try:
+                self.console_source = log_source.open_source(self.log, settings.get('console_source'))
+                self.log.debug(f"Opened {self.console_source}")
+            except (OSError, ValueError) as error:
+                self.log.error(f"Couldn't open console source \"{settings.get('console_source')}\", reading console.log instead: {error}", reportable=False)
+
+        return self.console_source is not None
+
     # sends localized RPC data, connecting to Discord initially if need be
     def send_rpc_activity(self):
         try:
@@ -425,10 +516,11 @@ class TF2RichPresense:
             # localize activity
             self.activity_translated = copy.deepcopy(self.activity)
             self.activity_translated['details'] = self.loc.text(self.activity['details'])
-            self.activity_translated['assets']['small_text'] = self.loc.text(self.activity['assets']['small_text'])
             self.activity_translated['assets']['large_text'] = self.loc.text(self.activity['assets']['large_text'])
 
-            # stop DB.json spam as the map time increases
+            # stop DB.json spam as the map time and kill stats increase
+            if not (settings.get('kill_stats') and self.test_state == 'in game' and self.activity['assets']['small_text'] != 'Team Fortress 2'):
+                self.activity_translated['assets']['small_text'] = self.loc.text(self.activity['assets']['small_text'])
             if not (settings.get('map_time') and self.test_state == 'in game'):
                 self.activity_translated['state'] = self.loc.text(self.activity['state'])
 
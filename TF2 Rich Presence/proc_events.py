@@ -0,0 +1,113 @@
+# Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
+# https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
+# cython: language_level=3
+
+import errno
+import os
+import socket
+import struct
+import sys
+from typing import List, Tuple, Union
+
+import logger
+
+# from linux/netlink.h, linux/connector.h, and linux/cn_proc.h
+NETLINK_CONNECTOR: int = 11
+CN_IDX_PROC: int = 1
+CN_VAL_PROC: int = 1
+NLMSG_DONE: int = 3
+PROC_CN_MCAST_LISTEN: int = 1
+PROC_CN_MCAST_IGNORE: int = 2
+PROC_EVENT_EXEC: int = 0x00000002
+PROC_EVENT_EXIT: int = 0x80000000
+NLMSG_HEADER: struct.Struct = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+CN_MSG_HEADER: struct.Struct = struct.Struct('=IIIIHH')  # idx, val, seq, ack, len, flags (then the data)
+PROC_EVENT_HEADER: struct.Struct = struct.Struct('=IIQ')  # what, cpu, timestamp_ns (then the event's data)
+PROC_EVENT_IDS: struct.Struct = struct.Struct('=II')  # process_pid, process_tgid, which both exec and exit events start with
+RECEIVE_BUFFER_BYTES: int = 1048576  # lots of processes can start at once (e.g. while compiling something), and events that don't fit are lost
+
+
+# finds out about processes starting (well, exec-ing) and exiting as it happens, from the kernel's proc connector. only works on Linux, and only with CAP_NET_ADMIN (usually as
+# root). everywhere else listening is False, and ProcessScanner falls back to polling
+class ProcEventWatcher:
+    def __init__(self, log: logger.Log):
+        self.log: logger.Log = log
+        self.connection: Union[socket.socket, None] = None
+        self.events_lost: bool = False  # whether some events didn't fit in the socket's buffer since the last read_events()
+
+        if sys.platform.startswith('linux'):
+            try:
+                self.connection = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+                self.connection.bind((0, CN_IDX_PROC))
+                self.send_control(PROC_CN_MCAST_LISTEN)
+                self.connection.setblocking(False)
+                self.log.debug("Listening for process events from the proc connector")
+            except (OSError, AttributeError) as error:
+                self.log.debug(f"Couldn't listen for process events (normal without root), falling back to polling: {error}")
+                self.close()
+
+    def __repr__(self):
+        return f"proc_events.ProcEventWatcher (listening={self.listening})"
+
+    # whether read_events() will give anything
+    @property
+    def listening(self) -> bool:
+        return self.connection is not None
+
+    # tells the kernel to start or stop sending events
+    def send_control(self, operation: int):
+        operation_data: bytes = struct.pack('=I', operation)
+        cn_msg: bytes = CN_MSG_HEADER.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(operation_data), 0) + operation_data
+        self.connection.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(cn_msg), NLMSG_DONE, 0, 0, os.getpid()) + cn_msg)
+
+    # every exec and exit (of whole processes, not threads) since the last read, as (PROC_EVENT_EXEC or PROC_EVENT_EXIT, PID), in order. or None if any were lost, in which case
+    # there's no telling what's running without looking through every process
+    def read_events(self) -> Union[List[Tuple[int, int]], None]:
+        events: List[Tuple[int, int]] = []
+
+        while self.listening:
+            try:
+                message: bytes = self.connection.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as error:
+                if error.errno != errno.ENOBUFS:
+                    raise
+
+                self.events_lost = True
+                continue
+
+            message_start: int = 0
+            while message_start + NLMSG_HEADER.size <= len(message):
+                message_length: int = NLMSG_HEADER.unpack_from(message, message_start)[0]
+                event_start: int = message_start + NLMSG_HEADER.size + CN_MSG_HEADER.size
+
+                if message_length < NLMSG_HEADER.size or event_start + PROC_EVENT_HEADER.size + PROC_EVENT_IDS.size > len(message):
+                    break
+
+                what: int = PROC_EVENT_HEADER.unpack_from(message, event_start)[0]
+
+                if what == PROC_EVENT_EXEC or what == PROC_EVENT_EXIT:
+                    pid, tgid = PROC_EVENT_IDS.unpack_from(message, event_start + PROC_EVENT_HEADER.size)
+
+                    if pid == tgid:  # otherwise it's a thread
+                        events.append((what, pid))
+
+                message_start += (message_length + 3) & ~3  # NLMSG_ALIGN
+
+        if self.events_lost:
+            self.events_lost = False
+            return None
+
+        return events
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.send_control(PROC_CN_MCAST_IGNORE)
+            except OSError:
+                pass
+
+            self.connection.close()
+            self.connection = None
@@ -2,39 +2,91 @@
 # https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
 # cython: language_level=3
 
-import copy
-import functools
+import collections
+import ctypes
+import errno
 import os
+import select
 import subprocess
+import sys
 import time
 import traceback
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, NamedTuple, Tuple, Union
 
 import psutil
 
 import logger
+import proc_events
+
+SYS_PIDFD_OPEN: int = 434  # the same on every architecture
+PROCESS_IDENTITY_CACHE_SIZE: int = 32  # the three programs, plus room for them restarting and for other hl2.exe processes
+
+
+# what a scan found for one program. it's a tuple, so it can't be changed once it's made and comparing two is cheap, which means scan results can be kept around without copying
+class ProcessInfo(NamedTuple):
+    running: bool = False
+    pid: Union[int, None] = None
+    path: Union[str, None] = None  # TF2's and Steam's folders
+    time: Union[int, None] = None  # when TF2 started
+
+
+NOT_RUNNING: ProcessInfo = ProcessInfo()
+
+
+# what's different about a program since the last scan. info is what it is now, and previous is what it was
+class ProcessEvent:
+    __slots__ = ('program', 'info', 'previous')
+
+    def __init__(self, program: str, info: ProcessInfo, previous: ProcessInfo):
+        self.program: str = program
+        self.info: ProcessInfo = info
+        self.previous: ProcessInfo = previous
+
+    def __repr__(self):
+        return f"processes.{type(self).__name__} ({self.program}, {self.info})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, slot) == getattr(other, slot) for slot in ProcessEvent.__slots__)
+
+
+class ProcessStarted(ProcessEvent):
+    __slots__ = ()
+
+
+class ProcessExited(ProcessEvent):
+    __slots__ = ()
+
+
+# still running (or still not), but with a different PID, path, or start time
+class ProcessChanged(ProcessEvent):
+    __slots__ = ()
 
 
 class ProcessScanner:
-    def __init__(self, log: logger.Log):
+    def __init__(self, log: logger.Log, proc_event_watcher: Union[proc_events.ProcEventWatcher, None] = None):
         self.log: logger.Log = log
+        self.proc_event_watcher: Union[proc_events.ProcEventWatcher, None] = proc_event_watcher  # if it's listening, replaces polling on Linux
         self.all_pids_cached: bool = False
-        self.used_tasklist: bool = False
+        self.used_tasklist: bool = False  # whether the last scan had to look through every process (with tasklist on Windows)
         self.parsed_tasklist: Dict[str, int] = {}
         self.executables: Dict[str, list] = {'posix': ['hl2_linux', 'steam', 'Discord'],
                                              'nt': ['hl2.exe', 'steam.exe', 'discord'],
                                              'order': ['TF2', 'Steam', 'Discord']}
-        self.process_data: Dict[str, dict] = {'TF2': {'running': False, 'pid': None, 'path': None, 'time': None},
-                                              'Steam': {'running': False, 'pid': None, 'path': None},
-                                              'Discord': {'running': False, 'pid': None}}
-        self.p_data_default: Dict[str, dict] = copy.deepcopy(self.process_data)
-        self.p_data_last: Dict[str, dict] = copy.deepcopy(self.process_data)
+        self.process_data: Dict[str, ProcessInfo] = {'TF2': NOT_RUNNING, 'Steam': NOT_RUNNING, 'Discord': NOT_RUNNING}  # entries are replaced, never changed
+        self.p_data_last: Dict[str, ProcessInfo] = dict(self.process_data)
+        self.create_times: Dict[str, float] = {}  # when each cached PID's process started, since PIDs get reused (only on posix)
+        self.proc_path: str = '/proc'  # only changed for testing
+        self.swept_while_listening: bool = False  # whether process events have been kept up with since a look through every process
+        self.pidfds: Dict[str, int] = {}  # for each cached PID, if possible (Linux 5.3+), to find out when they exit without checking on them (or waiting for a scan)
+        self.identities: collections.OrderedDict = collections.OrderedDict()  # (PID, create time): ProcessIdentity, least recently used first
+        self.subscribers: List[Callable[[ProcessEvent], None]] = []
+        self.events: List[ProcessEvent] = []  # from the last scan
 
     def __repr__(self):
         return f"processes.ProcessScanner (all cached={self.all_pids_cached}, tf2={self.process_data['TF2']}, discord={self.process_data['Discord']}, steam={self.process_data['Steam']})"
 
     # scan all running processes to look for TF2, Steam, and Discord
-    def scan(self) -> Dict[str, Dict[str, Union[bool, str, int, None]]]:
+    def scan(self) -> Dict[str, ProcessInfo]:
         # TODO: use sys.platform everywhere instead of os.name (if possible)
         if os.name == 'nt':
             self.scan_windows()
@@ -43,11 +95,43 @@ class ProcessScanner:
 
         if self.process_data == self.p_data_last:
             self.log.debug(f"Process scanning got same results (used tasklist: {self.used_tasklist})")
+            self.events = []
         else:
             self.log.debug(f"Process scanning (used tasklist: {self.used_tasklist}) results: {self.process_data}")
+            self.events = self.diff(self.p_data_last, self.process_data)
+
+            for event in self.events:
+                for subscriber in self.subscribers:
+                    subscriber(event)
+
+        self.p_data_last = dict(self.process_data)  # just references to the same ProcessInfos, since they can't change
+        return self.p_data_last
+
+    # calls callback with each ProcessEvent from every scan from now on, in the same order as the programs are in executables['order']
+    def subscribe(self, callback: Callable[[ProcessEvent], None]):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ProcessEvent], None]):
+        self.subscribers.remove(callback)
+
+    # the events that get from one scan's results to another's
+    def diff(self, p_data_old: Dict[str, ProcessInfo], p_data_new: Dict[str, ProcessInfo]) -> List[ProcessEvent]:
+        events: List[ProcessEvent] = []
+
+        for program in self.executables['order']:
+            old: ProcessInfo = p_data_old[program]
+            new: ProcessInfo = p_data_new[program]
+
+            if old == new:
+                continue
+            elif new.running and not old.running:
+                events.append(ProcessStarted(program, new, old))
+            elif old.running and not new.running:
+                events.append(ProcessExited(program, new, old))
+            else:
+                events.append(ProcessChanged(program, new, old))
 
-        self.p_data_last = copy.deepcopy(self.process_data)
-        return self.process_data
+        return events
 
     # basically psutil.process_iter(attrs=['pid', 'cmdline', 'create_time']) but WAY faster (and also highly specialized)
     def scan_windows(self):
@@ -60,53 +144,227 @@ class ProcessScanner:
             if len(self.parsed_tasklist) == 3:
                 self.all_pids_cached = True
 
-            self.process_data['TF2']['pid'] = self.parsed_tasklist['hl2.exe'] if 'hl2.exe' in self.parsed_tasklist else None
-            self.process_data['Steam']['pid'] = self.parsed_tasklist['steam.exe'] if 'steam.exe' in self.parsed_tasklist else None
-            self.process_data['Discord']['pid'] = self.parsed_tasklist['discord'] if 'discord' in self.parsed_tasklist else None
+            self.process_data['TF2'] = self.process_data['TF2']._replace(pid=self.parsed_tasklist['hl2.exe'] if 'hl2.exe' in self.parsed_tasklist else None)
+            self.process_data['Steam'] = self.process_data['Steam']._replace(pid=self.parsed_tasklist['steam.exe'] if 'steam.exe' in self.parsed_tasklist else None)
+            self.process_data['Discord'] = self.process_data['Discord']._replace(pid=self.parsed_tasklist['discord'] if 'discord' in self.parsed_tasklist else None)
 
             self.get_all_extended_info()
         else:
             # all the PIDs are known, so don't use tasklist, saves 0.2 - 0.3 seconds :)
             self.get_all_extended_info()
 
-            p_data_old: Dict[str] = copy.deepcopy(self.process_data)
+            for program in self.executables['order']:
+                if not self.process_data[program].running and self.process_data[program] != NOT_RUNNING:
+                    self.process_data[program] = NOT_RUNNING
+                    self.all_pids_cached = False
 
-            if not self.process_data['TF2']['running']:
-                self.process_data['TF2'] = self.p_data_default['TF2']
-            if not self.process_data['Steam']['running']:
-                self.process_data['Steam'] = self.p_data_default['Steam']
-            if not self.process_data['Discord']['running']:
-                self.process_data['Discord'] = self.p_data_default['Discord']
+    # for Linux and MacOS (I think). like on Windows, once all the PIDs are known, they're just checked to still be the same processes instead of looking through every process.
+    # with process events, there's only ever one look through every process, and after that just keeping up with what's started and exited
+    def scan_posix(self):
+        self.used_tasklist = False
+        listening: bool = self.proc_event_watcher is not None and self.proc_event_watcher.listening
 
-            if self.process_data != p_data_old:
-                self.all_pids_cached = False
+        if listening and self.swept_while_listening:
+            events: Union[List[Tuple[int, int]], None] = self.proc_event_watcher.read_events()
 
-    # for Linux and MacOS (I think)
-    def scan_posix(self):
-        for proc in psutil.process_iter():
-            try:
-                details = proc.as_dict(attrs=['pid', 'name', 'cwd'])
-                for pos, name in enumerate(self.executables[os.name]):
-                    if self.process_data[self.executables['order'][pos]]['pid'] is not None:
-                        continue
+            if events is None:
+                self.log.error("Missed some process events, scanning all processes", reportable=False)
+            elif self.apply_proc_events(events):
+                return
+            else:
+                self.log.debug("A found process has exited, scanning all processes")  # in case there's another with the same name (Discord has several)
+        elif self.all_pids_cached and not listening:
+            if self.pidfds:
+                if not select.select(list(self.pidfds.values()), [], [], 0)[0]:
+                    return  # none of them have exited, and since a pidfd always refers to the same process, none of them can have been recycled either
+            elif self.cached_pids_alive():
+                return  # nothing that get_all_extended_info() would get can have changed
 
-                    if name == details['name']:
-                        self.process_data[self.executables['order'][pos]]['pid'] = details['pid']
-            except psutil.NoSuchProcess:
-                pass
+            self.log.debug("A cached process has exited, scanning all processes")
+
+        if listening:
+            self.proc_event_watcher.read_events()  # anything that's happened so far will be seen in the sweep
 
+        self.close_pidfds()
+        self.used_tasklist = True
+
+        if sys.platform.startswith('linux') and os.path.isdir(self.proc_path):
+            found: Dict[str, Tuple[int, float]] = self.sweep_proc()
+        else:
+            found = self.sweep_psutil()
+
+        for program in self.executables['order']:
+            self.process_data[program] = self.process_data[program]._replace(pid=found[program][0] if program in found else None)
+
+        self.create_times = {program: found[program][1] for program in found}
         self.get_all_extended_info()
+        self.all_pids_cached = all(self.process_data[program].running for program in self.executables['order'])
+        self.swept_while_listening = listening
+
+        if self.all_pids_cached:
+            self.open_pidfds()  # even if listening, for exit_fds()
+
+    # updates process_data from what's started and exited since the last scan. returns False if a found process has exited, since then everything needs to be looked through
+    def apply_proc_events(self, events: List[Tuple[int, int]]) -> bool:
+        programs: Dict[str, str] = self.comm_programs()
+        pids: Dict[int, str] = {self.process_data[program].pid: program for program in self.executables['order'] if self.process_data[program].pid is not None}
+        started: Dict[str, Tuple[int, float]] = {}
+
+        for what, pid in events:
+            if pid in pids or pid in [started[program][0] for program in started]:
+                if what == proc_events.PROC_EVENT_EXIT or programs.get(self.read_comm(pid)) is None:  # exiting or becoming something else
+                    return False
+            elif what == proc_events.PROC_EVENT_EXEC:
+                program: Union[str, None] = programs.get(self.read_comm(pid))
+
+                if program and not self.process_data[program].running and program not in started:
+                    create_time: Union[float, None] = self.read_create_time(pid, self.read_boot_time())
+
+                    if create_time is not None:
+                        self.log.debug(f"{program} started (PID {pid})")
+                        started[program] = (pid, create_time)
+
+        if started:
+            for program in started:
+                self.process_data[program] = self.process_data[program]._replace(pid=started[program][0])
+                self.create_times[program] = started[program][1]
+
+            self.get_all_extended_info()
+            self.all_pids_cached = all(self.process_data[program].running for program in self.executables['order'])
+
+            if self.all_pids_cached:
+                self.open_pidfds()
+
+        return True
+
+    # looks through every process for the programs, giving {program: (PID, create time)} for the lowest PID of each one found
+    def sweep_psutil(self) -> Dict[str, Tuple[int, float]]:
+        programs: Dict[str, str] = dict(zip(self.executables[os.name], self.executables['order']))  # process name: program
+        found: Dict[str, Tuple[int, float]] = {}
+
+        for proc in psutil.process_iter(attrs=['name', 'create_time']):
+            program: Union[str, None] = programs.get(proc.info['name'])
+
+            if program and program not in found:
+                found[program] = (proc.pid, proc.info['create_time'])
+
+        return found
+
+    # the same as sweep_psutil(), but reads /proc directly. that's several times faster, since only each process's comm (its name) is read, without making a psutil.Process
+    # for it. stat is then only read for the processes with the right names, to get their start times (calculated exactly like psutil does, so they can be compared)
+    def sweep_proc(self) -> Dict[str, Tuple[int, float]]:
+        programs: Dict[str, str] = self.comm_programs()
+        candidates: Dict[str, List[int]] = {}
+        found: Dict[str, Tuple[int, float]] = {}
+
+        with os.scandir(self.proc_path) as proc_entries:
+            for proc_entry in proc_entries:
+                if proc_entry.name.isdigit():
+                    program: Union[str, None] = programs.get(self.read_comm(proc_entry.name))
+
+                    if program:
+                        candidates.setdefault(program, []).append(int(proc_entry.name))
+
+        if not candidates:
+            return found
+
+        boot_time: float = self.read_boot_time()
+
+        for program in candidates:
+            for pid in sorted(candidates[program]):
+                create_time: Union[float, None] = self.read_create_time(pid, boot_time)
+
+                if create_time is not None:
+                    found[program] = (pid, create_time)
+                    break
+
+        return found
+
+    # comm (what a process's name is in /proc) to program. comm is cut off at 15 characters
+    def comm_programs(self) -> Dict[str, str]:
+        return {name[:15]: program for name, program in zip(self.executables['posix'], self.executables['order'])}
+
+    # a process's name from /proc, or None if it's exited
+    def read_comm(self, pid: Union[int, str]) -> Union[str, None]:
+        try:
+            with open(f'{self.proc_path}/{pid}/comm', 'rb', buffering=0) as comm_file:
+                return comm_file.read().rstrip(b'\n').decode('UTF8', errors='replace')
+        except OSError:
+            return None
+
+    # when a process started, calculated exactly like psutil's create_time() so the two can be compared. None if it's exited
+    def read_create_time(self, pid: int, boot_time: float) -> Union[float, None]:
+        try:
+            with open(f'{self.proc_path}/{pid}/stat', 'rb', buffering=0) as stat_file:
+                stat_fields: List[bytes] = stat_file.read().rpartition(b')')[2].split()  # the name can have spaces and parentheses in it
+        except OSError:
+            return None
+
+        return float(stat_fields[19]) / os.sysconf('SC_CLK_TCK') + boot_time  # starttime, in clock ticks since boot
+
+    def read_boot_time(self) -> float:
+        with open(f'{self.proc_path}/stat', 'rb') as system_stat_file:
+            for system_stat_line in system_stat_file:
+                if system_stat_line.startswith(b'btime'):
+                    return float(system_stat_line.split()[1])
+
+        return 0.0
+
+    # gets a pidfd for each cached PID, so that checking if any have exited is just one select() that doesn't look at the processes at all
+    def open_pidfds(self):
+        try:
+            for program in self.executables['order']:
+                self.pidfds[program] = pidfd_open(self.process_data[program].pid)
+        except OSError as error:
+            self.log.debug(f"Couldn't open pidfds, checking on cached PIDs instead: {error}")
+            self.close_pidfds()
+            return
+
+        # a PID could have been recycled between being found and getting its pidfd
+        if not self.cached_pids_alive():
+            self.close_pidfds()
+            self.all_pids_cached = False
+
+    def close_pidfds(self):
+        for pidfd in self.pidfds.values():
+            os.close(pidfd)
+
+        self.pidfds = {}
+
+    # file descriptors that select() sees as readable once any found process has exited, so that sleeping can end right then. empty if there aren't any (e.g. not on Linux,
+    # or not everything's running)
+    def exit_fds(self) -> List[int]:
+        return list(self.pidfds.values())
+
+    # whether every cached PID still belongs to the process it was found as, going by its name and start time. reads as little as possible (just /proc/<pid>/stat on Linux)
+    def cached_pids_alive(self) -> bool:
+        for name, program in zip(self.executables[os.name], self.executables['order']):
+            try:
+                process: psutil.Process = psutil.Process(self.process_data[program].pid)
+
+                with process.oneshot():
+                    if process.create_time() != self.create_times[program] or not self.is_executable(process.name(), name):
+                        self.log.debug(f"PID {process.pid} ({program}) has been recycled as {process.name()}")
+                        return False
+            except (psutil.Error, KeyError):
+                return False
+
+        return True
+
+    # whether a process name is one of the executables (or a specific one). case-insensitive and can have more around it, e.g. "Discord.exe" for "discord"
+    def is_executable(self, process_name: str, executable: Union[str, None] = None) -> bool:
+        executables: List[str] = [executable] if executable else self.executables[os.name]
+        return [name for name in executables if name.lower() in process_name.lower()] != []
 
     # get only the needed info (exe path and process start time) for each, and then apply it to self.p_data
     def get_all_extended_info(self):
-        tf2_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['TF2']['pid'], ('path', 'time'))
-        steam_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['Steam']['pid'], ('path', 'cwd'))
-        discord_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['Discord']['pid'], ())
+        tf2_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['TF2'].pid, ('path', 'time'))
+        steam_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['Steam'].pid, ('path', 'cwd'))
+        discord_data: Dict[str, Union[str, bool, int, None]] = self.get_info_from_pid(self.process_data['Discord'].pid, ())
 
-        # ugly
-        self.process_data['TF2']['running'], self.process_data['TF2']['path'], self.process_data['TF2']['time'] = tf2_data['running'], tf2_data['path'], tf2_data['time']
-        self.process_data['Steam']['running'], self.process_data['Steam']['path'] = steam_data['running'], steam_data['path']
-        self.process_data['Discord']['running'] = discord_data['running']
+        self.process_data['TF2'] = ProcessInfo(tf2_data['running'], self.process_data['TF2'].pid, tf2_data['path'], tf2_data['time'])
+        self.process_data['Steam'] = ProcessInfo(steam_data['running'], self.process_data['Steam'].pid, steam_data['path'])
+        self.process_data['Discord'] = ProcessInfo(discord_data['running'], self.process_data['Discord'].pid)
 
     # a mess of logic that gives process info from a PID
     def get_info_from_pid(self, pid: int, return_data: tuple) -> Dict[str, Union[str, bool, int, None]]:
@@ -119,20 +377,25 @@ class ProcessScanner:
         try:
             try:
                 process: psutil.Process = psutil.Process(pid=pid)
-                p_info['running'] = [name for name in self.executables[os.name] if name in process.name().lower()] != []
+                identity: ProcessIdentity = self.identify(process)
+                p_info['running'] = self.is_executable(process.name())
 
                 if not p_info['running']:
                     self.log.error(f"PID {pid} has been recycled as {process.name()}")
                     return p_info_nones
 
+                # these can't change while the process is running, so they're only looked up once per process
                 if 'path' in return_data:
-                    if os.name == 'posix':
-                        if 'cwd' in return_data:
-                            p_info['path'] = os.path.dirname(process.cwd()) + '/Steam'
-                        else:
-                            p_info['path'] = os.path.dirname(process.cmdline()[0])
+                    if os.name == 'posix' and 'cwd' in return_data:
+                        if identity.cwd is None:
+                            identity.cwd = process.cwd()
+
+                        p_info['path'] = os.path.dirname(identity.cwd) + '/Steam'
                     else:
-                        p_info['path'] = os.path.dirname(process.cmdline()[0])
+                        if identity.path is None:
+                            identity.path = os.path.dirname(process.cmdline()[0])
+
+                        p_info['path'] = identity.path
 
                     if not p_info['path']:
                         return p_info_nones
@@ -182,28 +445,80 @@ class ProcessScanner:
                 if ref_name in process[0]:
                     self.parsed_tasklist[ref_name.lower()] = int(process[1])
 
-        self.process_data['TF2']['running'] = 'hl2.exe' in self.parsed_tasklist
-        self.process_data['Steam']['running'] = 'steam.exe' in self.parsed_tasklist
-        self.process_data['Discord']['running'] = 'discord' in self.parsed_tasklist
+        self.process_data['TF2'] = self.process_data['TF2']._replace(running='hl2.exe' in self.parsed_tasklist)
+        self.process_data['Steam'] = self.process_data['Steam']._replace(running='steam.exe' in self.parsed_tasklist)
+        self.process_data['Discord'] = self.process_data['Discord']._replace(running='discord' in self.parsed_tasklist)
 
         # don't detect gmod (or any other program named hl2.exe)
-        if self.process_data['TF2']['running']:
+        if self.process_data['TF2'].running:
             if not self.hl2_exe_is_tf2(self.parsed_tasklist['hl2.exe']):
-                self.process_data['TF2'] = copy.deepcopy(self.p_data_default['TF2'])
+                self.process_data['TF2'] = NOT_RUNNING
                 del self.parsed_tasklist['hl2.exe']
 
-    # makes sure "Team Fortress 2" exists in a process's path
-    @functools.lru_cache(maxsize=None)
-    def hl2_exe_is_tf2(self, hl2_exe_pid: int) -> bool:
-        hl2_exe_path: str = self.get_info_from_pid(hl2_exe_pid, ('path',))['path']
+    # what's been looked up about a process, kept for the few most recently used ones. the create time is part of the key so that a reused PID is a different process
+    def identify(self, process: psutil.Process) -> 'ProcessIdentity':
+        key: Tuple[int, float] = (process.pid, process.create_time())
+        identity: Union[ProcessIdentity, None] = self.identities.get(key)
+
+        if identity is None:
+            identity = ProcessIdentity()
+            self.identities[key] = identity
 
-        if 'Team Fortress 2' in hl2_exe_path:
-            self.log.debug(f"Found TF2 hl2.exe at {hl2_exe_path}")
-            return True
+            if len(self.identities) > PROCESS_IDENTITY_CACHE_SIZE:
+                self.identities.popitem(last=False)
         else:
-            self.log.error(f"Found non-TF2 hl2.exe at {hl2_exe_path}")
+            self.identities.move_to_end(key)
+
+        return identity
+
+    # makes sure "Team Fortress 2" exists in a process's path (only checked once per process)
+    def hl2_exe_is_tf2(self, hl2_exe_pid: int) -> bool:
+        try:
+            identity: ProcessIdentity = self.identify(psutil.Process(pid=hl2_exe_pid))
+        except psutil.Error:
             return False
 
+        if identity.is_tf2 is None:
+            hl2_exe_path: Union[str, None] = self.get_info_from_pid(hl2_exe_pid, ('path',))['path']
+            identity.is_tf2 = hl2_exe_path is not None and 'Team Fortress 2' in hl2_exe_path
+
+            if identity.is_tf2:
+                self.log.debug(f"Found TF2 hl2.exe at {hl2_exe_path}")
+            else:
+                self.log.error(f"Found non-TF2 hl2.exe at {hl2_exe_path}")
+
+        return identity.is_tf2
+
+
+# the parts of a process's info that can't change while it's running (None until looked up)
+class ProcessIdentity:
+    __slots__ = ('path', 'cwd', 'is_tf2')
+
+    def __init__(self):
+        self.path: Union[str, None] = None  # the directory of the executable
+        self.cwd: Union[str, None] = None
+        self.is_tf2: Union[bool, None] = None  # for hl2.exe
+
+    def __repr__(self):
+        return f"processes.ProcessIdentity (path={self.path}, cwd={self.cwd}, is_tf2={self.is_tf2})"
+
+
+# a file descriptor that's readable once the process has exited, and that always refers to that same process even if its PID gets reused. raises OSError if not possible (not
+# Linux, or Linux before 5.3)
+def pidfd_open(pid: int) -> int:
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.ENOSYS, "pidfd_open is only on Linux")
+    elif hasattr(os, 'pidfd_open'):  # Python 3.9+
+        return os.pidfd_open(pid)
+
+    libc: ctypes.CDLL = ctypes.CDLL(None, use_errno=True)
+    pidfd: int = libc.syscall(SYS_PIDFD_OPEN, pid, 0)
+
+    if pidfd == -1:
+        raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+
+    return pidfd
+
 
 if __name__ == '__main__':
     import pprint
@@ -72,6 +72,10 @@ class GUI(tk.Frame):
         self.language = tk.StringVar()
         self.map_time = tk.BooleanVar()
         self.trim_console_log = tk.BooleanVar()
+        self.archive_console_log = tk.BooleanVar()
+        self.kill_stats = tk.BooleanVar()
+        self.watchlist = tk.StringVar()
+        self.console_source = tk.StringVar()
 
         try:
             # load settings from registry
@@ -91,6 +95,10 @@ class GUI(tk.Frame):
             self.language.set(self.settings_loaded['language'])
             self.map_time.set(self.settings_loaded['map_time'])
             self.trim_console_log.set(self.settings_loaded['trim_console_log'])
+            self.archive_console_log.set(self.settings_loaded['archive_console_log'])
+            self.kill_stats.set(self.settings_loaded['kill_stats'])
+            self.watchlist.set(self.settings_loaded['watchlist'])
+            self.console_source.set(self.settings_loaded['console_source'])
         except Exception:
             # probably a json decode error
             formatted_exception = traceback.format_exc()
@@ -162,8 +170,22 @@ class GUI(tk.Frame):
         self.language.set(actual_language)
         setting14 = ttk.Checkbutton(lf_main, variable=self.map_time, command=self.update_default_button_state, text="{}".format(
             self.loc.text("Show time on current map instead of selected class")))
+        setting17 = ttk.Checkbutton(lf_main, variable=self.kill_stats, command=self.update_default_button_state, text="{}".format(
+            self.loc.text("Count kills and deaths on the current map (shown on the class icon)")))
         setting15 = ttk.Checkbutton(lf_advanced, variable=self.trim_console_log, command=self.update_default_button_state, text="{}".format(
             self.loc.text("Limit console.log's size occasionally")))
+        setting16 = ttk.Checkbutton(lf_advanced, variable=self.archive_console_log, command=self.update_default_button_state, text="{}".format(
+            self.loc.text("Archive the parts of console.log removed by limiting its size")))
+        setting18_frame = ttk.Frame(lf_main)
+        setting18_text = ttk.Label(setting18_frame, text="{}".format(
+            self.loc.text("Players to point out when they're in your game (separated by commas): ")))
+        setting18_option = ttk.Entry(setting18_frame, textvariable=self.watchlist, width=30)
+        setting18_option.bind('<KeyRelease>', lambda event: self.update_default_button_state())
+        setting19_frame = ttk.Frame(lf_advanced)
+        setting19_text = ttk.Label(setting19_frame, text="{}".format(
+            self.loc.text("Console output source instead of console.log (a file, named pipe, - for stdin, or tcp://host:port): ")))
+        setting19_option = ttk.Entry(setting19_frame, textvariable=self.console_source, width=30)
+        setting19_option.bind('<KeyRelease>', lambda event: self.update_default_button_state())
 
         # download page button, but only if a new version is available
         db = utils.access_db()
@@ -206,7 +228,15 @@ class GUI(tk.Frame):
         setting13_options.pack(side='left', fill=None, expand=False)
         setting13_frame.grid(row=0, columnspan=2, sticky=tk.W, padx=(20, 40), pady=(9, 0))
         setting14.grid(row=2, sticky=tk.W, columnspan=2, padx=(20, 40), pady=(4, 0))
+        setting17.grid(row=3, sticky=tk.W, columnspan=2, padx=(20, 40), pady=(4, 0))
         setting15.grid(row=6, sticky=tk.W, columnspan=2, padx=(20, 40), pady=(4, 0))
+        setting16.grid(row=7, sticky=tk.W, columnspan=2, padx=(20, 40), pady=(4, 0))
+        setting18_text.pack(side='left', fill=None, expand=False)
+        setting18_option.pack(side='left', fill=None, expand=False)
+        setting18_frame.grid(row=4, columnspan=2, sticky=tk.W, padx=(20, 40), pady=(4, 0))
+        setting19_text.pack(side='left', fill=None, expand=False)
+        setting19_option.pack(side='left', fill=None, expand=False)
+        setting19_frame.grid(row=8, columnspan=2, sticky=tk.W, padx=(20, 40), pady=(4, 0))
 
         lf_main.grid(row=0, padx=30, pady=15)
         lf_advanced.grid(row=1, padx=30, pady=0, sticky=tk.W + tk.E)
@@ -266,7 +296,11 @@ class GUI(tk.Frame):
                 'class_pic_type': self.class_pic_types[self.class_pic_types_display.index(self.class_pic_type.get())],
                 'language': self.languages[self.languages_display.index(self.language.get())],
                 'map_time': self.map_time.get(),
-                'trim_console_log': self.trim_console_log.get()}
+                'trim_console_log': self.trim_console_log.get(),
+                'archive_console_log': self.archive_console_log.get(),
+                'kill_stats': self.kill_stats.get(),
+                'watchlist': self.watchlist.get(),
+                'console_source': self.console_source.get()}
 
     # set all settings to defaults
     def restore_defaults(self):
@@ -294,6 +328,10 @@ class GUI(tk.Frame):
             self.language.set(get_setting_default('language'))
             self.map_time.set(get_setting_default('map_time'))
             self.trim_console_log.set(get_setting_default('trim_console_log'))
+            self.archive_console_log.set(get_setting_default('archive_console_log'))
+            self.kill_stats.set(get_setting_default('kill_stats'))
+            self.watchlist.set(get_setting_default('watchlist'))
+            self.console_source.set(get_setting_default('console_source'))
 
             self.log.debug("Restored defaults")
 
@@ -409,7 +447,11 @@ def get_setting_default(setting: str = '', return_all: bool = False) -> Union[st
                 'class_pic_type': 'Icon',
                 'language': 'English',
                 'map_time': True,
-                'trim_console_log': True}
+                'trim_console_log': True,
+                'archive_console_log': False,
+                'kill_stats': False,
+                'watchlist': '',
+                'console_source': ''}
 
     if return_all:
         return defaults
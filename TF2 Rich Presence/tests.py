@@ -1,23 +1,41 @@
 # Copyright (C) 2019 Kataiser & https://github.com/Kataiser/tf2-rich-presence/contributors
 # https://github.com/Kataiser/tf2-rich-presence/blob/master/LICENSE
 
+import contextlib
+import copy
 import gc
+import gzip
 import io
+import json
 import os
+import select
 import shutil
+import socket
+import subprocess
+import sys
 import time
 import tkinter as tk
+import tracemalloc
 import unittest
 
+import psutil
 import requests
 from discoIPC import ipc
 
+import benchmark
 import configs
+import console_archive
+import console_history
+import console_log
+import console_players
 import custom_maps
+import file_watcher
 import init
 import localization
+import log_source
 import logger
 import main
+import proc_events
 import processes
 import settings
 import updater
@@ -32,6 +50,10 @@ class TestTF2RichPresense(unittest.TestCase):
             settings.access_registry(target_settings)
 
         self.dir = os.getcwd()
+        self.db_path = os.path.abspath(os.path.join('resources', 'DB.json') if os.path.isdir('resources') else 'DB.json')
+        with open(self.db_path, 'rb') as db_json:
+            self.old_db = db_json.read()  # so that tests (e.g. console.log checkpoints) don't leave anything behind for later tests, or in git
+
         self.log = logger.Log()
         self.log.enabled = False
         self.log.to_stderr = False
@@ -43,6 +65,8 @@ class TestTF2RichPresense(unittest.TestCase):
     def tearDown(self):
         os.chdir(self.dir)
         del self.log
+        with open(self.db_path, 'wb') as db_json:
+            db_json.write(self.old_db)
         settings.access_registry(save_dict=self.old_settings)
 
     def test_interpret_console_log(self):
@@ -57,6 +81,500 @@ class TestTF2RichPresense(unittest.TestCase):
         self.assertEqual(app.interpret_console_log('test_resources\\console_custom_map.log', ['not Kataiser'], float('inf'), True), ('cp_catwalk_a5c (hosting)', 'Soldier'))
         self.assertEqual(app.interpret_console_log('test_resources\\console_empty.log', ['not Kataiser'], float('inf'), True), ('In menus', 'Not queued'))
 
+    def test_interpret_console_log_incremental(self):
+        app = main.TF2RichPresense(self.log)
+        test_log_path = 'test_resources\\console_incremental.log'
+
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("Map: pl_badwater\nPyro selected \n")
+        os.utime(test_log_path, times=(1000, 1000))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('pl_badwater', 'Pyro'))
+        self.assertEqual(app.console_log_state.offset, os.stat(test_log_path).st_size)
+
+        # only the appended lines get read, and a partial line waits until it's finished
+        with open(test_log_path, 'a') as test_log:
+            test_log.write("Scout selected \nSoldier sel")
+        os.utime(test_log_path, times=(1001, 1001))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('pl_badwater', 'Scout'))
+        self.assertEqual(app.console_log_state.offset, os.stat(test_log_path).st_size - len("Soldier sel"))
+
+        with open(test_log_path, 'a') as test_log:
+            test_log.write("ected \n")
+        os.utime(test_log_path, times=(1002, 1002))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('pl_badwater', 'Soldier'))
+
+        # shrinking means a full rescan
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("[PartyClient] Entering queue for match group 12v12 Casual Match\n")
+        os.utime(test_log_path, times=(1003, 1003))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('In menus', 'Queued for Casual'))
+
+        # so does being rewritten with the same size less than a second later
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("[PartyClient] Entering queue for match group MvM MannUp\n1234567\n")
+        os.utime(test_log_path, ns=(1003500000000, 1003500000000))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('In menus', 'Queued for MvM (Mann Up)'))
+
+        os.remove(test_log_path)
+
+    def test_interpret_console_log_con_timestamp(self):
+        app = main.TF2RichPresense(self.log)
+        test_log_path = 'test_resources\\console_con_timestamp.log'
+        test_log = ("10/18/2019 - 12:00:00: [PartyClient] Entering queue for match group 12v12 Casual Match\n10/18/2019 - 12:00:40: Disconnect: #TF_Idle_kicked\n"
+                    "10/18/2019 - 12:01:00: Map: cp_dustbowl\n10/18/2019 - 12:01:30: Pyro selected \n10/18/2019 - 12:02:00: Pyro killed Scout with scattergun.\n")
+
+        with open(test_log_path, 'w') as test_log_file:
+            test_log_file.write(test_log)
+        os.utime(test_log_path, times=(1000, 1000))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf'), True), ('cp_dustbowl', 'Pyro'))
+        self.assertEqual(app.console_log_result.map_started, console_log.con_timestamp_time("10/18/2019 - 12:01:00"))
+        self.assertEqual(app.console_log_result.map_line_used, "Map: cp_dustbowl\n")
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], 0.2, True), ('cp_dustbowl', 'Pyro'))  # scanning backwards finds the map too
+        self.assertEqual(app.console_log_result.map_started, console_log.con_timestamp_time("10/18/2019 - 12:01:00"))
+
+        with open(test_log_path, 'a') as test_log_file:
+            test_log_file.write("10/18/2019 - 12:30:00: [PartyClient] Entering queue for match group 12v12 Casual Match\n")
+        os.utime(test_log_path, times=(1001, 1001))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('In menus', 'Queued for Casual'))
+        self.assertEqual((app.console_log_result.map_started, app.console_log_result.queue_started), (None, console_log.con_timestamp_time("10/18/2019 - 12:30:00")))
+
+        # turning con_timestamp off means times aren't known anymore
+        with open(test_log_path, 'a') as test_log_file:
+            test_log_file.write("Map: pl_badwater\n")
+        os.utime(test_log_path, times=(1002, 1002))
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('pl_badwater', 'unselected'))
+        self.assertIsNone(app.console_log_result.map_started)
+
+        # the time a line was logged comes before its events, and without the timestamp in the line
+        events = list(console_log.console_events(test_log.splitlines(keepends=True) * 2, ['not Kataiser'], True, ()))
+        self.assertEqual([event.time - events[0].time for event in events if type(event) is console_log.TimeLogged], [0, 40, 60, 90, 120, 0, 40, 60, 90, 120])
+        self.assertEqual([event for event in events if type(event) is not console_log.TimeLogged][:3],
+                         [console_log.QueueEntered("[PartyClient] Entering queue for match group 12v12 Casual Match\n", '12v12 Casual Match'),
+                          console_log.MenusEntered("Disconnect: #TF_Idle_kicked\n"), console_log.MapLoaded("Map: cp_dustbowl\n", 'cp_dustbowl')])
+
+        if console_log.numpy:
+            test_log_bytes = test_log.encode('utf-8')
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log_bytes, 0, len(test_log_bytes), (), 64),
+                             console_log.find_marker_lines(test_log_bytes, 0, len(test_log_bytes), ()))
+
+        os.remove(test_log_path)
+
+    def test_console_log_checkpoint(self):
+        test_log_path = 'test_resources\\console_checkpoint.log'
+
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("SV_ActivateServer: setting tickrate to 66.7\nMap: cp_dustbowl\nMedic selected \n")
+        os.utime(test_log_path, times=(1000, 1000))
+        app = main.TF2RichPresense(self.log)
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('cp_dustbowl (hosting)', 'Medic'))
+        with open(self.db_path, 'r', encoding='UTF8') as db_json:
+            json.load(db_json, parse_constant=lambda constant: self.fail(f"DB.json has {constant} in it, which isn't valid JSON"))
+
+        # simulate a restart, which should only need to read the new line
+        with open(test_log_path, 'a') as test_log:
+            test_log.write("Spy selected \n")
+        os.utime(test_log_path, times=(1001, 1001))
+        app_restarted = main.TF2RichPresense(self.log)
+        self.assertEqual(app_restarted.console_log_state.offset, app.console_log_state.offset)
+        self.assertEqual(app_restarted.console_log_state.kb_limit, float('inf'))
+        self.assertEqual(app_restarted.old_console_log_interpretation, ('cp_dustbowl (hosting)', 'Medic'))
+        self.assertEqual(app_restarted.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('cp_dustbowl (hosting)', 'Spy'))
+
+        # a file with the same size but different contents isn't resumed from
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("SV_ActivateServer: setting tickrate to 66.7\nMap: cp_badlands\nMedic selected \nSpy selected \n")
+        os.utime(test_log_path, times=(1002, 1002))
+        app_restarted = main.TF2RichPresense(self.log)
+        self.assertEqual(app_restarted.interpret_console_log(test_log_path, ['not Kataiser'], float('inf')), ('cp_badlands (hosting)', 'Spy'))
+
+        console_log.save_checkpoint(None, ('', ''), None)
+        os.remove(test_log_path)
+
+    def test_console_log_trim(self):
+        test_log_path = 'test_resources\\console_trim.log'
+        test_log = b''.join(f"Line {line_num}\n".encode() for line_num in range(200000))
+
+        for chunk_size, allow_collapse in ((4096, False), (1048576, False), (1048576, True)):
+            with open(test_log_path, 'wb') as test_log_file:
+                test_log_file.write(test_log)
+
+            console_archive.trim(self.log, test_log_path, 100000, chunk_size, allow_collapse)
+
+            with open(test_log_path, 'rb') as test_log_file:
+                test_log_trimmed = test_log_file.read()
+
+            # collapsing (if it's supported) can only remove whole filesystem blocks, so a bit more than asked for might be kept
+            self.assertGreaterEqual(len(test_log_trimmed), 100000)
+            self.assertLess(len(test_log_trimmed), 100000 + 65536)
+            self.assertEqual(test_log_trimmed, test_log[-len(test_log_trimmed):])
+
+        os.remove(test_log_path)
+
+    def test_console_log_archive(self):
+        test_log_path = 'test_resources\\console_archive.log'
+        test_archive_dir = 'test_resources\\console_archive'
+        test_log = b''.join(f"Line {line_num}\n".encode() if line_num % 50000 else f"10/18/2019 - 12:00:0{line_num // 50000}: Changelevel\nMap: map_{line_num}\n".encode()
+                            for line_num in range(200000))
+
+        with open(test_log_path, 'wb') as test_log_file:
+            test_log_file.write(test_log)
+
+        # twice, to check that the second trim continues the archive
+        console_archive.trim(self.log, test_log_path, 1000000, 4096, True, test_archive_dir)
+        console_archive.trim(self.log, test_log_path, 100000, 4096, True, test_archive_dir)
+
+        with open(test_log_path, 'rb') as test_log_file:
+            test_log_trimmed = test_log_file.read()
+
+        archive_index = console_archive.load_archive_index(test_archive_dir)
+        archived = b''
+        for chunk_index in archive_index:
+            with gzip.open(os.path.join(test_archive_dir, f'console_{chunk_index["chunk"]:06}.log.gz'), 'rb') as chunk_file:
+                chunk = chunk_file.read()
+
+            self.assertEqual(len(chunk), chunk_index['bytes'][1] - chunk_index['bytes'][0])
+            self.assertEqual(len(archived), chunk_index['bytes'][0])
+            archived += chunk
+
+        # nothing lost or duplicated
+        self.assertEqual(archived + test_log_trimmed, test_log)
+        self.assertEqual([chunk_index['chunk'] for chunk_index in archive_index], [0, 1])
+        self.assertEqual(archive_index[0]['maps'], ['map_0', 'map_50000', 'map_100000'])
+        self.assertEqual(archive_index[1]['maps'], ['map_150000'])
+        self.assertEqual(archive_index[0]['time'][1] - archive_index[0]['time'][0], 2)
+        self.assertEqual(archive_index[1]['time'][0], archive_index[1]['time'][1])
+        shutil.rmtree(test_archive_dir)
+
+        # with con_timestamp on, every line starts with a timestamp, "Map:" lines included
+        test_log = b'10/18/2019 - 12:00:00: Changelevel\n10/18/2019 - 12:00:00: Map: cp_badlands\n10/18/2019 - 12:00:00: Line\n' \
+                   b'10/18/2019 - 12:00:09: Changelevel\n10/18/2019 - 12:00:09: Map: pl_upward\n10/18/2019 - 12:00:10: Line\n'
+
+        with open(test_log_path, 'wb+') as test_log_file:
+            test_log_file.write(test_log)
+            console_archive.archive(self.log, test_log_file, len(test_log), test_archive_dir)
+
+        archive_index = console_archive.load_archive_index(test_archive_dir)
+        self.assertEqual(len(archive_index), 1)
+        self.assertEqual(archive_index[0]['maps'], ['cp_badlands', 'pl_upward'])
+        self.assertEqual(archive_index[0]['time'][1] - archive_index[0]['time'][0], 10)
+
+        os.remove(test_log_path)
+        shutil.rmtree(test_archive_dir)
+
+    def test_console_log_synthetic(self):
+        test_log_path = 'test_resources\\console_synthetic.log'
+        truth_path = benchmark.write_synthetic_log(test_log_path, 1048576)
+
+        self.assertGreaterEqual(os.stat(test_log_path).st_size, 1048576)
+        self.assertEqual(benchmark.verify_synthetic_log(test_log_path, 200), 0)
+
+        os.remove(test_log_path)
+        os.remove(truth_path)
+
+    def test_console_history(self):
+        test_log_path = 'test_resources\\console_history.log'
+        test_archive_dir = 'test_resources\\console_history_archive'
+        test_log = ("10/18/2019 - 12:00:00: [PartyClient] Entering queue for match group 12v12 Casual Match\n10/18/2019 - 12:01:00: Map: cp_dustbowl\n"
+                    "10/18/2019 - 12:01:30: Pyro selected \n10/18/2019 - 12:11:30: Medic selected \n10/18/2019 - 12:21:30: Kataiser killed Scout with scattergun.\n"
+                    "10/18/2019 - 12:31:30: Disconnect: #TF_Idle_kicked\n10/18/2019 - 13:31:30: Map: pl_badwater\n10/18/2019 - 13:41:30: Scout selected \n").encode()
+
+        with open(test_log_path, 'wb') as test_log_file:
+            test_log_file.write(test_log)
+        with open(test_log_path, 'rb') as test_log_file:
+            console_archive.archive(self.log, test_log_file, len(test_log), test_archive_dir, 64, 100)
+
+        history = console_history.analyze([test_log_path], ['Kataiser'], 1)
+        self.assertEqual(history.maps_played, {'cp_dustbowl': 1, 'pl_badwater': 1})
+        self.assertEqual(history.map_time, {'cp_dustbowl': 1830, 'pl_badwater': 600})  # the hour without anything written isn't counted
+        self.assertEqual(history.class_time, {'Pyro': 600, 'Medic': 1200})
+        self.assertEqual(history.queue_time, {'Casual': 60})
+        self.assertEqual([(visit['map'], visit['seconds']) for visit in history.visits], [('cp_dustbowl', 1830), ('pl_badwater', 600)])
+
+        # splitting into many parts (with lines split between them) for multiple processes, or reading archived chunks, doesn't change anything
+        history_split = console_history.analyze([test_log_path], ['Kataiser'], 2, 50)
+        history_archived = console_history.analyze([test_archive_dir], ['Kataiser'], 2)
+        self.assertGreater(len(os.listdir(test_archive_dir)), 4)
+        self.assertEqual(history_split.to_dict(), history.to_dict())
+        self.assertEqual(history_archived.to_dict()['map_time'], history.to_dict()['map_time'])
+        self.assertEqual(history_archived.to_dict()['class_time'], history.to_dict()['class_time'])
+
+        os.remove(test_log_path)
+        shutil.rmtree(test_archive_dir)
+
+    def test_console_log_scan_backwards(self):
+        noise = b"Kataiser killed Scout with scattergun.\nsomeone :  hello\n" * 10000
+        log_start = b"Map: cp_dustbowl\n" + noise + b"SV_ActivateServer: setting tickrate to 66.7\n"
+        log_end = b"Map: pl_badwater\n" + noise[:1000] + b"Pyro selected \n"
+        test_log = io.BytesIO(log_start + log_end + b"Unfinished line")
+        log_size = len(test_log.getvalue())
+
+        # the server being started before the last map change is needed for "(hosting)"
+        self.assertEqual(console_log.scan_backwards(test_log, 0, log_size, ['Kataiser'], True, ()), len(log_start) - 44)
+        self.assertEqual(console_log.scan_backwards(test_log, 0, log_size, ['Kataiser'], True, (), 64), len(log_start) - 44)
+        self.assertEqual(console_log.scan_backwards(test_log, len(log_start) - 10, log_size, ['Kataiser'], True, ()), len(log_start) - 10)
+        self.assertEqual(console_log.scan_backwards(test_log, 0, len(log_start), ['Kataiser'], True, ()), 0)
+
+    def test_console_log_classify_line(self):
+        self.assertEqual(console_log.classify_line("Pyro selected \n", ['Kataiser'], ('Kataiser',)), ('selected', False, ()))
+        self.assertEqual(console_log.classify_line("Map: cp_dustbowl\n", ['Kataiser'], ('Kataiser',)), ('map', False, ()))
+        self.assertEqual(console_log.classify_line("Loading Map: cp_dustbowl\n", ['Kataiser'], ('Kataiser',)), ('', False, ()))
+        self.assertEqual(console_log.classify_line("Kataiser: Disconnect by user.\n", ['Kataiser'], ('Kataiser',)), ('disconnect', False, ('Kataiser',)))
+        self.assertEqual(console_log.classify_line("Kataiser: Disconnect by user.\n", ['not Kataiser'], ()), ('', False, ()))
+        self.assertEqual(console_log.classify_line("[PartyClient] Lobby destroyed\n", ['Kataiser'], ('Kataiser',)), ('leave queue', True, ()))
+        self.assertEqual(console_log.classify_line("someone :  hello\n", ['Kataiser'], ('Kataiser',)), ('', False, ()))
+
+    def test_console_log_find_marker_lines(self):
+        test_log = b"someone :  hello\r\nMap: cp_dustbowl\r\nKataiser killed Scout with scattergun.\nPyro selected \n[PartyClient] Lobby destroyed\nUnfinished Map:"
+
+        self.assertEqual(console_log.find_marker_lines(test_log, 0, len(test_log) - 15, ()), ['Map: cp_dustbowl\n', 'Pyro selected \n', '[PartyClient] Lobby destroyed\n'])
+        self.assertEqual(console_log.find_marker_lines(test_log, 0, len(test_log) - 15, ('Kataiser',)),
+                         ['Map: cp_dustbowl\n', 'Kataiser killed Scout with scattergun.\n', 'Pyro selected \n', '[PartyClient] Lobby destroyed\n'])
+        self.assertEqual(console_log.find_marker_lines(test_log, 36, 75, ('Kataiser',)), ['Kataiser killed Scout with scattergun.\n'])
+
+    def test_console_log_events(self):
+        test_lines = ["SV_ActivateServer: setting tickrate to 66.7\n", "Map: cp_dustbowl\n", "Bob selected \n", "Medic selected \n", "Kataiser killed Scout with scattergun.\n",
+                      "[PartyClient] Entering queue for match group 12v12 Casual Match\n", "Host_Error: oops\n"]
+        events = list(console_log.console_events(test_lines, ['not Kataiser'], True, ('Kataiser',)))
+
+        self.assertEqual(events, [console_log.ServerActivated(test_lines[0]), console_log.MapLoaded(test_lines[1], 'cp_dustbowl'), console_log.ClassSelected(test_lines[3], 'Medic'),
+                                  console_log.PlayersSeen(test_lines[4], ('Kataiser',)), console_log.QueueEntered(test_lines[5], '12v12 Casual Match'), console_log.MenusEntered(test_lines[6])])
+
+        state = console_log.reduce_events(console_log.ConsoleLogState(), events[:4], False)
+        self.assertEqual((state.current_map, state.current_class, state.hosting, state.in_menus, state.players_seen), ('cp_dustbowl', 'Medic', True, False, {'Kataiser': 'cp_dustbowl'}))
+        state = console_log.reduce_events(state, events[4:], False)
+        self.assertEqual((state.current_map, state.current_class, state.hosting, state.queue, state.class_line_used), ('In menus', 'Queued for Casual', False, 'Casual', test_lines[5]))
+        self.assertEqual(console_log.reduce_events(console_log.ConsoleLogState(), events, True).current_class, 'Queued')
+
+    def test_console_log_kill_stats(self):
+        test_lines = ["Map: cp_dustbowl\n", "Bob killed Scout with scattergun.\n", "Bob killed Soldier with scattergun. (crit)\n", "Pyro killed Bob with flamethrower.\n",
+                      "Bobby killed Scout with scattergun.\n", "someone :  Bob killed Scout with scattergun.\n", "Bob killed Heavy with tf_projectile_rocket.\n", "Map: pl_upward\n",
+                      "Bob killed Engineer with shotgun_soldier.\n"]
+        events = list(console_log.console_events(test_lines, ['Bob'], True, (), True))
+
+        self.assertEqual(events, [console_log.MapLoaded(test_lines[0], 'cp_dustbowl'), console_log.KillScored(test_lines[1], 'scattergun'), console_log.KillScored(test_lines[2], 'scattergun'),
+                                  console_log.Died(test_lines[3], 'flamethrower'), console_log.KillScored(test_lines[6], 'tf_projectile_rocket'), console_log.MapLoaded(test_lines[7], 'pl_upward'),
+                                  console_log.KillScored(test_lines[8], 'shotgun_soldier')])
+        self.assertEqual([event for event in console_log.console_events(test_lines, ['Bob'], True, ()) if isinstance(event, (console_log.KillScored, console_log.Died))], [])
+
+        state = console_log.reduce_events(console_log.ConsoleLogState(), events[:5], False)
+        self.assertEqual((state.kills, state.deaths, state.weapons), (3, 1, {'scattergun': 2, 'tf_projectile_rocket': 1}))
+        state = console_log.reduce_events(state, events[5:], False)
+        self.assertEqual((state.current_map, state.kills, state.deaths, state.weapons), ('pl_upward', 1, 0, {'shotgun_soldier': 1}))
+
+        test_log = "".join(test_lines).encode('utf-8')
+        self.assertEqual(console_log.find_marker_lines(test_log, 0, len(test_log), ()), [test_lines[0], test_lines[7]])
+        self.assertEqual(console_log.find_marker_lines(test_log, 0, len(test_log), (), (b'Bob',)), test_lines)
+
+        if console_log.numpy:
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log * 50, 0, len(test_log) * 50, (), 64, (b'Bob',)), test_lines * 50)
+
+    def test_console_log_watchlist(self):
+        self.assertEqual(console_players.watched_players(" Alice, Bob ,,Carol", ['Bob'], True), ('Alice', 'Carol', 'Kataiser'))
+        self.assertEqual(console_players.watched_players("", ['Bob'], False), ())
+        self.assertEqual(console_players.watched_players("Kataiser", ['Kataiser'], True), ())
+
+        # lots of names that aren't there don't change what's found
+        watchlist = tuple(sorted({f'player{num}' for num in range(0, 1000, 3)} | {'Alice', 'Bob'}))
+        test_lines = ["Map: cp_dustbowl\n", "Alice killed Scout with scattergun.\n", "someone :  hello\n", "Scout killed player1 with scattergun.\n", "Bob :  hi\n",
+                      "player12 killed Bob with minigun.\n", "Medic selected \n"]
+        test_log = "".join(test_lines).encode('utf-8') * 20
+        expected_lines = [test_lines[0], test_lines[1], test_lines[4], test_lines[5], test_lines[6]] * 20
+        self.assertEqual(console_log.find_marker_lines(test_log, 0, len(test_log), watchlist), expected_lines)
+        if console_log.numpy:
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log, 0, len(test_log), watchlist, 64), expected_lines)
+
+        events = list(console_log.console_events(test_lines, ['not Kataiser'], True, watchlist))
+        self.assertEqual(events[1:4], [console_log.PlayersSeen(test_lines[1], ('Alice',)), console_log.PlayersSeen(test_lines[4], ('Bob',)),
+                                       console_log.PlayersSeen(test_lines[5], ('Bob', 'player12'))])
+        state = console_log.reduce_events(console_log.ConsoleLogState(), events, False)
+        self.assertEqual(state.players_seen, {'Alice': 'cp_dustbowl', 'Bob': 'cp_dustbowl', 'player12': 'cp_dustbowl'})
+        self.assertEqual(console_log.reduce_events(state, [console_log.MapLoaded("Map: pl_upward\n", 'pl_upward')], False).players_seen, {})
+
+        # each player is only pointed out once per map, and only a few are named at once
+        app = main.TF2RichPresense(self.log)
+        state = console_log.ConsoleLogState()
+        state.current_map = 'cp_dustbowl'
+        state.players_seen = {'Alice': 'cp_dustbowl', 'Bob': 'cp_dustbowl', 'Carol': 'cp_dustbowl', 'Dave': 'cp_dustbowl', 'Eve': 'pl_upward', 'Kataiser': 'cp_dustbowl'}
+
+        with contextlib.redirect_stdout(io.StringIO()) as notifications:
+            console_players.notify_watched_players(app, state.players_seen, state.current_map)
+            console_players.notify_watched_players(app, state.players_seen, state.current_map)
+            state.players_seen['Eve'] = 'cp_dustbowl'
+            console_players.notify_watched_players(app, state.players_seen, state.current_map)
+
+        self.assertTrue(app.has_seen_kataiser)
+        self.assertEqual([line for line in notifications.getvalue().splitlines() if 'in your game' in line and 'Kataiser' not in line],
+                         ['\x1b[96mAlice, Bob, Carol, +1 are in your game!\x1b[0m', '\x1b[96mEve is in your game!\x1b[0m'])
+
+    def test_console_log_long_lines(self):
+        test_log_path = 'test_resources\\console_long_lines.log'
+        long_line = b"bind spam " + b"x" * 8388608 + b" Host_Error Map: cp_fake Kataiser\n"
+
+        with open(test_log_path, 'wb') as test_log:
+            test_log.write(b"Map: cp_dustbowl\nPyro selected \n" + long_line + b"Medic selected \n" + b"[PartyClient] Leaving queue" + b"x" * 5000 + b"\n")
+        os.utime(test_log_path, times=(1000, 1000))
+
+        # only the start of a long line is read, and that's limited to both memory and what it means
+        app = main.TF2RichPresense(self.log)
+        tracemalloc.start()
+        self.assertEqual(app.interpret_console_log(test_log_path, ['not Kataiser'], float('inf'), True), ('cp_dustbowl', 'Not queued'))
+        allocated_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(allocated_peak, 4 * console_log.CONSOLE_SCAN_BUFFER_BYTES)
+        self.assertFalse(app.console_log_result.players_seen)
+
+        with open(test_log_path, 'rb') as test_log:
+            test_log_bytes = test_log.read()
+            test_log.seek(0)
+            self.assertEqual(console_log.scan_backwards(test_log, 0, len(test_log_bytes), ['not Kataiser'], True, ('Kataiser',), 64), 0)
+
+        lines = console_log.find_marker_lines(test_log_bytes, 0, len(test_log_bytes), ('Kataiser',))
+        self.assertEqual([len(line) for line in lines], [17, 15, console_log.CONSOLE_LINE_MAX_BYTES + 1, 16, console_log.CONSOLE_LINE_MAX_BYTES + 1])
+        self.assertEqual(lines[2], long_line[:console_log.CONSOLE_LINE_MAX_BYTES].decode('utf-8') + "\n")
+        if console_log.numpy:
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log_bytes, 0, len(test_log_bytes), ('Kataiser',), 65536), [lines[0], lines[1], lines[3], lines[4]])
+
+        os.remove(test_log_path)
+
+    def test_console_log_numpy_engine(self):
+        if not console_log.numpy:
+            self.skipTest("NumPy isn't installed")
+
+        test_log = b"someone :  hello\r\nMap: cp_dustbowl\r\nKataiser killed Scout with scattergun.\nPyro selected \n[PartyClient] Lobby destroyed\n" * 100
+
+        for chunk_size in (16, 1000, 16777216):
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log, 0, len(test_log), ('Kataiser',), chunk_size), console_log.find_marker_lines(test_log, 0, len(test_log), ('Kataiser',)))
+            self.assertEqual(console_log.find_marker_lines_numpy(test_log, 36, len(test_log), (), chunk_size), console_log.find_marker_lines(test_log, 36, len(test_log), ()))
+
+    def test_file_watcher(self):
+        watcher = file_watcher.FileWatcher(self.log)
+        test_file_path = os.path.abspath('test_resources\\watched.log')
+        open(test_file_path, 'w').close()
+        watcher.watch(test_file_path)
+
+        if not watcher.watching:
+            watcher.close()
+            os.remove(test_file_path)
+            self.skipTest("inotify isn't available")
+
+        self.assertFalse(watcher.wait(0.1))
+
+        with open(test_file_path, 'a') as test_file:
+            test_file.write("Map: cp_dustbowl\n")
+
+        self.assertTrue(watcher.wait(5))
+        self.assertFalse(watcher.wait(0.1))
+
+        # other files in the same directory don't count
+        with open('test_resources\\not_watched.log', 'w') as test_file:
+            test_file.write("Map: cp_dustbowl\n")
+
+        self.assertFalse(watcher.wait(0.1))
+
+        # something else being readable (e.g. a program exiting) ends the wait too, without counting as a change
+        wake_read, wake_write = os.pipe()
+        os.write(wake_write, b'\0')
+        wait_start = time.perf_counter()
+        self.assertFalse(watcher.wait(5, [wake_read]))
+        self.assertLess(time.perf_counter() - wait_start, 1)
+        os.close(wake_read)
+        os.close(wake_write)
+
+        watcher.close()
+        self.assertFalse(watcher.watching)
+        os.remove(test_file_path)
+        os.remove('test_resources\\not_watched.log')
+
+    def test_log_source_ring_buffer(self):
+        def reader(data: bytes):
+            stream = io.BytesIO(data)
+            return lambda view: stream.readinto(view)
+
+        ring = log_source.RingBuffer(16)
+        self.assertEqual(ring.fill(reader(b"Map: a\nPyro sel")), 15)
+        self.assertEqual(ring.take_lines(), b"Map: a\n")
+        self.assertEqual(ring.take_lines(), b"")
+
+        # wrapping around the end of the buffer
+        self.assertEqual(ring.fill(reader(b"ected \nSpy")), 8)
+        self.assertTrue(ring.full)
+        self.assertEqual(ring.take_lines(), b"Pyro selected \n")
+        self.assertEqual((ring.start, ring.length), (6, 1))
+        ring.fill(reader(b"py selected \n"))
+        self.assertEqual(ring.take_lines(), b"Spy selected \n")
+        self.assertEqual(ring.length, 0)
+
+        # a line that doesn't fit is dropped, and the next one isn't
+        ring.fill(reader(b"x" * 16))
+        self.assertEqual(ring.take_lines(), b"")
+        ring.drop_line()
+        ring.fill(reader(b"x" * 40 + b"\nMap: b\n"))
+        self.assertEqual(ring.take_lines(), b"Map: b\n")
+        self.assertEqual(ring.dropped, 57)
+
+    def test_log_source(self):
+        app = main.TF2RichPresense(self.log)
+        sending, receiving = socket.socketpair()
+        source = log_source.SocketSource(self.log, receiving, 'test socket', 64)
+
+        self.assertEqual(source.poll(), b"")
+        self.assertFalse(source.wait(0.01))
+        sending.sendall(b"Map: cp_dustbowl\nSV_ActivateServer: setting tickrate to 66.7\nPyro sel")
+        self.assertTrue(source.wait(5))
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('cp_dustbowl', 'unselected'))
+        sending.sendall(b"ected \n" + b"bind spam " * 20 + b"\nMap: pl_badwater\n")
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('pl_badwater (hosting)', 'unselected'))  # the spam line is too long to be read
+        self.assertEqual(app.console_log_result.class_line_used, "Map: pl_badwater\n")
+        sending.close()
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('pl_badwater (hosting)', 'unselected'))
+        self.assertTrue(source.ended)
+        source.close()
+
+        # following a file gives the same as interpreting it
+        test_log_path = 'test_resources\\console_source.log'
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("SV_ActivateServer: setting tickrate to 66.7\nMap: cp_dustbowl\nMedic selected \nDisconnect: #TF_Idle_kicked\nnot Kataiser :  gg\n" * 10)
+        os.utime(test_log_path, times=(1000, 1000))
+
+        source = log_source.open_source(self.log, test_log_path, 64)
+        self.assertIsInstance(source, log_source.FileSource)
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('In menus', 'Not queued'))
+        self.assertEqual(console_log.interpret(app, test_log_path, ['not Kataiser'], float('inf'), True), ('In menus', 'Not queued'))
+
+        with open(test_log_path, 'a') as test_log:
+            test_log.write("Map: cp_dustbowl\nMedic selected \n")
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('cp_dustbowl', 'Medic'))
+
+        # trimmed, so the state starts over along with the file instead of keeping the Medic from before
+        with open(test_log_path, 'w') as test_log:
+            test_log.write("Map: pl_upward\n")
+        self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('pl_upward', 'unselected'))
+        self.assertEqual(app.console_log_result.offset, os.stat(test_log_path).st_size)
+        self.assertFalse(source.restarted)
+        source.close()
+        os.remove(test_log_path)
+
+        if hasattr(os, 'set_blocking') and hasattr(os, 'mkfifo'):
+            pipe_path = 'test_resources\\console.fifo'
+            os.mkfifo(pipe_path)
+            source = log_source.open_source(self.log, pipe_path, 64)
+            self.assertIsInstance(source, log_source.PipeSource)
+
+            with open(pipe_path, 'wb') as pipe:
+                pipe.write(b"[PartyClient] Entering queue for match group 12v12 Casual Match\n")
+            self.assertEqual(console_log.interpret_source(app, source, ['not Kataiser']), ('In menus', 'Queued for Casual'))
+            self.assertFalse(source.ended)  # the writer closing it doesn't end it
+
+            source.close()
+            os.remove(pipe_path)
+
+        with self.assertRaises(TypeError):
+            log_source.LogSource(self.log, 'abstract')  # no read_into()
+
+        self.assertEqual(log_source.parse_tcp_address('tcp://[::1]:27000'), ('::1', 27000))
+        with self.assertRaises(ValueError):
+            log_source.parse_tcp_address('tcp://localhost')
+
     def test_steam_config_file(self):
         self.assertEqual(configs.steam_config_file(self.log, 'test_resources\\'), ['Kataiser'])
 
@@ -210,7 +728,7 @@ class TestTF2RichPresense(unittest.TestCase):
     def test_discoipc(self):
         # this test fails if Discord isn't running
         test_process_scanner = processes.ProcessScanner(self.log)
-        if not test_process_scanner.scan()['Discord']['running']:
+        if not test_process_scanner.scan()['Discord'].running:
             self.skipTest("Discord needs to be running")
 
         activity = {'details': 'In menus',
@@ -262,6 +780,221 @@ class TestTF2RichPresense(unittest.TestCase):
 
         self.assertFalse(process_scanner.hl2_exe_is_tf2(os.getpid()))
 
+        # the path and classification are kept for this process, but only for so many processes
+        identity = process_scanner.identities[(os.getpid(), psutil.Process().create_time())]
+        self.assertEqual((identity.path, identity.is_tf2), (os.path.dirname(psutil.Process().cmdline()[0]), False))
+        self.assertEqual(process_scanner.get_info_from_pid(os.getpid(), ('path', 'time')), p_info)
+        for pid in psutil.pids():
+            process_scanner.get_info_from_pid(pid, ())
+        self.assertLessEqual(len(process_scanner.identities), processes.PROCESS_IDENTITY_CACHE_SIZE)
+
+    def test_process_scanning_cached(self):
+        if os.name != 'posix':
+            self.skipTest("Windows caching is covered by test_process_scanning")
+
+        # stand-ins for TF2, Steam, and Discord: Python, with a process name that comes from the name of a link to it
+        process_names = ['tf2rp_hl2', 'tf2rp_steam', 'tf2rp_discord']
+        fake_processes = []
+        for process_name in process_names:
+            os.symlink(sys.executable, os.path.abspath(os.path.join('test_resources', process_name)))
+            fake_processes.append(subprocess.Popen([os.path.abspath(os.path.join('test_resources', process_name)), '-c', 'import time; time.sleep(60)']))
+
+        try:
+            process_scanner = processes.ProcessScanner(self.log)
+            process_scanner.executables['posix'] = process_names
+            process_events = []
+            process_scanner.subscribe(process_events.append)
+            time.sleep(0.5)  # for the links to have been executed
+
+            p_data = process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            self.assertTrue(process_scanner.all_pids_cached)
+            self.assertEqual(process_events, [processes.ProcessStarted(program, p_data[program], processes.NOT_RUNNING) for program in ('TF2', 'Steam', 'Discord')])
+            self.assertEqual(process_scanner.events, process_events)
+            self.assertEqual([p_data[program].pid for program in ('TF2', 'Steam', 'Discord')], [fake_process.pid for fake_process in fake_processes])
+            self.assertEqual(p_data['TF2'].path, os.path.abspath('test_resources'))
+            self.assertTrue(process_scanner.cached_pids_alive())  # so the create times from the sweep match psutil's
+            p_data_before = p_data  # results are never changed by later scans
+            with self.assertRaises(AttributeError):
+                p_data['TF2'].pid = 1
+
+            self.assertEqual(process_scanner.scan(), p_data_before)
+            self.assertFalse(process_scanner.used_tasklist)
+            self.assertEqual(process_scanner.events, [])
+
+            # with pidfds, the processes aren't even looked at
+            if process_scanner.pidfds:
+                self.assertEqual(len(process_scanner.pidfds), 3)
+                process_scanner.create_times['Steam'] -= 1
+                self.assertEqual(process_scanner.scan(), p_data_before)
+                self.assertFalse(process_scanner.used_tasklist)
+                process_scanner.create_times['Steam'] += 1
+                process_scanner.close_pidfds()
+
+            # without them, a PID that's been recycled counts as its process having exited
+            process_scanner.create_times['Steam'] -= 1
+            self.assertEqual(process_scanner.scan(), p_data_before)
+            self.assertTrue(process_scanner.used_tasklist)
+
+            fake_processes[2].kill()
+            fake_processes[2].wait()
+            p_data = process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            self.assertFalse(process_scanner.all_pids_cached)
+            self.assertEqual(process_scanner.pidfds, {})
+            self.assertEqual((p_data['Discord'].running, p_data['Discord'].pid, p_data['TF2']), (False, None, p_data_before['TF2']))
+            self.assertEqual(process_scanner.events, [processes.ProcessExited('Discord', processes.NOT_RUNNING, p_data_before['Discord'])])
+            self.assertEqual(len(process_events), 4)
+        finally:
+            for fake_process in fake_processes:
+                fake_process.kill()
+                fake_process.wait()
+            for process_name in process_names:
+                os.remove(os.path.join('test_resources', process_name))
+
+    def test_process_scanning_default_names(self):
+        if os.name != 'posix':
+            self.skipTest("Windows caching is covered by test_process_scanning")
+
+        process_scanner = processes.ProcessScanner(self.log)
+        if [process for process in psutil.process_iter(attrs=['name']) if process_scanner.is_executable(process.info['name'])]:
+            self.skipTest("TF2, Steam, or Discord is actually running")
+
+        # like test_process_scanning_cached, but with the real names, including Discord's capital D
+        fake_processes_dir = os.path.abspath(os.path.join('test_resources', 'default_names'))
+        os.mkdir(fake_processes_dir)
+        fake_processes = []
+        for process_name in process_scanner.executables['posix']:
+            os.symlink(sys.executable, os.path.join(fake_processes_dir, process_name))
+            fake_processes.append(subprocess.Popen([os.path.join(fake_processes_dir, process_name), '-c', 'import time; time.sleep(60)']))
+
+        try:
+            time.sleep(0.5)
+            p_data = process_scanner.scan()
+            self.assertEqual([p_data[program].running for program in ('TF2', 'Steam', 'Discord')], [True, True, True])
+            self.assertEqual([p_data[program].pid for program in ('TF2', 'Steam', 'Discord')], [fake_process.pid for fake_process in fake_processes])
+            self.assertEqual(p_data['TF2'].path, fake_processes_dir)
+            self.assertTrue(process_scanner.all_pids_cached)
+            self.assertTrue(process_scanner.cached_pids_alive())
+
+            # the next scan only checks the pidfds (where there are any), without looking at the processes
+            try:
+                os.close(processes.pidfd_open(os.getpid()))
+                has_pidfds = True
+            except OSError:
+                has_pidfds = False
+            if has_pidfds:
+                self.assertEqual(sorted(process_scanner.pidfds), ['Discord', 'Steam', 'TF2'])
+                process_scanner.cached_pids_alive = lambda: self.fail("Checked on cached PIDs instead of using pidfds")
+
+            self.assertEqual(process_scanner.scan(), p_data)
+            self.assertFalse(process_scanner.used_tasklist)
+
+            # and then notices an exit through them
+            fake_processes[0].kill()
+            fake_processes[0].wait()
+            p_data = process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            self.assertEqual((p_data['TF2'].running, p_data['Discord'].running, process_scanner.pidfds), (False, True, {}))
+        finally:
+            for fake_process in fake_processes:
+                fake_process.kill()
+                fake_process.wait()
+            shutil.rmtree(fake_processes_dir)
+
+    def test_process_scanning_events(self):
+        proc_event_watcher = proc_events.ProcEventWatcher(self.log)
+        if not proc_event_watcher.listening:
+            self.skipTest("Can't listen for process events here (needs Linux and CAP_NET_ADMIN)")
+
+        process_names = ['tf2rp_hl2', 'tf2rp_steam', 'tf2rp_discord']
+        fake_processes = {}
+
+        # same stand-ins as in test_process_scanning_cached
+        def start_fake_process(process_name):
+            fake_processes[process_name] = subprocess.Popen([os.path.abspath(os.path.join('test_resources', process_name)), '-c', 'import time; time.sleep(60)'])
+            time.sleep(0.5)
+
+        for process_name in process_names:
+            os.symlink(sys.executable, os.path.abspath(os.path.join('test_resources', process_name)))
+
+        try:
+            true_process = subprocess.Popen(['true'])
+            true_process.wait()
+            self.assertEqual(proc_event_watcher.read_events()[-2:], [(proc_events.PROC_EVENT_EXEC, true_process.pid), (proc_events.PROC_EVENT_EXIT, true_process.pid)])
+            self.assertEqual(proc_event_watcher.read_events(), [])
+
+            start_fake_process('tf2rp_steam')
+            process_scanner = processes.ProcessScanner(self.log, proc_event_watcher)
+            process_scanner.executables['posix'] = process_names
+            p_data = process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            self.assertEqual((p_data['Steam'].pid, p_data['TF2'].running), (fake_processes['tf2rp_steam'].pid, False))
+
+            # starting is noticed without looking through every process
+            start_fake_process('tf2rp_hl2')
+            start_fake_process('tf2rp_discord')
+            p_data = process_scanner.scan()
+            self.assertFalse(process_scanner.used_tasklist)
+            self.assertEqual([p_data[program].pid for program in ('TF2', 'Steam', 'Discord')], [fake_processes[process_name].pid for process_name in process_names])
+            self.assertEqual(p_data['TF2'].path, os.path.abspath('test_resources'))
+            self.assertTrue(process_scanner.cached_pids_alive())
+            process_scanner.scan()
+            self.assertFalse(process_scanner.used_tasklist)
+            exit_fds = process_scanner.exit_fds()
+            if exit_fds:  # pidfds are still used for waking up when a program exits
+                self.assertEqual(len(exit_fds), 3)
+                self.assertEqual(select.select(exit_fds, [], [], 0)[0], [])
+
+            # and so is exiting, which is then checked with a sweep
+            fake_processes['tf2rp_hl2'].kill()
+            fake_processes['tf2rp_hl2'].wait()
+            if exit_fds:
+                self.assertEqual(select.select(exit_fds, [], [], 5)[0], [process_scanner.pidfds['TF2']])
+            p_data = process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            self.assertEqual((p_data['TF2'].running, p_data['TF2'].pid, p_data['Discord'].running), (False, None, True))
+
+            # and if events are lost, it's a sweep too
+            proc_event_watcher.events_lost = True
+            process_scanner.scan()
+            self.assertTrue(process_scanner.used_tasklist)
+            process_scanner.scan()
+            self.assertFalse(process_scanner.used_tasklist)
+        finally:
+            proc_event_watcher.close()
+            for fake_process in fake_processes.values():
+                fake_process.kill()
+                fake_process.wait()
+            for process_name in process_names:
+                os.remove(os.path.join('test_resources', process_name))
+
+    def test_process_scanning_proc(self):
+        if not sys.platform.startswith('linux'):
+            self.skipTest("/proc is only on Linux")
+
+        with open('/proc/stat', 'rb') as system_stat_file:
+            btime_line = [line for line in system_stat_file if line.startswith(b'btime')][0]
+
+        # thousands of processes, a few of which have the right names. PIDs are past the kernel's maximum so psutil can't have any of them cached
+        fake_proc = os.path.abspath(os.path.join('test_resources', 'fake_proc'))
+        names = {5002000: 'steam', 5001000: 'steam', 5001500: 'hl2_linux', 5000007: 'steamwebhelper', 5000500: 'Discord ) (x', 5003000: 'Discord', 5000300: 'hl2_linu'}
+        benchmark.write_fake_proc(fake_proc, 4000, names)
+
+        procfs_path_before = psutil.PROCFS_PATH
+        try:
+            process_scanner = processes.ProcessScanner(self.log)
+            process_scanner.proc_path = fake_proc
+            found = process_scanner.sweep_proc()
+            self.assertEqual({program: found[program][0] for program in found}, {'TF2': 5001500, 'Steam': 5001000, 'Discord': 5003000})
+            self.assertEqual(found['Steam'][1], float(btime_line.split()[1]) + (5001000 * 3 / os.sysconf('SC_CLK_TCK')))
+
+            psutil.PROCFS_PATH = fake_proc
+            self.assertEqual(process_scanner.sweep_psutil(), found)
+        finally:
+            psutil.PROCFS_PATH = procfs_path_before
+            shutil.rmtree(fake_proc)
+
     def test_settings_gui(self):
         root = tk.Tk()
         settings_gui = settings.GUI(root, self.log)